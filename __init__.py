@@ -1,9 +1,8 @@
 from invoke import Collection, Config, task
 
-from . import git, ansible, aws, docker
+from . import git, ansible, aws, docker, bench
 
-from os import environ, path, getcwd
-from configparser import ConfigParser
+from os import path, getcwd
 
 # Set initial Global Variables
 HOME = path.expanduser("~")
@@ -22,26 +21,6 @@ for f in invoke_files:
 # Set the SSH key to use
 SSH_PRIVATE_KEY_EXPAND = path.expanduser(c.get("SSH_PRIVATE_KEY", "~/.ssh/id_rsa"))
 
-# Load AWS credentials
-aws_credentials = ConfigParser()
-aws_credentials.read(f"{HOME}/.aws/credentials")
-AWS_ACCESS_KEY_ID = environ.get(
-    "AWS_ACCESS_KEY_ID",
-    aws_credentials.get("default", "aws_access_key_id", fallback="not-found"),
-)
-AWS_SECRET_ACCESS_KEY = environ.get(
-    "AWS_SECRET_ACCESS_KEY",
-    aws_credentials.get("default", "aws_secret_access_key", fallback="not-found"),
-)
-
-# Load registry password from file if it exists
-registry_password_file = f"{CURRENT_DIR}/.registry_password.secrets"
-if path.isfile(registry_password_file):
-    with open(registry_password_file, "r") as f:
-        REGISTRY_PASSWORD = f.read().strip()
-else:
-    REGISTRY_PASSWORD = ""
-
 # Get try to get config from 'invoke.yml' file
 try:
     DOCKER_CONTAINER_NAME = c["DOCKER_CONTAINER_NAME"]
@@ -59,9 +38,10 @@ ns.configure(
     {
         "HOME": HOME,
         "CURRENT_DIR": CURRENT_DIR,
-        "AWS_ACCESS_KEY_ID": AWS_ACCESS_KEY_ID,
-        "AWS_SECRET_ACCESS_KEY": AWS_SECRET_ACCESS_KEY,
-        "REGISTRY_PASSWORD": REGISTRY_PASSWORD,
+        # Read on first use by config.py unless they are set in the invoke configuration
+        "AWS_ACCESS_KEY_ID": None,
+        "AWS_SECRET_ACCESS_KEY": None,
+        "REGISTRY_PASSWORD": None,
         "SSH_PRIVATE_KEY_EXPAND": SSH_PRIVATE_KEY_EXPAND,
         "DOCKER_CONTAINER_NAME": DOCKER_CONTAINER_NAME,
         "DOCKER_IMAGE_NAME": DOCKER_IMAGE_NAME,
@@ -75,6 +55,7 @@ ns.add_collection(git)
 ns.add_collection(ansible)
 ns.add_collection(aws)
 ns.add_collection(docker)
+ns.add_collection(bench)
 
 
 # Add tasks to main Collection
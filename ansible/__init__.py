@@ -1,26 +1,238 @@
+import time
+from os import path
+
 from invoke import Collection, task
 
+from . import sharding, tuning
+from ..aws import common
+from ..aws.common.inventory import INVENTORY_DIR, INVENTORY_TTL
+from ..config import get_registry_password
+
+# Inventory of the EC2 instances, optionally followed by ':<profile>' and ':<region>'
+DYNAMIC_INVENTORY = "aws"
+SHARD_WORKERS = 4
+SHARD_LOG_DIR = "~/.cache/tasks/ansible"
+
 ns = Collection("ansible")
 
 
-@task(iterable=["args"])
-def playbook(c, playbook, inventory=None, args=None):
+def get_dynamic_inventory(c, profile=None, region=None, refresh=False):
+    """Get the inventory file of the EC2 instances, built again once it expires.
+    It uses the following 'invoke.yaml' variables when they are set:
+    - ANSIBLE_INVENTORY_PROFILE: AWS profile name. Defaults to 'default'.
+    - ANSIBLE_INVENTORY_TTL: number of seconds the inventory is reused.
+    - ANSIBLE_INVENTORY_ADDRESS: 'private' or 'public' address to connect to.
+    - ANSIBLE_INVENTORY_CACHE_DIR: directory of the inventory files.
+
+    Args:
+        c (context): fabric context.
+        profile (string): AWS profile name. You can use 'all' to search across all profiles.
+        region (string): AWS region name. You can use 'all' to search across all regions.
+        refresh (bool): build the inventory even if it is fresh.
+
+    Returns:
+        string: path of the inventory file.
+    """
+    profile = (
+        c.get("ANSIBLE_INVENTORY_PROFILE", "default") if profile is None else profile
+    )
+    region = common.get_region(c, region)
+    filename = path.join(
+        c.get("ANSIBLE_INVENTORY_CACHE_DIR", INVENTORY_DIR),
+        f"ec2_{profile}_{region}.json",
+    )
+    return common.aws_inventory(
+        profile,
+        region,
+        filename,
+        int(c.get("ANSIBLE_INVENTORY_TTL", INVENTORY_TTL)),
+        address=c.get("ANSIBLE_INVENTORY_ADDRESS", "private"),
+        **common.search_options(c, refresh=refresh),
+    )
+
+
+def get_inventory(c, inventory=None):
+    """Get the inventory file of a playbook.
+
+    Args:
+        c (context): fabric context.
+        inventory (string): inventory file, or 'aws[:<profile>[:<region>]]' for the EC2 instances.
+            Defaults to 'ANSIBLE_INVENTORY_FILE'.
+
+    Returns:
+        string: path of the inventory file.
+    """
+    try:
+        inventory = inventory if inventory is not None else c["ANSIBLE_INVENTORY_FILE"]
+    except KeyError as k:
+        raise SystemExit(f"You must specify '--inventory' or set {k} in invoke.yaml")
+    parts = inventory.split(":")
+    if parts[0] == DYNAMIC_INVENTORY and len(parts) <= 3:
+        return get_dynamic_inventory(c, *parts[1:])
+    return inventory
+
+
+@task(
+    help={
+        "profile": "AWS profile name or 'all'. Defaults to 'ANSIBLE_INVENTORY_PROFILE'",
+        "region": "AWS region name or 'all'",
+        "refresh": "Build the inventory even if it is fresh",
+    }
+)
+def inventory(c, profile=None, region=None, refresh=False):
+    """Build the Ansible inventory of the EC2 instances.
+    Use it with 'ansible.play --inventory aws[:<profile>[:<region>]]'."""
+    filename = get_dynamic_inventory(c, profile, region, refresh)
+    print(f"[+] Inventory file: {filename}")
+
+
+def get_fast_dir(c):
+    """Get the directory of the fast profile files, the fact cache and the timings.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        string: path of the directory. Defaults to '.ansible' in the current directory.
+    """
+    directory = path.expanduser(c.get("ANSIBLE_FAST_DIR", tuning.FAST_DIR))
+    return path.join(c.get("CURRENT_DIR", "."), directory)
+
+
+def run_sharded(
+    c, command, inventory_file, shards, shard_by, workers, max_failures, hosts, env=None
+):
+    """Run a playbook in shards and print the combined recap.
+
+    Args:
+        c (context): fabric context.
+        command (string): ansible-playbook command without '--limit'.
+        inventory_file (string): inventory file.
+        shards (string): number of shards.
+        shard_by (string): 'az' or 'tag:<key>'.
+        workers (string): number of shards run at once.
+        max_failures (string): number or percentage of failed hosts before the next shards are skipped.
+        hosts (string): host pattern of the hosts to split into shards.
+        env (dict): environment variables of ansible-playbook.
+    """
+    host_names = sharding.list_hosts(c, inventory_file, hosts)
+    if len(host_names) == 0:
+        raise SystemExit(f"No hosts match '{hosts}' in {inventory_file}")
+    hostvars = None if shard_by is None else sharding.list_hostvars(c, inventory_file)
+    split = sharding.split_hosts(
+        host_names, None if shards is None else int(shards), shard_by, hostvars
+    )
+    log_dir = path.join(
+        path.expanduser(c.get("ANSIBLE_SHARD_LOG_DIR", SHARD_LOG_DIR)),
+        time.strftime("%Y%m%d-%H%M%S"),
+    )
+    print(
+        "[+] Running {} hosts in {} shards, logs in {}".format(
+            len(host_names), len(split), log_dir
+        )
+    )
+    results, skipped = sharding.run_shards(
+        c,
+        command,
+        split,
+        log_dir,
+        int(
+            c.get("ANSIBLE_SHARD_WORKERS", SHARD_WORKERS)
+            if workers is None
+            else workers
+        ),
+        sharding.get_threshold(max_failures, len(host_names)),
+        env,
+    )
+    failed_hosts = sharding.report(results, skipped)
+    if len(failed_hosts) > 0 or len(skipped) > 0:
+        raise SystemExit(1)
+
+
+@task(
+    iterable=["args"],
+    help={
+        "shards": "Split the hosts into this number of shards run concurrently",
+        "shard_by": "Keep the hosts of an 'az' or a 'tag:<key>' value in the same shard",
+        "workers": "Number of shards run at once. Defaults to 'ANSIBLE_SHARD_WORKERS'",
+        "max_failures": "Number or percentage of failed hosts before the next shards are skipped",
+        "hosts": "Host pattern of the hosts to split into shards",
+        "fast": "Reuse SSH connections, pipeline modules, cache facts and save the task timings",
+    },
+)
+def playbook(
+    c,
+    playbook,
+    inventory=None,
+    args=None,
+    shards=None,
+    shard_by=None,
+    workers=None,
+    max_failures=None,
+    hosts="all",
+    fast=False,
+):
     """Run an Ansible playbook.
     This task expects the following 'invoke.yaml' variables to be set:
     - ANSIBLE_PLAYBOOKS_DIR
     - ANSIBLE_INVENTORY_FILE
-    - SSH_PRIVATE_KEY"""
-    try:
-        inventory_file = (
-            inventory if inventory is not None else c["ANSIBLE_INVENTORY_FILE"]
+    - SSH_PRIVATE_KEY
+    Use '--inventory aws[:<profile>[:<region>]]' for the inventory of the EC2 instances.
+    Use '--shards' or '--shard-by' to run several ansible-playbook processes at once.
+    Use '--fast' to write the settings to 'ANSIBLE_FAST_DIR' and save the task timings,
+    'ANSIBLE_FACT_CACHE_TTL' and 'ANSIBLE_CONTROL_PERSIST' tune the fact cache and SSH.
+    """
+    inventory_file = get_inventory(c, inventory)
+    command = f"ansible-playbook -i {inventory_file} -e ansible_ssh_private_key_file={c['SSH_PRIVATE_KEY_EXPAND']} {playbook} {' '.join(args or [])}"
+    env = None
+    if fast:
+        directory = get_fast_dir(c)
+        run_dir = tuning.start_timings(tuning.timings_dir(directory, playbook))
+        env = tuning.fast_env(
+            directory,
+            run_dir,
+            int(c.get("ANSIBLE_FACT_CACHE_TTL", tuning.FACT_CACHE_TTL)),
+            c.get("ANSIBLE_CONTROL_PERSIST", tuning.CONTROL_PERSIST),
         )
-    except KeyError as k:
-        raise SystemExit(f"You must specify '--inventory' or set {k} in invoke.yaml")
+        tuning.write_env(directory, env)
+    try:
+        if shards is None and shard_by is None:
+            c.run(command, pty=True, env=env or {})
+        else:
+            run_sharded(
+                c,
+                command,
+                inventory_file,
+                shards,
+                shard_by,
+                workers,
+                max_failures,
+                hosts,
+                env,
+            )
+    finally:
+        if fast:
+            saved = tuning.save_timings(run_dir, playbook)
+            if saved is not None:
+                tuning.print_timings(saved[1])
+                print(f"[+] Timings file: {saved[0]}")
+
 
-    c.run(
-        f"ansible-playbook -i {inventory_file} -e ansible_ssh_private_key_file={c['SSH_PRIVATE_KEY_EXPAND']} {playbook} {' '.join(args)}",
-        pty=True,
+@task(
+    help={
+        "playbook": "Playbook run with '--fast'",
+        "runs": "Number of runs to compare",
+        "top": "Number of the slowest tasks of the last run",
+    }
+)
+def timings(c, playbook, runs=5, top=tuning.TIMINGS_TOP):
+    """Compare the task durations of the last '--fast' runs of a playbook."""
+    loaded = tuning.load_timings(
+        tuning.timings_dir(get_fast_dir(c), playbook), int(runs)
     )
+    if len(loaded) == 0:
+        raise SystemExit(f"No timings found for '{playbook}', run it with '--fast'")
+    tuning.compare_timings(loaded, int(top))
 
 
 @task
@@ -33,7 +245,7 @@ def play_deploy_stag(c):  ## Runs playbook/deploy_apps.yml -e env=stag
         args=[
             "-e @examples/deploy.yml",
             "-e env=stag",
-            f"-e registry_password={c['REGISTRY_PASSWORD']}",
+            f"-e registry_password={get_registry_password(c)}",
         ],
     )
 
@@ -48,7 +260,7 @@ def play_deploy_prod(c):  ## Runs playbook/deploy_apps.yml -e env=prod
         args=[
             "-e @examples/deploy.yml",
             "-e env=prod",
-            f"-e registry_password={c['REGISTRY_PASSWORD']}",
+            f"-e registry_password={get_registry_password(c)}",
         ],
     )
 
@@ -58,4 +270,6 @@ deploy.add_task(play_deploy_stag, "stag")
 deploy.add_task(play_deploy_prod, "prod")
 
 ns.add_task(playbook, "play")
+ns.add_task(inventory, "inventory")
+ns.add_task(timings, "timings")
 ns.add_collection(deploy)
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+DOCUMENTATION = """
+    name: tasks_timings
+    type: aggregate
+    short_description: Save the duration of each task on each host
+    description:
+      - Writes the timings of the run to a JSON file in the TASKS_TIMINGS_DIR directory.
+    requirements:
+      - enable in configuration
+"""
+
+
+class CallbackModule(CallbackBase):
+    """Record the duration of each task and of each host running it."""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "tasks_timings"
+    CALLBACK_NEEDS_ENABLED = True
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = time.time()
+        self.play = None
+        self.tasks = {}
+        self.running = {}
+
+    def v2_playbook_on_play_start(self, play):
+        self.play = play.get_name()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self.tasks.setdefault(
+            task._uuid,
+            {
+                "play": self.play,
+                "task": task.get_name(),
+                "action": task.action,
+                "started": time.time(),
+                "ended": None,
+                "hosts": {},
+            },
+        )
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def v2_runner_on_start(self, host, task):
+        self.running[(task._uuid, host.get_name())] = time.time()
+
+    def record(self, result, status):
+        """Store the duration of a task on a host.
+
+        Args:
+            result (TaskResult): result of the task on the host.
+            status (string): 'ok', 'changed', 'failed', 'skipped' or 'unreachable'.
+        """
+        now = time.time()
+        task = self.tasks.get(result._task._uuid)
+        if task is None:
+            return
+        host = result._host.get_name()
+        started = self.running.pop((result._task._uuid, host), task["started"])
+        task["hosts"][host] = {"duration": round(now - started, 3), "status": status}
+        task["ended"] = now
+
+    def v2_runner_on_ok(self, result):
+        self.record(result, "changed" if result._result.get("changed") else "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.record(result, "failed")
+
+    def v2_runner_on_skipped(self, result):
+        self.record(result, "skipped")
+
+    def v2_runner_on_unreachable(self, result):
+        self.record(result, "unreachable")
+
+    def v2_playbook_on_stats(self, stats):
+        directory = os.environ.get("TASKS_TIMINGS_DIR")
+        if not directory:
+            return
+        tasks = []
+        for task in self.tasks.values():
+            ended = task.pop("ended") or task["started"]
+            task["duration"] = round(ended - task["started"], 3)
+            tasks.append(task)
+        timings = {
+            "started": self.started,
+            "duration": round(time.time() - self.started, 3),
+            "tasks": tasks,
+        }
+        with open(os.path.join(directory, f"{os.getpid()}.json"), "w") as f:
+            json.dump(timings, f)
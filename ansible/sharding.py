@@ -0,0 +1,278 @@
+import json
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import makedirs, path
+
+# Line of the PLAY RECAP of ansible-playbook. e.g. 'web-1 : ok=3 changed=1 unreachable=0 failed=0'
+RECAP_LINE = re.compile(r"^(?P<host>\S+)\s+:\s+(?P<counters>(?:\w+=\d+\s*)+)$")
+ANSI_CODES = re.compile(r"\x1b\[[0-9;]*m")
+COUNTERS = ["ok", "changed", "unreachable", "failed", "skipped", "rescued", "ignored"]
+
+
+def list_hosts(c, inventory, pattern="all"):
+    """Get the hosts of an inventory matching a pattern.
+
+    Args:
+        c (context): fabric context.
+        inventory (string): inventory file.
+        pattern (string): Ansible host pattern. e.g. 'tag_env_prod:&az_eu_central_1a'
+
+    Returns:
+        list: list of host names.
+    """
+    result = c.run(f"ansible '{pattern}' -i {inventory} --list-hosts", hide=True)
+    lines = [line.strip() for line in result.stdout.splitlines()]
+    return [line for line in lines if line and not line.startswith("hosts (")]
+
+
+def list_hostvars(c, inventory):
+    """Get the variables of every host of an inventory.
+
+    Args:
+        c (context): fabric context.
+        inventory (string): inventory file.
+
+    Returns:
+        dict: variables by host name.
+    """
+    result = c.run(f"ansible-inventory -i {inventory} --list", hide=True)
+    return json.loads(result.stdout).get("_meta", {}).get("hostvars", {})
+
+
+def shard_key(hostvars, by):
+    """Get the value of a host that its shard is chosen by.
+
+    Args:
+        hostvars (dict): variables of the host.
+        by (string): 'az' or 'tag:<key>'.
+
+    Returns:
+        string: value of the host or None if missing.
+    """
+    if by == "az":
+        return hostvars.get("ec2_availability_zone") or hostvars.get(
+            "placement", {}
+        ).get("availability_zone")
+    if by.startswith("tag:"):
+        tags = hostvars.get("ec2_tags") or hostvars.get("tags") or {}
+        return tags.get(by[len("tag:") :])
+    raise SystemExit(f"Invalid shard key '{by}'. Options available: 'az', 'tag:<key>'")
+
+
+def split_hosts(hosts, shards=None, by=None, hostvars=None):
+    """Split hosts into shards.
+    Without a key, the hosts are split in order into shards of the same size. With a key,
+    the hosts sharing a value stay together, one shard per value unless a number of shards
+    is set, then the largest groups are added first to the smallest shard.
+
+    Args:
+        hosts (list): list of host names.
+        shards (int): number of shards. Use None for one shard per value of the key.
+        by (string): 'az' or 'tag:<key>'. Use None to split the hosts in order.
+        hostvars (dict): variables by host name, required with a key.
+
+    Returns:
+        list: list of shards, each one a list of host names.
+    """
+    if len(hosts) == 0:
+        return []
+    if by is None:
+        shards = max(1, min(shards or 1, len(hosts)))
+        size, extra = divmod(len(hosts), shards)
+        bounds = [i * size + min(i, extra) for i in range(shards + 1)]
+        return [hosts[bounds[i] : bounds[i + 1]] for i in range(shards)]
+    groups = {}
+    for host in hosts:
+        groups.setdefault(shard_key(hostvars.get(host, {}), by), []).append(host)
+    if shards is None:
+        return list(groups.values())
+    split = [[] for _ in range(min(shards, len(groups)))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(split, key=len).extend(group)
+    return split
+
+
+def parse_recap(output):
+    """Parse the PLAY RECAP of an ansible-playbook output.
+
+    Args:
+        output (string): output of ansible-playbook.
+
+    Returns:
+        dict: counters by host name. e.g. {'web-1': {'ok': 3, 'failed': 0, ...}}
+    """
+    recap = {}
+    in_recap = False
+    for line in ANSI_CODES.sub("", output).splitlines():
+        if line.startswith("PLAY RECAP"):
+            in_recap = True
+            continue
+        match = RECAP_LINE.match(line.strip()) if in_recap else None
+        if match is None:
+            continue
+        counters = dict.fromkeys(COUNTERS, 0)
+        for pair in match.group("counters").split():
+            name, value = pair.split("=")
+            counters[name] = int(value)
+        recap[match.group("host")] = counters
+    return recap
+
+
+def failed(counters):
+    """Check whether a host failed.
+
+    Args:
+        counters (dict): recap counters of the host, or None if it has no recap.
+
+    Returns:
+        bool: True if the host failed, was unreachable or has no recap.
+    """
+    return counters is None or counters["failed"] > 0 or counters["unreachable"] > 0
+
+
+def get_threshold(max_failures, total):
+    """Get the maximum number of failed hosts before the remaining shards are skipped.
+
+    Args:
+        max_failures (string): number of hosts or percentage of the hosts. e.g. '10', '5%'
+            Use None to run every shard.
+        total (int): number of hosts.
+
+    Returns:
+        int: maximum number of failed hosts or None to run every shard.
+    """
+    if max_failures is None:
+        return None
+    value = str(max_failures).strip()
+    try:
+        if value.endswith("%"):
+            return int(total * float(value[:-1]) / 100)
+        return int(value)
+    except ValueError:
+        raise SystemExit(
+            f"Invalid maximum failures '{max_failures}'. Use a number of hosts or a percentage"
+        )
+
+
+def run_shard(c, command, index, hosts, log_dir, env=None):
+    """Run ansible-playbook on the hosts of a shard, its output going to a log file.
+
+    Args:
+        c (context): fabric context.
+        command (string): ansible-playbook command without '--limit'.
+        index (int): number of the shard.
+        hosts (list): list of host names.
+        log_dir (string): directory of the host lists and logs of the shards.
+        env (dict): environment variables of ansible-playbook.
+
+    Returns:
+        dict: shard number, hosts, exit code, log file and recap counters by host name.
+    """
+    limit_file = path.join(log_dir, f"shard-{index}.hosts")
+    log_file = path.join(log_dir, f"shard-{index}.log")
+    with open(limit_file, "w") as f:
+        f.write("\n".join(hosts) + "\n")
+    with open(log_file, "w") as log:
+        result = c.run(
+            f"{command} --limit @{limit_file}",
+            warn=True,
+            out_stream=log,
+            err_stream=log,
+            env=dict(env or {}, ANSIBLE_NOCOLOR="1"),
+        )
+    return {
+        "shard": index,
+        "hosts": hosts,
+        "exited": result.exited,
+        "log": log_file,
+        "recap": parse_recap(result.stdout),
+    }
+
+
+def run_shards(c, command, shards, log_dir, workers=1, threshold=None, env=None):
+    """Run ansible-playbook on shards concurrently with a bounded pool.
+    Once more hosts than the threshold failed, the shards not started yet are skipped.
+
+    Args:
+        c (context): fabric context.
+        command (string): ansible-playbook command without '--limit'.
+        shards (list): list of shards, each one a list of host names.
+        log_dir (string): directory of the host lists and logs of the shards.
+        workers (int): number of concurrent ansible-playbook processes.
+        threshold (int): maximum number of failed hosts. Use None to run every shard.
+        env (dict): environment variables of ansible-playbook.
+
+    Returns:
+        tuple: results of the shards that ran and the numbers of the skipped ones.
+    """
+    makedirs(log_dir, exist_ok=True)
+    results = []
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(run_shard, c, command, index, hosts, log_dir, env): index
+            for index, hosts in enumerate(shards, 1)
+        }
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            result = future.result()
+            results.append(result)
+            failures += sum(failed(result["recap"].get(h)) for h in result["hosts"])
+            print(
+                "[+] Shard {}/{} done: {} hosts, exit code {}".format(
+                    result["shard"], len(shards), len(result["hosts"]), result["exited"]
+                )
+            )
+            if threshold is not None and failures > threshold:
+                for pending in futures:
+                    pending.cancel()
+    skipped = sorted(futures[f] for f in futures if f.cancelled())
+    return sorted(results, key=lambda r: r["shard"]), skipped
+
+
+def report(results, skipped):
+    """Print the combined recap of the shards.
+
+    Args:
+        results (list): results of the shards that ran, see run_shard.
+        skipped (list): numbers of the shards that didn't run.
+
+    Returns:
+        list: list of the failed host names.
+    """
+    from tabulate import tabulate
+
+    rows = []
+    failed_hosts = []
+    for result in results:
+        for host in result["hosts"]:
+            counters = result["recap"].get(host)
+            if failed(counters):
+                failed_hosts.append(host)
+            rows.append(
+                dict(
+                    host=host, shard=result["shard"], **(counters or {"recap": "none"})
+                )
+            )
+    print("[+] PLAY RECAP of {} shards".format(len(results)))
+    print(tabulate(rows, headers="keys", tablefmt="pretty"))
+    for result in results:
+        if result["exited"] != 0:
+            print(
+                "[-] Shard {} exited with code {}, see {}".format(
+                    result["shard"], result["exited"], result["log"]
+                ),
+                file=sys.stderr,
+            )
+    if len(failed_hosts) > 0:
+        print("[-] Failed hosts: {}".format(", ".join(failed_hosts)), file=sys.stderr)
+    if len(skipped) > 0:
+        print(
+            "[-] Too many failed hosts, shards not run: {}".format(
+                ", ".join(str(s) for s in skipped)
+            ),
+            file=sys.stderr,
+        )
+    return failed_hosts
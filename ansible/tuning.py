@@ -0,0 +1,301 @@
+import json
+import shlex
+import shutil
+import tempfile
+import time
+from os import environ, listdir, makedirs, path, pathsep
+
+FAST_DIR = ".ansible"
+FACT_CACHE_TTL = 86400
+# Connections are kept open between the runs of the same session
+CONTROL_PERSIST = "30m"
+CALLBACK_DIR = path.join(path.dirname(path.abspath(__file__)), "callback_plugins")
+TIMINGS_CALLBACK = "tasks_timings"
+TIMINGS_TOP = 10
+# Ansible reads the first of these files, after the one set in ANSIBLE_CONFIG
+ANSIBLE_CONFIG_FILES = ["ansible.cfg", "~/.ansible.cfg", "/etc/ansible/ansible.cfg"]
+
+
+def read_ansible_config(env=environ):
+    """Read the '[defaults]' section of the ansible.cfg file Ansible would use.
+
+    Args:
+        env (dict): environment variables.
+
+    Returns:
+        dict: settings of the '[defaults]' section, empty if there is no file.
+    """
+    from configparser import ConfigParser, Error
+
+    filenames = [env["ANSIBLE_CONFIG"]] if env.get("ANSIBLE_CONFIG") else []
+    for filename in filenames + ANSIBLE_CONFIG_FILES:
+        filename = path.expanduser(filename)
+        if path.isdir(filename):
+            filename = path.join(filename, "ansible.cfg")
+        if not path.isfile(filename):
+            continue
+        config = ConfigParser(interpolation=None, inline_comment_prefixes=(";",))
+        try:
+            config.read(filename)
+        except Error:
+            return {}
+        return dict(config["defaults"]) if config.has_section("defaults") else {}
+    return {}
+
+
+def append_setting(value, current, separator):
+    """Append a value to an Ansible list setting, unless it is already there.
+
+    Args:
+        value (string): value to append.
+        current (string): current setting, or None.
+        separator (string): separator of the list. e.g. ','
+
+    Returns:
+        string: new setting.
+    """
+    values = [v.strip() for v in (current or "").split(separator) if v.strip()]
+    if value not in values:
+        values.append(value)
+    return separator.join(values)
+
+
+def callback_env(env=environ):
+    """Enable the timings callback next to the callbacks set in the environment or ansible.cfg.
+
+    Args:
+        env (dict): environment variables.
+
+    Returns:
+        dict: Ansible environment variables of the callbacks.
+    """
+    config = read_ansible_config(env)
+    plugins = env.get("ANSIBLE_CALLBACK_PLUGINS", config.get("callback_plugins"))
+    enabled = env.get(
+        "ANSIBLE_CALLBACKS_ENABLED",
+        env.get(
+            "ANSIBLE_CALLBACK_WHITELIST",
+            config.get("callbacks_enabled", config.get("callback_whitelist")),
+        ),
+    )
+    enabled = append_setting(TIMINGS_CALLBACK, enabled, ",")
+    return {
+        "ANSIBLE_CALLBACK_PLUGINS": append_setting(CALLBACK_DIR, plugins, pathsep),
+        "ANSIBLE_CALLBACKS_ENABLED": enabled,
+        "ANSIBLE_CALLBACK_WHITELIST": enabled,
+    }
+
+
+def fast_env(directory, timings_dir, ttl=FACT_CACHE_TTL, persist=CONTROL_PERSIST):
+    """Build the Ansible settings of the fast profile.
+    SSH connections are multiplexed and commands are piped without copying modules
+    (requires 'requiretty' to be disabled in sudoers). Facts are gathered only when
+    they are missing from the cache and the timings callback is enabled
+    next to the callbacks already set.
+
+    Args:
+        directory (string): directory of the fact cache.
+        timings_dir (string): directory the timings callback writes to.
+        ttl (int): number of seconds the cached facts are used.
+        persist (string): time the idle SSH connections are kept open. e.g. '30m'
+
+    Returns:
+        dict: Ansible environment variables.
+    """
+    return {
+        "ANSIBLE_SSH_ARGS": f"-C -o ControlMaster=auto -o ControlPersist={persist}",
+        "ANSIBLE_PIPELINING": "True",
+        "ANSIBLE_GATHERING": "smart",
+        "ANSIBLE_CACHE_PLUGIN": "jsonfile",
+        "ANSIBLE_CACHE_PLUGIN_CONNECTION": path.join(directory, "facts"),
+        "ANSIBLE_CACHE_PLUGIN_TIMEOUT": str(ttl),
+        "TASKS_TIMINGS_DIR": timings_dir,
+        **callback_env(),
+    }
+
+
+def write_env(directory, env):
+    """Write the settings of the fast profile to 'ansible.env' to reuse them in a shell.
+    e.g. 'source .ansible/ansible.env && ansible all -m ping'
+
+    Args:
+        directory (string): directory of the file.
+        env (dict): Ansible environment variables.
+
+    Returns:
+        string: path of the file.
+    """
+    filename = path.join(directory, "ansible.env")
+    makedirs(directory, exist_ok=True)
+    with open(filename, "w") as f:
+        for name, value in env.items():
+            if name != "TASKS_TIMINGS_DIR":
+                f.write(f"export {name}={shlex.quote(value)}\n")
+    return filename
+
+
+def timings_dir(directory, playbook):
+    """Get the directory of the timings of a playbook.
+
+    Args:
+        directory (string): directory of the fast profile.
+        playbook (string): path of the playbook.
+
+    Returns:
+        string: directory of the timings files.
+    """
+    name = path.splitext(path.basename(playbook))[0]
+    return path.join(directory, "timings", name)
+
+
+def start_timings(directory):
+    """Create the directory the callbacks of a run write their timings to.
+
+    Args:
+        directory (string): directory of the timings of the playbook.
+
+    Returns:
+        string: temporary directory of the run.
+    """
+    makedirs(directory, exist_ok=True)
+    return tempfile.mkdtemp(dir=directory, prefix=".run-")
+
+
+def merge_timings(parts):
+    """Merge the timings of several ansible-playbook processes of the same run.
+    Tasks are matched by play and name, their duration is the longest one.
+
+    Args:
+        parts (list): timings written by the callback of each process.
+
+    Returns:
+        dict: start time, duration and tasks of the run.
+    """
+    tasks = {}
+    for part in parts:
+        for task in part["tasks"]:
+            key = (task["play"], task["task"])
+            if key not in tasks:
+                tasks[key] = dict(task, hosts=dict(task["hosts"]))
+                continue
+            tasks[key]["hosts"].update(task["hosts"])
+            tasks[key]["duration"] = max(tasks[key]["duration"], task["duration"])
+    return {
+        "started": min((p["started"] for p in parts), default=time.time()),
+        "duration": max((p["duration"] for p in parts), default=0),
+        "tasks": list(tasks.values()),
+    }
+
+
+def save_timings(run_dir, playbook):
+    """Merge the timings of a run into a single file named after its start time.
+
+    Args:
+        run_dir (string): temporary directory of the run, removed afterwards.
+        playbook (string): path of the playbook.
+
+    Returns:
+        tuple: path of the timings file and the timings, or None if nothing ran.
+    """
+    parts = []
+    for name in sorted(listdir(run_dir)):
+        with open(path.join(run_dir, name)) as f:
+            parts.append(json.load(f))
+    shutil.rmtree(run_dir, ignore_errors=True)
+    if len(parts) == 0:
+        return None
+    timings = dict(playbook=playbook, **merge_timings(parts))
+    started = time.strftime("%Y%m%d-%H%M%S", time.localtime(timings["started"]))
+    filename = path.join(path.dirname(run_dir), f"{started}.json")
+    with open(filename, "w") as f:
+        json.dump(timings, f, indent=2)
+    return filename, timings
+
+
+def load_timings(directory, runs=5):
+    """Get the timings of the last runs of a playbook.
+
+    Args:
+        directory (string): directory of the timings of the playbook.
+        runs (int): number of runs.
+
+    Returns:
+        list: tuples of run name and timings, oldest first.
+    """
+    if not path.isdir(directory):
+        return []
+    names = sorted(n for n in listdir(directory) if n.endswith(".json"))
+    loaded = []
+    for name in names[-runs:]:
+        with open(path.join(directory, name)) as f:
+            loaded.append((name[: -len(".json")], json.load(f)))
+    return loaded
+
+
+def slowest_host(task):
+    """Get the host that took the longest to run a task.
+
+    Args:
+        task (dict): timings of the task.
+
+    Returns:
+        string: host name and duration. e.g. 'web-1 (12.3s)'
+    """
+    if len(task["hosts"]) == 0:
+        return None
+    host, timing = max(task["hosts"].items(), key=lambda h: h[1]["duration"])
+    return f"{host} ({timing['duration']:.1f}s)"
+
+
+def print_timings(timings, top=TIMINGS_TOP):
+    """Print the slowest tasks of a run.
+
+    Args:
+        timings (dict): timings of the run.
+        top (int): number of tasks.
+    """
+    from tabulate import tabulate
+
+    tasks = sorted(timings["tasks"], key=lambda t: t["duration"], reverse=True)
+    rows = [
+        {
+            "play": task["play"],
+            "task": task["task"],
+            "duration": f"{task['duration']:.1f}s",
+            "hosts": len(task["hosts"]),
+            "slowest host": slowest_host(task),
+        }
+        for task in tasks[:top]
+    ]
+    print(f"[+] Slowest tasks of {timings['duration']:.1f}s")
+    print(tabulate(rows, headers="keys", tablefmt="pretty"))
+
+
+def compare_timings(loaded, top=TIMINGS_TOP):
+    """Print the duration of the slowest tasks of the last run next to the previous runs.
+
+    Args:
+        loaded (list): tuples of run name and timings, oldest first.
+        top (int): number of tasks.
+    """
+    from tabulate import tabulate
+
+    durations = [
+        {(t["play"], t["task"]): t["duration"] for t in timings["tasks"]}
+        for _, timings in loaded
+    ]
+    last = sorted(durations[-1].items(), key=lambda t: t[1], reverse=True)
+    rows = []
+    for key, _ in last[:top]:
+        row = {"play": key[0], "task": key[1]}
+        for (name, _), run in zip(loaded, durations):
+            row[name] = "-" if key not in run else f"{run[key]:.1f}s"
+        rows.append(row)
+    rows.append(
+        dict(
+            play="",
+            task="total",
+            **{name: f"{timings['duration']:.1f}s" for name, timings in loaded},
+        )
+    )
+    print(tabulate(rows, headers="keys", tablefmt="pretty"))
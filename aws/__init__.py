@@ -1,6 +1,7 @@
 from invoke import Collection
-from . import search
+from . import daemon, search
 
 # Create Collection
 ns = Collection("aws")
 ns.add_collection(search)
+ns.add_collection(daemon)
@@ -1,105 +1,818 @@
-import boto3
-import json
-from tabulate import tabulate
+import inspect
+import sys
+import time
+from functools import wraps
+from os import path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
 
-from . import deserialize, ec2, eni, elb
+from invoke import task
 
+from . import daemon as query_daemon
+from . import deserialize, ec2, eni, elb, ip, planner
+from .assume import (
+    CREDENTIALS_FILE,
+    DURATION,
+    ORGANIZATIONS,
+    CredentialCache,
+    RoleChain,
+)
+from .batch import read_values
+from .cache import (
+    ACCOUNTS_TTL,
+    CACHE_FILE,
+    CACHE_TTL,
+    REGIONS_TTL,
+    InventoryCache,
+    ProfileCache,
+    query_key,
+)
+from .catalog import CATALOG, CATALOG_TTL
+from .inventory import INVENTORY_TTL, build_inventory, load_inventory
+from .output import get_writer
+from .pool import CONNECT_TIMEOUT, POOL, READ_TIMEOUT, FailedSession
+from .ratelimit import MAX_ATTEMPTS, RATE_BURST, RATE_LIMIT, RETRY_MODE, RateLimiter
+from .stats import Stats
 
-def get_aws_session(profile_name, region_name):
+PROFILE_WORKERS = 16
+# Arguments shared by every search task with their default values, see search_task
+SEARCH_ARGUMENTS = {
+    "profile": "default",
+    "region": None,
+    "output": "table",
+    "workers": None,
+    "refresh": False,
+    "offline": False,
+    "stats": False,
+    "stats_file": None,
+    "deadline": None,
+    "timeout": None,
+    "columns": None,
+    "sort": None,
+    "limit": None,
+}
+SORT_HELP = (
+    "Columns to sort by split by comma (,), prefixed with '-' for a descending order"
+)
+LIMIT_HELP = "Maximum number of results, unsorted searches stop once they have enough"
+
+
+class SkippedError(Exception):
+    """The whole search ran out of time before the search of the session started."""
+
+
+def describe_regions(profile_name):
+    """Get the opted-in regions of a profile from AWS.
+
+    Args:
+        profile_name (string): AWS profile name.
+
+    Returns:
+        list: list of region names.
+    """
+    client = POOL.client(profile_name, "us-east-1", "ec2")
+    regions = client.describe_regions(
+        Filters=[
+            {
+                "Name": "opt-in-status",
+                "Values": ["opt-in-not-required", "opted-in"],
+            }
+        ]
+    )["Regions"]
+    return [region["RegionName"] for region in regions]
+
+
+def refresh_regions(profile_name, regions):
+    """Describe the regions of a profile and store them in the region cache.
+
+    Args:
+        profile_name (string): AWS profile name.
+        regions (ProfileCache): region cache.
+
+    Returns:
+        list: list of region names or None if it failed.
+    """
+    try:
+        region_names = describe_regions(profile_name)
+    except Exception:
+        return None
+    regions.put(profile_name, region_names)
+    return region_names
+
+
+def get_regions(profile_name, regions=None):
+    """Get the opted-in regions of a profile.
+    A stale cached list is returned right away and refreshed in the background.
+
+    Args:
+        profile_name (string): AWS profile name.
+        regions (ProfileCache): region cache. Use None to always ask AWS.
+
+    Returns:
+        list: list of region names.
+    """
+    if regions is None:
+        return describe_regions(profile_name)
+    region_names, fresh = regions.get(profile_name)
+    if region_names is None:
+        region_names = describe_regions(profile_name)
+        regions.put(profile_name, region_names)
+    elif not fresh:
+        Thread(target=refresh_regions, args=(profile_name, regions)).start()
+    return region_names
+
+
+def get_account_id(profile_name):
+    """Get the account ID of a profile from AWS.
+
+    Args:
+        profile_name (string): AWS profile name.
+
+    Returns:
+        string: AWS account ID.
+    """
+    client = POOL.client(profile_name, "us-east-1", "sts")
+    return client.get_caller_identity()["Account"]
+
+
+def refresh_account(profile_name, accounts):
+    """Get the account ID of a profile and store it in the account cache.
+
+    Args:
+        profile_name (string): AWS profile name.
+        accounts (ProfileCache): account cache.
+
+    Returns:
+        string: AWS account ID or None if it failed.
+    """
+    try:
+        account_id = get_account_id(profile_name)
+    except Exception:
+        return None
+    accounts.put(profile_name, account_id)
+    return account_id
+
+
+def get_account(profile_name, accounts=None):
+    """Get the account ID of a profile, from the account cache when possible.
+
+    Args:
+        profile_name (string): AWS profile name.
+        accounts (ProfileCache): account cache. Use None to always ask AWS.
+
+    Returns:
+        string: AWS account ID or None if it can't be retrieved.
+    """
+    if accounts is not None:
+        account_id, fresh = accounts.get(profile_name)
+        if not fresh:
+            account_id = refresh_account(profile_name, accounts) or account_id
+    else:
+        try:
+            account_id = get_account_id(profile_name)
+        except Exception:
+            account_id = None
+    if account_id is not None:
+        POOL.account_ids[profile_name] = account_id
+    return account_id
+
+
+def discover(profile_names, cache, refresh):
+    """Refresh concurrently the profiles missing from a profile cache.
+
+    Args:
+        profile_names (list): list of AWS profile names.
+        cache (ProfileCache): region or account cache.
+        refresh (function): function refreshing the cache of a single profile.
+    """
+    missing = [p for p in profile_names if cache.get(p)[0] is None]
+    if len(missing) < 2:
+        return
+    with ThreadPoolExecutor(max_workers=PROFILE_WORKERS) as executor:
+        for profile_name in missing:
+            executor.submit(refresh, profile_name, cache)
+
+
+def get_aws_session(profile_name, region_name, regions=None):
     """Get an AWS session using the profile and region names.
 
     Args:
         profile_name (string): AWS profile name. You can use 'all' to search across all profiles.
         region_name (string): AWS region name. You can use 'all' to search across all regions.
+        regions (ProfileCache): region cache used when region_name is 'all'.
 
     Yields:
-        botocore_session: It will retrieve a session for each profile and region.
+        PooledSession: It will retrieve a session for each profile and region.
+            A FailedSession is yielded instead when it can't be created.
     """
     if profile_name == "all":
-        profiles = boto3.Session().available_profiles
+        profiles = POOL.available_profiles()
+        if region_name == "all" and regions is not None:
+            discover(profiles, regions, refresh_regions)
         for profile in profiles:
-            yield from get_aws_session(profile, region_name)
+            yield from get_aws_session(profile, region_name, regions)
     elif region_name == "all":
         try:
-            session = boto3.Session(profile_name=profile_name, region_name="us-east-1")
-            client = session.client("ec2")
-            regions = client.describe_regions(
-                Filters=[
-                    {
-                        "Name": "opt-in-status",
-                        "Values": ["opt-in-not-required", "opted-in"],
-                    }
-                ]
-            )["Regions"]
-            for region in regions:
-                yield from get_aws_session(profile_name, region["RegionName"])
-        except Exception:
-            yield None
+            region_names = get_regions(profile_name, regions)
+        except Exception as e:
+            yield FailedSession(profile_name, region_name, e)
+            return
+        for region in region_names:
+            yield from get_aws_session(profile_name, region)
     else:
         try:
-            session = boto3.Session(profile_name=profile_name, region_name=region_name)
-            yield session
-        except Exception:
-            yield None
+            yield POOL.session(profile_name, region_name)
+        except Exception as e:
+            yield FailedSession(profile_name, region_name, e)
 
 
-def aws_search(profile_name, region_name, output, func, **kwargs):
-    """Iterate over all AWS sessions and call the function with the provided arguments.
+def plan_sessions(
+    profile_name, region_name, key, locate, regions=None, accounts=None, **kwargs
+):
+    """Get only the AWS sessions that can own the identifiers of a search.
+    Identifiers with a known region are sent to that region only, and identifiers
+    with a known account ID only to the profiles of that account.
 
     Args:
-        profile_name (string): AWS profile name.
-        region_name (string): AWS region name.
-        output (string): output format. You can choose between table, json.
-        func (function): function to call.
+        profile_name (string): AWS profile name. You can use 'all' to search across all profiles.
+        region_name (string): AWS region name used for identifiers without a region.
+        key (string): name of the argument holding the identifiers.
+        locate (function): function returning the account ID and region of an identifier.
+        regions (ProfileCache): region cache used when region_name is 'all'.
+        accounts (ProfileCache): account cache.
+
+    Yields:
+        tuple: AWS session and the arguments of the function for that session.
     """
-    for session in get_aws_session(profile_name, region_name):
-        if session is not None:
-            response = func(session, **kwargs)
-            if response is not None:
-                data = deserialize.deserialize(response)
-                print_data(
-                    profile=session.profile_name,
-                    region=session.region_name,
-                    data=data,
-                    output=output,
-                )
+    groups = planner.route(kwargs[key], locate)
+    by_account = any(account is not None for account, _ in groups)
+    if profile_name == "all":
+        profiles = POOL.available_profiles()
+        if by_account and accounts is not None:
+            discover(profiles, accounts, refresh_account)
+    else:
+        profiles = [profile_name]
+    searched = set()
+    for profile in profiles:
+        account_id = get_account(profile, accounts) if by_account else None
+        for (account, region), values in groups.items():
+            if account is not None and account_id is not None:
+                # Search each account only once, even with several profiles for it
+                if account != account_id or (account, region) in searched:
+                    continue
+                searched.add((account, region))
+            for session in get_aws_session(profile, region or region_name, regions):
+                yield session, dict(kwargs, **{key: values})
+
+
+def fetch_session(session, func, stats=None, columns=None, **kwargs):
+    """Call the function for a single AWS session and deserialize each response page.
+    Resources already seen in a previous page are dropped, e.g. when they matched
+    several chunks of values. Empty pages are skipped unless the whole response is empty.
+    Only the records are kept, each response page is released once deserialized.
+
+    Args:
+        session (botocore_session): AWS session.
+        func (function): function to call. It must yield response pages.
+        stats (Stats): recorder of the deserialization time. Use None to disable it.
+        columns (tuple): columns of the records. Use None for the default columns.
+
+    Yields:
+        list: deserialized page of AWS resources.
+    """
+    found = False
+    empty = None
+    seen = set()
+    for response in func(session, **kwargs):
+        start = time.perf_counter()
+        data = deserialize.deserialize(response, columns, seen)
+        del response
+        if stats is not None:
+            stats.record(
+                session.profile_name,
+                session.region_name,
+                "deserialize",
+                func.__name__,
+                time.perf_counter() - start,
+                records=0 if data is None else len(data),
+            )
+        if data is None:
+            continue
+        if len(data) > 0:
+            found = True
+            yield data
         else:
+            empty = data
+    if not found and empty is not None:
+        yield empty
+
+
+def search_session(
+    session,
+    func,
+    cache=None,
+    refresh=False,
+    query=None,
+    stats=None,
+    columns=None,
+    **kwargs,
+):
+    """Search a single AWS session, answering from the inventory cache when it is fresh.
+
+    Args:
+        session (botocore_session): AWS session.
+        func (function): function to call. It must yield response pages.
+        cache (InventoryCache): inventory cache. Use None to always query AWS.
+        refresh (bool): ignore the cached result and query AWS.
+        query (string): cache key of the search. Defaults to the key of the function arguments.
+        stats (Stats): recorder of the cache and deserialization times. Use None to disable it.
+        columns (tuple): columns of the records. Use None for the default columns.
+
+    Yields:
+        list: deserialized page of AWS resources.
+    """
+    if isinstance(session, FailedSession):
+        raise session.error
+    if cache is None:
+        yield from fetch_session(session, func, stats, columns, **kwargs)
+        return
+    profile, region = session.profile_name, session.region_name
+    if query is None:
+        query = query_key(func, kwargs, columns)
+    start = time.perf_counter()
+    pages = None if refresh else cache.get(profile, region, query)
+    if stats is not None and not refresh:
+        stats.record(
+            profile,
+            region,
+            "cache",
+            "hit" if pages is not None else "miss",
+            time.perf_counter() - start,
+            records=sum(len(data) for data in pages or []),
+        )
+    if pages is not None:
+        yield from pages
+        return
+    pages = []
+    for data in fetch_session(session, func, stats, columns, **kwargs):
+        pages.append(data)
+        yield data
+    # Only reached once the pagination finished, a failed or stopped search isn't cached
+    if len(pages) > 0:
+        cache.put(profile, region, query, pages)
+
+
+def search_sequential(jobs, func, **options):
+    """Search the AWS sessions one after another.
+
+    Args:
+        jobs (generator): AWS sessions and the arguments of the function for each of them.
+        func (function): function to call.
+        options (dict): search_session options. e.g. cache, refresh, query, stats.
+
+    Yields:
+        tuple: profile, region and a generator of its deserialized pages.
+    """
+    for session, kwargs in jobs:
+        yield (
+            session.profile_name,
+            session.region_name,
+            search_session(session, func, **options, **kwargs),
+        )
+
+
+def search_worker(queue, session, func, cancelled=None, **kwargs):
+    """Search a single AWS session and put each deserialized page into the queue.
+    The start time of the search is put first and the queue is always closed with None,
+    errors are put before it.
+
+    Args:
+        queue (Queue): queue to put the pages into.
+        session (botocore_session): AWS session.
+        func (function): function to call.
+        cancelled (Event): stop between two pages once it is set.
+    """
+    queue.put(time.monotonic())
+    try:
+        for data in search_session(session, func, **kwargs):
+            if cancelled is not None and cancelled.is_set():
+                return
+            queue.put(data)
+    except Exception as e:
+        queue.put(e)
+    finally:
+        queue.put(None)
+
+
+def drain_queue(queue, timeout=None, deadline=None):
+    """Yield the pages of a queue filled by search_worker.
+
+    Args:
+        queue (Queue): queue filled by search_worker.
+        timeout (float): maximum number of seconds of the search of the session,
+            counted from its start. Use None to wait as long as needed.
+        deadline (float): time.monotonic() value when the whole search must end.
+            Use None to wait as long as needed.
+
+    Yields:
+        list: deserialized page of AWS resources.
+
+    Raises:
+        TimeoutError: the session or the whole search ran out of time.
+        SkippedError: the whole search ran out of time before the session started.
+    """
+    started = None
+    while True:
+        limits = []
+        if deadline is not None:
+            limits.append(deadline - time.monotonic())
+        if timeout is not None and started is not None:
+            limits.append(started + timeout - time.monotonic())
+        try:
+            # Pages already in the queue are still returned once the time is up
+            data = queue.get(timeout=max(0, min(limits)) if limits else None)
+        except Empty:
+            if deadline is not None and time.monotonic() >= deadline:
+                if started is None:
+                    raise SkippedError(
+                        "the search deadline was reached before it started"
+                    )
+                raise TimeoutError("the search deadline was reached")
+            raise TimeoutError("the session took more than {} seconds".format(timeout))
+        if data is None:
+            return
+        if isinstance(data, float):
+            started = data
             continue
+        if isinstance(data, Exception):
+            raise data
+        yield data
 
 
-def print_data(profile, region, data, output):
-    """Print the data in a table.
+def limit_calls(retries, timeouts, budget):
+    """Cap the botocore timeouts and attempts of each call by the time budget of a search.
+    Otherwise a single call may retry for several minutes after the session ran out of time.
 
     Args:
-        profile (string): AWS profile name.
-        region (string): AWS region name.
-        data (dict): dict of AWS resources.
-        output (string): output format. You can choose between table, json.
+        retries (dict): botocore retry options.
+        timeouts (dict): botocore connect_timeout and read_timeout in seconds.
+        budget (float): maximum number of seconds of the search of a session.
+
+    Returns:
+        tuple: capped retry options and timeouts.
     """
-    if output == "table":
-        print(
-            "[+] Session created for profile '{}' and region '{}'".format(
-                profile, region
+    timeouts = {name: min(float(value), budget) for name, value in timeouts.items()}
+    attempts = max(1, int(budget // timeouts["read_timeout"]))
+    return (
+        dict(retries, max_attempts=min(int(retries["max_attempts"]), attempts)),
+        timeouts,
+    )
+
+
+def search_parallel(jobs, func, workers, timeout=None, deadline=None, **options):
+    """Search the AWS sessions concurrently with a bounded pool of workers.
+    The results are yielded in the same order as the sessions and the pages of
+    the current session are yielded as soon as they arrive. The worker of a session
+    that ran out of time is abandoned and replaced, since a call can't be interrupted.
+
+    Args:
+        jobs (generator): AWS sessions and the arguments of the function for each of them.
+        func (function): function to call.
+        workers (int): maximum number of concurrent sessions.
+        timeout (float): maximum number of seconds of the search of each session.
+        deadline (float): time.monotonic() value when the whole search must end.
+        options (dict): search_session options. e.g. cache, refresh, query, stats.
+
+    Yields:
+        tuple: profile, region and a generator of its deserialized pages.
+    """
+    jobs = list(jobs)
+    queues = [Queue() for _ in jobs]
+    cancelled = [Event() for _ in jobs]
+    pending = Queue()
+    for job in enumerate(zip(jobs, queues, cancelled)):
+        pending.put(job)
+    # Sessions being searched and the ones whose worker was replaced
+    lock = Lock()
+    running = set()
+    abandoned = set()
+
+    def work():
+        while True:
+            try:
+                index, ((session, kwargs), queue, event) = pending.get_nowait()
+            except Empty:
+                return
+            with lock:
+                if event.is_set():
+                    continue
+                if deadline is not None and time.monotonic() >= deadline:
+                    continue
+                running.add(index)
+            search_worker(queue, session, func, event, **options, **kwargs)
+            with lock:
+                running.discard(index)
+                if index in abandoned:
+                    return
+
+    def abandon(index):
+        with lock:
+            cancelled[index].set()
+            if index not in running:
+                return False
+            abandoned.add(index)
+            return True
+
+    # Daemon threads don't keep the process alive on a call that outlived the deadline
+    for _ in range(min(workers, len(jobs))):
+        Thread(target=work, daemon=True).start()
+    try:
+        for index, (session, _) in enumerate(jobs):
+            yield (
+                session.profile_name,
+                session.region_name,
+                drain_queue(queues[index], timeout, deadline),
             )
+            # The session is still searched only when it ran out of time, its worker
+            # is replaced so the sessions behind it don't wait for the call to return
+            if abandon(index):
+                Thread(target=work, daemon=True).start()
+    finally:
+        for event in cancelled:
+            event.set()
+
+
+def aws_search(
+    profile_name,
+    region_name,
+    output,
+    func,
+    workers=1,
+    cache=None,
+    refresh=False,
+    offline=False,
+    regions=None,
+    accounts=None,
+    route=None,
+    stats=None,
+    stats_file=None,
+    retries=None,
+    limiter=None,
+    deadline=None,
+    timeout=None,
+    timeouts=None,
+    columns=None,
+    sort=None,
+    limit=None,
+    daemon=None,
+    chain=None,
+    **kwargs,
+):
+    """Iterate over all AWS sessions and call the function with the provided arguments.
+
+    Args:
+        profile_name (string): AWS profile name.
+        region_name (string): AWS region name.
+        output (string): output format. You can choose between table, plain, json, ndjson, csv.
+        func (function): function to call. It must yield response pages.
+        workers (int): number of sessions to search concurrently. Use 1 to search sequentially.
+        cache (InventoryCache): inventory cache. Use None to always query AWS.
+        refresh (bool): ignore cached results and query AWS.
+        offline (bool): answer from the cache only, regardless of its age.
+        regions (ProfileCache): region cache used when region_name is 'all'.
+        accounts (ProfileCache): account cache used to route the identifiers.
+        route (tuple): name of the argument holding the identifiers and the function
+            locating them, to search only the sessions that can own them. e.g. ('arns', planner.locate_arn)
+        stats (Stats): recorder of the API calls, cache, deserialization and print times.
+            A report is printed to stderr at the end. Use None to disable it.
+        stats_file (string): file to export the stats to. Files ending with '.prom' use the
+            Prometheus text format, any other one JSON.
+        retries (dict): botocore retry options. Defaults to the pool ones.
+        limiter (RateLimiter): rate limiter of the calls per account and region.
+            Use None to disable it.
+        deadline (float): maximum number of seconds of the whole search. The sessions that
+            haven't completed by then are reported as timed out, the ones that haven't
+            started as skipped. Use None to wait for all of them.
+        timeout (float): maximum number of seconds of the search of each session.
+            Use None to wait as long as needed.
+            The timeouts and attempts of each call are capped by the timeout and deadline.
+        timeouts (dict): botocore connect_timeout and read_timeout in seconds.
+            Defaults to the pool ones.
+        columns (tuple): columns of the records, see deserialize.get_columns.
+            Use None for the default columns.
+        sort (tuple): fields of the records with their order, see deserialize.get_sort.
+            The records of every session are sorted together. Use None to print the
+            records of each session as they arrive.
+        limit (int): maximum number of records. Unsorted searches stop as soon as they
+            have enough records. Use None to print all of them.
+        daemon (string): Unix socket of the search daemon. The search is sent to the daemon
+            when it is running. Use None to always search in this process.
+        chain (RoleChain): role assumed into other accounts, searched as profiles named
+            after their account IDs. Use None to search the local profiles only.
+    """
+    writer = get_writer(output)
+    if daemon is not None:
+        request = query_daemon.search_request(
+            profile_name,
+            region_name,
+            output,
+            func,
+            route,
+            {
+                "workers": workers,
+                "refresh": refresh,
+                "offline": offline,
+                "stats": stats,
+                "stats_file": stats_file,
+                "deadline": deadline,
+                "timeout": timeout,
+                "columns": columns,
+                "sort": sort,
+                "limit": limit,
+            },
+            kwargs,
         )
-        print(
-            tabulate(
-                data,
-                headers="keys",
-                tablefmt="pretty",
+        message = query_daemon.query(daemon, request)
+        # Search here when the socket is left over from a daemon that isn't running
+        if message is not None:
+            if message.get("exit"):
+                raise SystemExit(message["exit"])
+            return
+    query = query_key(func, kwargs, columns)
+    budget = min((t for t in (timeout, deadline) if t is not None), default=None)
+    if budget is not None:
+        retries, timeouts = limit_calls(
+            retries or POOL.retries, timeouts or POOL.timeouts, budget
+        )
+    if deadline is not None:
+        deadline = time.monotonic() + deadline
+    POOL.configure(retries, limiter, timeouts)
+    if accounts is not None:
+        POOL.account_ids.update(accounts.items())
+    if chain is not None and not offline:
+        for account_id in chain.assume(profile_name):
+            if accounts is not None and not accounts.get(account_id)[1]:
+                accounts.put(account_id, account_id)
+    if offline:
+        # Routed identifiers may have been searched outside the requested region
+        results = cache.search(profile_name, "all" if route else region_name, query)
+    else:
+        if route is None:
+            jobs = (
+                (session, kwargs)
+                for session in get_aws_session(profile_name, region_name, regions)
+            )
+        else:
+            jobs = plan_sessions(
+                profile_name, region_name, *route, regions, accounts, **kwargs
+            )
+        options = {
+            "cache": cache,
+            "refresh": refresh,
+            "query": query,
+            "stats": stats,
+            "columns": columns,
+        }
+        # Only a worker thread can be left behind when a session runs out of time
+        if workers > 1 or deadline is not None or timeout is not None:
+            results = search_parallel(jobs, func, workers, timeout, deadline, **options)
+        else:
+            results = search_sequential(jobs, func, **options)
+    found = False
+    failures = []
+    # Sorted searches keep the first records of every session, the others stop at the limit
+    top = [] if sort is not None else None
+    remaining = limit
+
+    def write(profile, region, data, header):
+        start = time.perf_counter()
+        writer.write(profile, region, data, header=header)
+        sys.stdout.flush()
+        if stats is not None:
+            stats.record(
+                profile,
+                region,
+                "print",
+                output,
+                time.perf_counter() - start,
+                records=len(data),
             )
+
+    POOL.stats = stats
+    try:
+        for profile, region, pages in results:
+            found = True
+            try:
+                for index, data in enumerate(pages):
+                    if top is not None:
+                        top = deserialize.select(
+                            top + [(profile, region, r) for r in data],
+                            sort,
+                            limit,
+                            get=lambda row, column: deserialize.get_value(
+                                row[2], column
+                            ),
+                        )
+                        continue
+                    if remaining is not None:
+                        data = data[:remaining]
+                        remaining -= len(data)
+                    write(profile, region, data, index == 0)
+                    if remaining == 0:
+                        break
+            except Exception as e:
+                # Keep the results of the other sessions, e.g. when AWS still
+                # throttles a session after all the retries
+                status = "failed"
+                if isinstance(e, TimeoutError):
+                    status = "timed out"
+                elif isinstance(e, SkippedError):
+                    status = "skipped"
+                failures.append((profile, region, status, str(e)))
+                print(
+                    "[-] Search {} for profile '{}' and region '{}': {}".format(
+                        status, profile, region, e
+                    ),
+                    file=sys.stderr,
+                )
+            if remaining == 0:
+                # Stop the pagination of every session, the partial results aren't cached
+                results.close()
+                break
+        for (profile, region), rows in groupby(top or [], key=lambda row: row[:2]):
+            write(profile, region, [row[2] for row in rows], True)
+    finally:
+        POOL.stats = None
+    if len(failures) > 0:
+        print(
+            "[-] Partial results, {} sessions timed out, skipped or failed: {}".format(
+                len(failures),
+                ", ".join(
+                    "{}/{} ({})".format(profile, region, status)
+                    for profile, region, status, _ in failures
+                ),
+            ),
+            file=sys.stderr,
         )
-    elif output == "json":
+    if offline and not found and output in ("table", "plain"):
         print(
-            json.dumps(
-                {
-                    "profile": profile,
-                    "region": region,
-                    "data": data,
-                },
-                indent=2,
+            "[-] No cached results for profile '{}' and region '{}'".format(
+                profile_name, region_name
             )
         )
+    if stats is not None:
+        stats.report()
+        if stats_file:
+            stats.write(stats_file)
+
+
+def aws_inventory(
+    profile_name,
+    region_name,
+    filename,
+    ttl=INVENTORY_TTL,
+    refresh=False,
+    address="private",
+    workers=1,
+    regions=None,
+    retries=None,
+    limiter=None,
+    timeouts=None,
+    chain=None,
+    **options,
+):
+    """Get an Ansible inventory file of the EC2 instances of all AWS sessions.
+    The file is reused until it expires, so playbooks don't wait for AWS.
+
+    Args:
+        profile_name (string): AWS profile name. You can use 'all' to search across all profiles.
+        region_name (string): AWS region name. You can use 'all' to search across all regions.
+        filename (string): path of the JSON inventory file.
+        ttl (int): number of seconds the inventory file is fresh.
+        refresh (bool): build the inventory even if the file is fresh.
+        address (string): address Ansible connects to, 'private' or 'public'.
+        workers (int): number of sessions to search concurrently.
+        regions (ProfileCache): region cache used when region_name is 'all'.
+        retries (dict): botocore retry options. Defaults to the pool ones.
+        limiter (RateLimiter): rate limiter of the calls per account and region.
+        timeouts (dict): botocore connect_timeout and read_timeout in seconds.
+        chain (RoleChain): role assumed into other accounts. Use None for the local profiles only.
+        options (dict): other aws_search options, unused.
+
+    Returns:
+        string: path of the inventory file.
+    """
+
+    def build():
+        POOL.configure(retries, limiter, timeouts)
+        if chain is not None:
+            chain.assume(profile_name)
+        sessions = get_aws_session(profile_name, region_name, regions)
+        return build_inventory(sessions, workers, address=address)
+
+    return load_inventory(filename, build, ttl, refresh)
 
 
 def get_region(c, region):
@@ -113,3 +826,359 @@ def get_region(c, region):
         string: AWS region name.
     """
     return c.get("AWS_REGION", "eu-central-1") if region is None else region
+
+
+def get_workers(c, workers):
+    """Get the number of workers from the context or the default value.
+
+    Args:
+        c (context): fabric context.
+        workers (int): number of concurrent sessions.
+
+    Returns:
+        int: number of concurrent sessions.
+    """
+    return int(c.get("AWS_SEARCH_WORKERS", 1) if workers is None else workers)
+
+
+def get_cache(c, offline=False):
+    """Get the inventory cache configured in the context.
+    The cache is disabled when 'AWS_CACHE_TTL' is 0, unless working offline.
+
+    Args:
+        c (context): fabric context.
+        offline (bool): the cache is required to answer offline.
+
+    Returns:
+        InventoryCache: inventory cache or None if disabled.
+    """
+    ttl = int(c.get("AWS_CACHE_TTL", CACHE_TTL))
+    if ttl <= 0 and not offline:
+        return None
+    return InventoryCache(c.get("AWS_CACHE_FILE", CACHE_FILE), ttl)
+
+
+def get_region_cache(c):
+    """Get the region cache configured in the context.
+    The cache is disabled when 'AWS_REGIONS_TTL' is 0.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        ProfileCache: region cache or None if disabled.
+    """
+    ttl = int(c.get("AWS_REGIONS_TTL", REGIONS_TTL))
+    if ttl <= 0:
+        return None
+    return ProfileCache(c.get("AWS_CACHE_FILE", CACHE_FILE), ttl, "regions")
+
+
+def get_account_cache(c):
+    """Get the account ID cache configured in the context.
+    The cache is disabled when 'AWS_ACCOUNTS_TTL' is 0.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        ProfileCache: account cache or None if disabled.
+    """
+    ttl = int(c.get("AWS_ACCOUNTS_TTL", ACCOUNTS_TTL))
+    if ttl <= 0:
+        return None
+    return ProfileCache(c.get("AWS_CACHE_FILE", CACHE_FILE), ttl, "accounts")
+
+
+def configure_catalog(c):
+    """Configure the AMI catalog from the context.
+    The catalog is disabled when 'AWS_AMI_CATALOG_TTL' is 0.
+
+    Args:
+        c (context): fabric context.
+    """
+    CATALOG.configure(
+        c.get("AWS_CACHE_FILE", CACHE_FILE),
+        int(c.get("AWS_AMI_CATALOG_TTL", CATALOG_TTL)),
+    )
+
+
+def get_retries(c):
+    """Get the botocore retry options from the context or the default values.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        dict: botocore retry options.
+    """
+    return {
+        "mode": c.get("AWS_RETRY_MODE", RETRY_MODE),
+        "max_attempts": int(c.get("AWS_MAX_ATTEMPTS", MAX_ATTEMPTS)),
+    }
+
+
+def get_rate_limiter(c):
+    """Get the rate limiter configured in the context.
+    The limiter is disabled when 'AWS_RATE_LIMIT' is 0.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        RateLimiter: rate limiter or None if disabled.
+    """
+    rate = float(c.get("AWS_RATE_LIMIT", RATE_LIMIT))
+    if rate <= 0:
+        return None
+    return RateLimiter(rate, int(c.get("AWS_RATE_BURST", RATE_BURST)))
+
+
+def get_timeouts(c):
+    """Get the botocore connection and read timeouts from the context or the default values.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        dict: botocore connect_timeout and read_timeout in seconds.
+    """
+    return {
+        "connect_timeout": float(c.get("AWS_CONNECT_TIMEOUT", CONNECT_TIMEOUT)),
+        "read_timeout": float(c.get("AWS_READ_TIMEOUT", READ_TIMEOUT)),
+    }
+
+
+def get_seconds(c, key, value):
+    """Get a number of seconds from the task arguments or the context.
+
+    Args:
+        c (context): fabric context.
+        key (string): context key of the default value.
+        value (float): number of seconds of the task arguments.
+
+    Returns:
+        float: number of seconds or None if unset or 0.
+    """
+    value = c.get(key) if value is None else value
+    return float(value) if value else None
+
+
+def get_daemon(c):
+    """Get the Unix socket of the search daemon configured in the context.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        string: path of the Unix socket or None if the daemon isn't started.
+    """
+    socket_file = path.expanduser(c.get("AWS_DAEMON_SOCKET", query_daemon.SOCKET_FILE))
+    return socket_file if path.exists(socket_file) else None
+
+
+def get_role_chain(c):
+    """Get the role chain configured in the context.
+    The chain is disabled unless 'AWS_ASSUME_ROLE' is set. 'AWS_ASSUME_ACCOUNTS' is a list of
+    account IDs, '@file' or 'organizations' for every active account of the organization.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        RoleChain: role chain or None if disabled.
+    """
+    role_name = c.get("AWS_ASSUME_ROLE")
+    if not role_name:
+        return None
+    accounts = c.get("AWS_ASSUME_ACCOUNTS", ORGANIZATIONS)
+    if isinstance(accounts, str) and accounts != ORGANIZATIONS:
+        accounts = read_values(accounts)
+    elif not isinstance(accounts, str):
+        accounts = [str(account) for account in accounts]
+    organizations = None
+    ttl = int(c.get("AWS_REGIONS_TTL", REGIONS_TTL))
+    if ttl > 0:
+        organizations = ProfileCache(
+            c.get("AWS_CACHE_FILE", CACHE_FILE), ttl, "organizations"
+        )
+    return RoleChain(
+        role_name,
+        accounts,
+        c.get("AWS_ASSUME_PROFILE", "default"),
+        int(c.get("AWS_ASSUME_DURATION", DURATION)),
+        CredentialCache(c.get("AWS_CREDENTIALS_FILE", CREDENTIALS_FILE)),
+        organizations,
+    )
+
+
+def view_options(record_type, columns=None, sort=None, limit=None):
+    """Get the aws_search options shaping the records from the task arguments.
+
+    Args:
+        record_type (type): record type of the search. e.g. deserialize.Instance
+        columns (string): columns split by comma (,), see deserialize.get_columns.
+        sort (string): sort columns split by comma (,), see deserialize.get_sort.
+        limit (int): maximum number of records.
+
+    Returns:
+        dict: keyword arguments for aws_search.
+    """
+    columns, sort = deserialize.get_sort(
+        record_type, sort, deserialize.get_columns(record_type, columns)
+    )
+    if limit is not None and int(limit) <= 0:
+        raise SystemExit("Invalid limit '{}', it must be positive".format(limit))
+    return {
+        "columns": columns,
+        "sort": sort,
+        "limit": None if limit is None else int(limit),
+    }
+
+
+def search_options(
+    c,
+    workers=None,
+    refresh=False,
+    offline=False,
+    stats=False,
+    stats_file=None,
+    deadline=None,
+    timeout=None,
+):
+    """Get the aws_search options from the task arguments and the context.
+    Stats are also collected when a stats file is set in the task or as 'AWS_STATS_FILE'.
+
+    Args:
+        c (context): fabric context.
+        workers (int): number of concurrent sessions.
+        refresh (bool): ignore cached results and query AWS.
+        offline (bool): answer from the cache only.
+        stats (bool): print a report of the API calls, cache, deserialization and print times.
+        stats_file (string): file to export the stats to, '.prom' for Prometheus or JSON.
+        deadline (float): maximum number of seconds of the whole search.
+            Defaults to 'AWS_SEARCH_DEADLINE'.
+        timeout (float): maximum number of seconds of each profile and region.
+            Defaults to 'AWS_SESSION_TIMEOUT'.
+
+    Returns:
+        dict: keyword arguments for aws_search.
+    """
+    stats_file = c.get("AWS_STATS_FILE") if stats_file is None else stats_file
+    return {
+        "workers": get_workers(c, workers),
+        "cache": get_cache(c, offline),
+        "refresh": refresh,
+        "offline": offline,
+        "regions": get_region_cache(c),
+        "accounts": get_account_cache(c),
+        "stats": Stats() if stats or stats_file else None,
+        "stats_file": stats_file,
+        "retries": get_retries(c),
+        "limiter": get_rate_limiter(c),
+        "deadline": get_seconds(c, "AWS_SEARCH_DEADLINE", deadline),
+        "timeout": get_seconds(c, "AWS_SESSION_TIMEOUT", timeout),
+        "timeouts": get_timeouts(c),
+        "daemon": get_daemon(c),
+        "chain": get_role_chain(c),
+    }
+
+
+def columns_help(record_type):
+    """Build the help of the columns option of a search.
+
+    Args:
+        record_type (type): record type of the search. e.g. deserialize.Instance
+
+    Returns:
+        string: help of the option.
+    """
+    return "Columns split by comma (,). Options: {} or 'tag:<key>'".format(
+        [k for k in deserialize.FIELDS[record_type]]
+    )
+
+
+def search_task(record_type, help=None):
+    """Turn a function into a search task taking the arguments shared by every search.
+    The function receives a 'search' argument, called with the function yielding the
+    response pages and its arguments to run aws_search with the shared ones. The shared
+    arguments the function declares itself are passed to it as well. e.g. 'sort'
+
+    Args:
+        record_type (type): record type of the search. e.g. deserialize.Instance
+        help (dict): help of the arguments of the function.
+
+    Returns:
+        function: decorator returning an invoke task.
+    """
+
+    def decorator(body):
+        parameters = list(inspect.signature(body).parameters.values())
+        own = [
+            p
+            for p in parameters[1:]
+            if p.name != "search" and p.name not in SEARCH_ARGUMENTS
+        ]
+        # The shared arguments go after the required ones to keep their short flags
+        signature = inspect.Signature(
+            parameters[:1]
+            + [p for p in own if p.default is p.empty]
+            + [
+                inspect.Parameter(
+                    name, inspect.Parameter.POSITIONAL_OR_KEYWORD, default=default
+                )
+                for name, default in SEARCH_ARGUMENTS.items()
+            ]
+            + [p for p in own if p.default is not p.empty]
+        )
+        declared = [p.name for p in parameters if p.name in SEARCH_ARGUMENTS]
+
+        @wraps(body)
+        def wrapper(c, *args, **kwargs):
+            arguments = signature.bind(c, *args, **kwargs)
+            arguments.apply_defaults()
+            arguments = dict(arguments.arguments)
+            options = {name: arguments.pop(name) for name in SEARCH_ARGUMENTS}
+
+            def search(func, **kwargs):
+                aws_search(
+                    options["profile"],
+                    get_region(c, options["region"]),
+                    options["output"],
+                    func,
+                    **search_options(
+                        c,
+                        workers=options["workers"],
+                        refresh=options["refresh"],
+                        offline=options["offline"],
+                        stats=options["stats"],
+                        stats_file=options["stats_file"],
+                        deadline=options["deadline"],
+                        timeout=options["timeout"],
+                    ),
+                    **view_options(
+                        record_type,
+                        options["columns"],
+                        options["sort"],
+                        options["limit"],
+                    ),
+                    **kwargs,
+                )
+
+            arguments.update({name: options[name] for name in declared})
+            return body(search=search, **arguments)
+
+        wrapper.__signature__ = signature
+        return task(
+            wrapper,
+            help=dict(
+                {
+                    "columns": columns_help(record_type),
+                    "sort": SORT_HELP,
+                    "limit": LIMIT_HELP,
+                },
+                **(help or {}),
+            ),
+        )
+
+    return decorator
@@ -0,0 +1,279 @@
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from threading import Lock
+
+from .paginator import paginate
+from .pool import POOL
+
+CREDENTIALS_FILE = "~/.cache/tasks/credentials.json"
+ASSUME_WORKERS = 16
+# Seconds the temporary credentials are valid
+DURATION = 3600
+# Cached credentials are renewed this number of seconds before they expire,
+# the same time botocore starts refreshing them
+REFRESH_MARGIN = 900
+SESSION_NAME = "tasks"
+# Account list assuming the role into every active account of the organization
+ORGANIZATIONS = "organizations"
+
+
+def expires_in(credentials):
+    """Get the number of seconds before temporary credentials expire.
+
+    Args:
+        credentials (dict): credentials with an ISO 8601 'Expiration'.
+
+    Returns:
+        float: number of seconds, negative once expired.
+    """
+    return datetime.fromisoformat(credentials["Expiration"]).timestamp() - time.time()
+
+
+class CredentialCache:
+    """On-disk cache of temporary credentials kept until they expire.
+    The file is only readable by the user."""
+
+    def __init__(self, filename=CREDENTIALS_FILE):
+        """Load the cached credentials.
+
+        Args:
+            filename (string): path of the JSON file.
+        """
+        self.filename = os.path.expanduser(filename)
+        self.lock = Lock()
+        try:
+            with open(self.filename, "r") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def get(self, key):
+        """Get cached credentials that aren't about to expire.
+
+        Args:
+            key (string): source profile and role ARN.
+
+        Returns:
+            dict: credentials or None if missing or expiring.
+        """
+        with self.lock:
+            credentials = self.data.get(key)
+        if credentials is None or expires_in(credentials) < REFRESH_MARGIN:
+            return None
+        return credentials
+
+    def put(self, key, credentials):
+        """Store credentials in memory, see save to write them to the file.
+
+        Args:
+            key (string): source profile and role ARN.
+            credentials (dict): AccessKeyId, SecretAccessKey, SessionToken and Expiration.
+        """
+        with self.lock:
+            self.data[key] = credentials
+
+    def save(self):
+        """Write the credentials that haven't expired to the file."""
+        directory = os.path.dirname(self.filename)
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            self.data = {k: v for k, v in self.data.items() if expires_in(v) > 0}
+            # mkstemp creates the file readable by the user only
+            fd, temp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f)
+            os.replace(temp, self.filename)
+
+
+class RoleChain:
+    """Role assumed from a source profile into a list of accounts.
+    Each account is searched as a profile named after its account ID."""
+
+    def __init__(
+        self,
+        role_name,
+        accounts=ORGANIZATIONS,
+        source_profile="default",
+        duration=DURATION,
+        cache=None,
+        organizations=None,
+    ):
+        """Create a role chain without assuming the role yet.
+
+        Args:
+            role_name (string): name of the role in every account. e.g. 'OrganizationAccountAccessRole'
+            accounts (list): account IDs or ORGANIZATIONS for the active accounts of the organization.
+            source_profile (string): AWS profile name assuming the role.
+            duration (int): number of seconds the temporary credentials are valid.
+            cache (CredentialCache): credential cache. Use None to always assume the role.
+            organizations (ProfileCache): cache of the organization accounts.
+                Use None to always list them.
+        """
+        self.role_name = role_name
+        self.accounts = accounts
+        self.source_profile = source_profile
+        self.duration = duration
+        self.cache = cache
+        self.organizations = organizations
+        self.lock = Lock()
+        self.registered = set()
+
+    def role_arn(self, account_id):
+        """Get the ARN of the role in an account.
+
+        Args:
+            account_id (string): AWS account ID.
+
+        Returns:
+            string: role ARN.
+        """
+        return f"arn:aws:iam::{account_id}:role/{self.role_name}"
+
+    def account_ids(self):
+        """Get the accounts of the chain, listing the organization accounts when needed.
+
+        Returns:
+            list: list of AWS account IDs.
+        """
+        if self.accounts != ORGANIZATIONS:
+            return self.accounts
+        if self.organizations is not None:
+            account_ids, fresh = self.organizations.get(self.source_profile)
+            if fresh:
+                return account_ids
+        client = POOL.client(self.source_profile, "us-east-1", "organizations")
+        account_ids = [
+            account["Id"]
+            for page in paginate(client, "list_accounts")
+            for account in page["Accounts"]
+            if account["Status"] == "ACTIVE"
+        ]
+        if self.organizations is not None:
+            self.organizations.put(self.source_profile, account_ids)
+        return account_ids
+
+    def includes(self, profile_name):
+        """Check whether a profile name is an account of the chain.
+
+        Args:
+            profile_name (string): AWS profile name.
+
+        Returns:
+            bool: True if the role can be assumed into it.
+        """
+        if self.accounts != ORGANIZATIONS:
+            return profile_name in self.accounts
+        return len(profile_name) == 12 and profile_name.isdigit()
+
+    def credentials(self, account_id):
+        """Get the temporary credentials of an account, from the cache when possible.
+
+        Args:
+            account_id (string): AWS account ID.
+
+        Returns:
+            dict: AccessKeyId, SecretAccessKey, SessionToken and Expiration.
+        """
+        key = f"{self.source_profile}:{self.role_arn(account_id)}"
+        credentials = None if self.cache is None else self.cache.get(key)
+        if credentials is None:
+            client = POOL.client(self.source_profile, "us-east-1", "sts")
+            response = client.assume_role(
+                RoleArn=self.role_arn(account_id),
+                RoleSessionName=SESSION_NAME,
+                DurationSeconds=self.duration,
+            )["Credentials"]
+            credentials = {
+                "AccessKeyId": response["AccessKeyId"],
+                "SecretAccessKey": response["SecretAccessKey"],
+                "SessionToken": response["SessionToken"],
+                "Expiration": response["Expiration"].isoformat(),
+            }
+            if self.cache is not None:
+                self.cache.put(key, credentials)
+        return credentials
+
+    def metadata(self, account_id, save=False):
+        """Get the temporary credentials of an account in the botocore format.
+
+        Args:
+            account_id (string): AWS account ID.
+            save (bool): write the credential cache afterwards.
+
+        Returns:
+            dict: access_key, secret_key, token and expiry_time.
+        """
+        credentials = self.credentials(account_id)
+        if save and self.cache is not None:
+            self.cache.save()
+        return {
+            "access_key": credentials["AccessKeyId"],
+            "secret_key": credentials["SecretAccessKey"],
+            "token": credentials["SessionToken"],
+            "expiry_time": credentials["Expiration"],
+        }
+
+    def register(self, account_id):
+        """Assume the role into an account and add the account to the pool as a profile.
+        The credentials are refreshed by botocore before they expire.
+        When the role can't be assumed, the error is reported by the searches of the profile.
+
+        Args:
+            account_id (string): AWS account ID.
+
+        Returns:
+            bool: True if the role was assumed.
+        """
+        from botocore.credentials import RefreshableCredentials
+
+        try:
+            credentials = RefreshableCredentials.create_from_metadata(
+                self.metadata(account_id),
+                lambda: self.metadata(account_id, save=True),
+                "assume-role",
+            )
+        except Exception as e:
+            POOL.add_profile(account_id, e)
+            return False
+        POOL.add_profile(account_id, credentials, account_id)
+        return True
+
+    def assume(self, profile_name):
+        """Assume the role concurrently into the accounts of a search.
+        Accounts already assumed by this chain are skipped.
+
+        Args:
+            profile_name (string): AWS profile name. Use 'all' for every account of the chain.
+
+        Returns:
+            list: list of the AWS account IDs assumed.
+        """
+        if profile_name == "all":
+            try:
+                account_ids = self.account_ids()
+            except Exception as e:
+                print(
+                    "[-] Could not list the accounts of the organization: {}".format(e),
+                    file=sys.stderr,
+                )
+                return []
+        elif self.includes(profile_name):
+            account_ids = [profile_name]
+        else:
+            return []
+        with self.lock:
+            missing = [a for a in account_ids if a not in self.registered]
+            if len(missing) > 0:
+                with ThreadPoolExecutor(
+                    max_workers=min(ASSUME_WORKERS, len(missing))
+                ) as executor:
+                    assumed = executor.map(self.register, missing)
+                    self.registered.update(a for a, ok in zip(missing, assumed) if ok)
+                if self.cache is not None:
+                    self.cache.save()
+        return [a for a in account_ids if a in self.registered]
@@ -0,0 +1,74 @@
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+CHUNK_WORKERS = 4
+# Maximum number of values of a single filter
+CHUNK_SIZE = 200
+# Values read from a file or stdin may also be split by new lines
+FILE_SEPARATORS = re.compile(r"[\r\n,]+")
+
+
+def read_values(values):
+    """Read a list of values from the command line, a file or stdin.
+    Duplicated and empty values are dropped.
+
+    Args:
+        values (string): values split by comma (,), '@path' to read them from a file
+            or '-' to read them from stdin. Files and stdin may also use new lines.
+
+    Returns:
+        list: list of unique values.
+    """
+    if values == "-":
+        values = [v.strip() for v in FILE_SEPARATORS.split(sys.stdin.read())]
+    elif values.startswith("@"):
+        with open(values[1:], "r") as f:
+            values = [v.strip() for v in FILE_SEPARATORS.split(f.read())]
+    else:
+        values = values.split(",")
+    return list(dict.fromkeys(v for v in values if v))
+
+
+def chunked(key, size=CHUNK_SIZE):
+    """Decorate a fetcher so a long list of values is split into API-sized chunks.
+    The first chunk is streamed one page at a time while the next ones are fetched
+    concurrently. Their pages are held until their turn, so the results keep the order
+    of the values at the cost of buffering the chunks fetched ahead.
+
+    Args:
+        key (string): name of the argument holding the values.
+        size (int): maximum number of values per call. Defaults to the values of a filter.
+
+    Returns:
+        function: decorator.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(session, **kwargs):
+            values = kwargs[key]
+            chunks = [values[i : i + size] for i in range(0, len(values), size)]
+            if len(chunks) < 2:
+                yield from func(session, **kwargs)
+                return
+            with ThreadPoolExecutor(
+                max_workers=min(CHUNK_WORKERS, len(chunks) - 1)
+            ) as executor:
+                futures = [
+                    executor.submit(list, func(session, **dict(kwargs, **{key: chunk})))
+                    for chunk in chunks[1:]
+                ]
+                try:
+                    yield from func(session, **dict(kwargs, **{key: chunks[0]}))
+                    for future in futures:
+                        yield from future.result()
+                finally:
+                    # Don't start the remaining chunks once the caller stopped reading
+                    for future in futures:
+                        future.cancel()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import time
+from os import makedirs, path
+from threading import Lock
+
+from .deserialize import as_dict
+
+CACHE_FILE = "~/.cache/tasks/inventory.sqlite"
+CACHE_TTL = 300
+REGIONS_TTL = 86400
+ACCOUNTS_TTL = 2592000
+
+
+def query_key(func, kwargs, columns=None):
+    """Build the cache key of a search.
+
+    Args:
+        func (function): function used to search.
+        kwargs (dict): arguments of the function.
+        columns (tuple): columns of the records. Use None for the default columns.
+
+    Returns:
+        string: cache key.
+    """
+    key = "{}:{}".format(func.__name__, json.dumps(kwargs, sort_keys=True))
+    return key if columns is None else "{}:{}".format(key, ",".join(columns))
+
+
+class InventoryCache:
+    """On-disk cache of deserialized AWS resources per profile, region and query."""
+
+    def __init__(self, filename=CACHE_FILE, ttl=CACHE_TTL):
+        """Open the cache database and create it if needed.
+
+        Args:
+            filename (string): path of the SQLite database.
+            ttl (int): number of seconds a cached result is fresh.
+        """
+        filename = path.expanduser(filename)
+        makedirs(path.dirname(filename), exist_ok=True)
+        self.ttl = ttl
+        self.lock = Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS inventory (
+                    profile TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (profile, region, query)
+                )""")
+
+    def get(self, profile, region, query):
+        """Get a fresh cached result.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            query (string): cache key of the search.
+
+        Returns:
+            list: cached pages of AWS resources or None if missing or expired.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM inventory WHERE profile = ? AND region = ? AND query = ? AND updated >= ?",
+                (profile, region, query, time.time() - self.ttl),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, profile, region, query, pages):
+        """Store a result in the cache.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            query (string): cache key of the search.
+            pages (list): pages of AWS resources.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO inventory VALUES (?, ?, ?, ?, ?)",
+                (
+                    profile,
+                    region,
+                    query,
+                    json.dumps([[as_dict(r) for r in page] for page in pages]),
+                    time.time(),
+                ),
+            )
+
+    def search(self, profile, region, query):
+        """Get every cached result of a query regardless of its age.
+
+        Args:
+            profile (string): AWS profile name. You can use 'all' to search across all profiles.
+            region (string): AWS region name. You can use 'all' to search across all regions.
+            query (string): cache key of the search.
+
+        Yields:
+            tuple: profile, region and the cached pages of AWS resources.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                """SELECT profile, region, data FROM inventory
+                WHERE query = ? AND (? = 'all' OR profile = ?) AND (? = 'all' OR region = ?)
+                ORDER BY profile, region""",
+                (query, profile, profile, region, region),
+            ).fetchall()
+        for profile, region, data in rows:
+            yield profile, region, json.loads(data)
+
+
+class ProfileCache:
+    """On-disk cache of a value per profile, such as its opted-in regions or account ID."""
+
+    def __init__(self, filename=CACHE_FILE, ttl=REGIONS_TTL, table="regions"):
+        """Open the cache database and create the table if needed.
+
+        Args:
+            filename (string): path of the SQLite database.
+            ttl (int): number of seconds a cached value is fresh.
+            table (string): name of the table holding the values.
+        """
+        filename = path.expanduser(filename)
+        makedirs(path.dirname(filename), exist_ok=True)
+        self.ttl = ttl
+        self.table = table
+        self.lock = Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                    profile TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+
+    def get(self, profile):
+        """Get the cached value of a profile.
+
+        Args:
+            profile (string): AWS profile name.
+
+        Returns:
+            tuple: cached value or None if missing, and whether it is fresh.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                f"SELECT data, updated FROM {self.table} WHERE profile = ?", (profile,)
+            ).fetchone()
+        if row is None:
+            return None, False
+        return json.loads(row[0]), row[1] >= time.time() - self.ttl
+
+    def put(self, profile, value):
+        """Store the value of a profile.
+
+        Args:
+            profile (string): AWS profile name.
+            value (object): JSON serializable value.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?)",
+                (profile, json.dumps(value), time.time()),
+            )
+
+    def items(self):
+        """Get every cached value regardless of its age.
+
+        Returns:
+            dict: cached values by profile name.
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT profile, data FROM {self.table}"
+            ).fetchall()
+        return {profile: json.loads(data) for profile, data in rows}
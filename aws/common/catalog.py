@@ -0,0 +1,191 @@
+import json
+import sqlite3
+import time
+from os import makedirs, path
+from threading import Lock
+
+from .cache import CACHE_FILE
+from .paginator import PAGE_SIZE, paginate
+
+# Seconds before the images created since the last refresh are added to the catalog
+CATALOG_TTL = 3600
+# Seconds before the catalog is rebuilt, dropping the deregistered images
+REBUILD_TTL = 604800
+
+
+def months_since(date):
+    """Get the creation-date filter values of every month since a date.
+
+    Args:
+        date (string): ISO 8601 date. e.g. '2024-05-17T10:04:43.000Z'
+
+    Returns:
+        list: filter values up to the current month. e.g. ['2024-05-*', '2024-06-*']
+    """
+    year, month = int(date[:4]), int(date[5:7])
+    now = time.gmtime()
+    values = []
+    while (year, month) <= (now.tm_year, now.tm_mon):
+        values.append(f"{year:04d}-{month:02d}-*")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return values
+
+
+def describe_images(session, owner_ids, filters):
+    """Get every image of the owners matching the filters.
+
+    Args:
+        session (botocore_session): AWS session.
+        owner_ids (list): List of owner IDs.
+        filters (list): List of filters.
+
+    Returns:
+        list: list of dicts of images.
+    """
+    client = session.client("ec2")
+    return [
+        image
+        for page in paginate(
+            client,
+            "describe_images",
+            page_size=PAGE_SIZE,
+            Owners=owner_ids,
+            Filters=filters,
+        )
+        for image in page["Images"]
+    ]
+
+
+class AmiCatalog:
+    """On-disk catalog of the images of the predefined AMI names per region.
+    Public images are the same for every account, so all the profiles share the catalog.
+    Once built, only the images of the months since the newest one are described."""
+
+    def __init__(self, filename=CACHE_FILE, ttl=CATALOG_TTL, rebuild_ttl=REBUILD_TTL):
+        """Create a catalog, the database is opened on first use.
+
+        Args:
+            filename (string): path of the SQLite database.
+            ttl (int): number of seconds before the new images are added. Use 0 to disable the catalog.
+            rebuild_ttl (int): number of seconds before the catalog is rebuilt.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.rebuild_ttl = rebuild_ttl
+        self.lock = Lock()
+        self.locks = {}
+        self.connection = None
+
+    def configure(self, filename=CACHE_FILE, ttl=CATALOG_TTL):
+        """Set the database and the refresh time of the catalog.
+
+        Args:
+            filename (string): path of the SQLite database.
+            ttl (int): number of seconds before the new images are added. Use 0 to disable the catalog.
+        """
+        with self.lock:
+            if filename != self.filename and self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            self.filename = filename
+            self.ttl = ttl
+
+    def connect(self):
+        """Open the catalog database and create the table if needed.
+
+        Returns:
+            sqlite3.Connection: database connection.
+        """
+        if self.connection is None:
+            filename = path.expanduser(self.filename)
+            makedirs(path.dirname(filename), exist_ok=True)
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            with self.connection:
+                self.connection.execute("""CREATE TABLE IF NOT EXISTS amis (
+                        region TEXT NOT NULL,
+                        query TEXT NOT NULL,
+                        data TEXT NOT NULL,
+                        updated REAL NOT NULL,
+                        built REAL NOT NULL,
+                        PRIMARY KEY (region, query)
+                    )""")
+        return self.connection
+
+    def get(self, region, query):
+        """Get the cached images of a predefined AMI name.
+
+        Args:
+            region (string): AWS region name.
+            query (string): owner and filters of the predefined AMI name.
+
+        Returns:
+            tuple: dicts of the images by ID, last update and build times, or None if missing.
+        """
+        with self.lock:
+            row = (
+                self.connect()
+                .execute(
+                    "SELECT data, updated, built FROM amis WHERE region = ? AND query = ?",
+                    (region, query),
+                )
+                .fetchone()
+            )
+        return None if row is None else (json.loads(row[0]), row[1], row[2])
+
+    def put(self, region, query, images, built):
+        """Store the images of a predefined AMI name.
+
+        Args:
+            region (string): AWS region name.
+            query (string): owner and filters of the predefined AMI name.
+            images (dict): dicts of the images by ID.
+            built (float): time of the last full build.
+        """
+        with self.lock, self.connect():
+            self.connection.execute(
+                "INSERT OR REPLACE INTO amis VALUES (?, ?, ?, ?, ?)",
+                (region, query, json.dumps(images), time.time(), built),
+            )
+
+    def images(self, session, ami_name):
+        """Get the images of a predefined AMI name in the session region.
+
+        Args:
+            session (botocore_session): AWS session.
+            ami_name (dict): owner and filters of the predefined AMI name, see ec2.AMI_NAMES.
+
+        Returns:
+            list: list of dicts of images.
+        """
+        owner_ids = [ami_name["owner"]]
+        if self.ttl <= 0:
+            return describe_images(session, owner_ids, ami_name["filters"])
+        region = session.region_name
+        query = json.dumps(ami_name, sort_keys=True)
+        # Refresh each region and name once when several profiles ask for it
+        with self.lock:
+            lock = self.locks.setdefault((region, query), Lock())
+        with lock:
+            cached = self.get(region, query)
+            now = time.time()
+            if cached is None or now - cached[2] >= self.rebuild_ttl:
+                images = describe_images(session, owner_ids, ami_name["filters"])
+                images = {image["ImageId"]: image for image in images}
+                self.put(region, query, images, now)
+                return list(images.values())
+            images, updated, built = cached
+            if now - updated >= self.ttl:
+                latest = max(
+                    (i["CreationDate"] for i in images.values()),
+                    default=time.strftime("%Y-%m-%d", time.gmtime(built)),
+                )
+                filters = ami_name["filters"] + [
+                    {"Name": "creation-date", "Values": months_since(latest)}
+                ]
+                for image in describe_images(session, owner_ids, filters):
+                    images[image["ImageId"]] = image
+                self.put(region, query, images, built)
+            return list(images.values())
+
+
+CATALOG = AmiCatalog()
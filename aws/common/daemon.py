@@ -0,0 +1,367 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from importlib import import_module
+from threading import Lock, Thread
+
+SOCKET_FILE = "~/.cache/tasks/daemon.sock"
+LOG_FILE = "~/.cache/tasks/daemon.log"
+# Seconds to wait for a new daemon to accept connections
+START_TIMEOUT = 10
+# Options of aws_search sent to the daemon, the other ones are owned by the daemon
+REQUEST_OPTIONS = [
+    "workers",
+    "refresh",
+    "offline",
+    "stats_file",
+    "deadline",
+    "timeout",
+]
+
+
+class SocketStream:
+    """Text stream sending everything written to it as JSON lines over a socket."""
+
+    def __init__(self, wfile, key, buffered=True):
+        """Bind the stream to the socket.
+
+        Args:
+            wfile (file): binary file of the socket.
+            key (string): key of the JSON messages. e.g. 'stdout'
+            buffered (bool): send the text on flush only, otherwise on each write.
+        """
+        self.wfile = wfile
+        self.key = key
+        self.buffered = buffered
+        self.buffer = []
+
+    def write(self, text):
+        self.buffer.append(text)
+        if not self.buffered:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            send(self.wfile, {self.key: "".join(self.buffer)})
+            self.buffer = []
+
+
+def send(wfile, message):
+    """Send a JSON message over a socket.
+
+    Args:
+        wfile (file): binary file of the socket.
+        message (dict): JSON serializable message.
+    """
+    wfile.write(json.dumps(message).encode() + b"\n")
+    wfile.flush()
+
+
+def connect(socket_file):
+    """Connect to the daemon.
+
+    Args:
+        socket_file (string): path of the Unix socket of the daemon.
+
+    Returns:
+        socket: connected socket or None if the daemon isn't running.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(os.path.expanduser(socket_file))
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def query(socket_file, request):
+    """Send a request to the daemon and print its output as it arrives.
+
+    Args:
+        socket_file (string): path of the Unix socket of the daemon.
+        request (dict): JSON serializable request.
+
+    Returns:
+        dict: last message of the daemon or None if the daemon isn't running.
+    """
+    client = connect(socket_file)
+    if client is None:
+        return None
+    answered = False
+    with client, client.makefile("rb") as rfile:
+        try:
+            client.sendall(json.dumps(request).encode() + b"\n")
+            for line in rfile:
+                answered = True
+                message = json.loads(line)
+                if "stdout" in message:
+                    sys.stdout.write(message["stdout"])
+                    sys.stdout.flush()
+                elif "stderr" in message:
+                    sys.stderr.write(message["stderr"])
+                else:
+                    return message
+        except OSError:
+            pass
+    # A daemon stopping can still accept a connection without answering it
+    return {"exit": "The daemon closed the connection"} if answered else None
+
+
+def describe(func):
+    """Get the name of a function of the aws.common package to send it to the daemon.
+
+    Args:
+        func (function): function. e.g. ec2.get_ec2_instances_by_ids
+
+    Returns:
+        string: module and function names. e.g. 'ec2:get_ec2_instances_by_ids'
+    """
+    return "{}:{}".format(func.__module__.rsplit(".", 1)[-1], func.__name__)
+
+
+def resolve(name):
+    """Get a function of the aws.common package from its name.
+    Only the fetchers and the locating functions can be resolved.
+
+    Args:
+        name (string): module and function names. e.g. 'ec2:get_ec2_instances_by_ids'
+
+    Returns:
+        function: function.
+    """
+    module, func = name.split(":")
+    if module not in ("ec2", "eni", "elb", "ip", "planner"):
+        raise ValueError(f"Unknown function '{name}'")
+    return getattr(import_module(f"{__package__}.{module}"), func)
+
+
+def search_request(profile_name, region_name, output, func, route, options, kwargs):
+    """Build the request of a search for the daemon.
+
+    Args:
+        profile_name (string): AWS profile name.
+        region_name (string): AWS region name.
+        output (string): output format.
+        func (function): function to call.
+        route (tuple): name of the argument holding the identifiers and the locating function.
+        options (dict): aws_search options. Only REQUEST_OPTIONS, stats, columns, sort
+            and limit are sent.
+        kwargs (dict): arguments of the function.
+
+    Returns:
+        dict: JSON serializable request.
+    """
+    stats_file = options.get("stats_file")
+    return {
+        "command": "search",
+        "profile_name": profile_name,
+        "region_name": region_name,
+        "output": output,
+        "func": describe(func),
+        "route": None if route is None else [route[0], describe(route[1])],
+        "options": dict(
+            {k: options.get(k) for k in REQUEST_OPTIONS},
+            stats=options.get("stats") is not None,
+            stats_file=stats_file and os.path.abspath(stats_file),
+            columns=options.get("columns"),
+            sort=options.get("sort"),
+            limit=options.get("limit"),
+        ),
+        "kwargs": kwargs,
+    }
+
+
+class Daemon:
+    """Search server keeping warm pools and caches between the searches.
+    Searches are answered one at a time, each of them runs its sessions concurrently."""
+
+    def __init__(self, c, socket_file=SOCKET_FILE):
+        """Create a daemon that isn't listening yet.
+
+        Args:
+            c (context): fabric context.
+            socket_file (string): path of the Unix socket to listen on.
+        """
+        self.c = c
+        self.socket_file = os.path.expanduser(socket_file)
+        self.state = None
+        self.lock = Lock()
+        self.started = time.time()
+        self.searches = 0
+        self.server = None
+
+    def warm(self):
+        """Import the heavy modules and resolve the credentials of every profile."""
+        from . import POOL
+        import tabulate  # noqa: F401
+
+        for profile_name in POOL.available_profiles():
+            try:
+                POOL.boto3_session(profile_name)
+            except Exception:
+                pass
+
+    def status(self):
+        """Get the status of the daemon.
+
+        Returns:
+            dict: status of the daemon.
+        """
+        from . import POOL
+
+        return {
+            "pid": os.getpid(),
+            "socket": self.socket_file,
+            "uptime": round(time.time() - self.started),
+            "searches": self.searches,
+            "sessions": len(POOL.sessions),
+            "clients": len(POOL.clients),
+        }
+
+    def search(self, request, wfile):
+        """Run a search and stream its output.
+
+        Args:
+            request (dict): search request built by search_request.
+            wfile (file): binary file of the socket.
+        """
+        from . import aws_search, search_options
+
+        options = search_options(
+            self.c,
+            **{k: request["options"][k] for k in REQUEST_OPTIONS},
+            stats=request["options"]["stats"],
+        )
+        # Keep the caches, the rate limiter and the assumed roles of the daemon warm
+        for key in ("regions", "accounts", "limiter", "chain"):
+            options[key] = self.state[key]
+        if self.state["cache"] is not None:
+            options["cache"] = self.state["cache"]
+        options["daemon"] = None
+        route = request["route"]
+        columns = request["options"]["columns"]
+        sort = request["options"]["sort"]
+        stdout = SocketStream(wfile, "stdout")
+        stderr = SocketStream(wfile, "stderr", buffered=False)
+        with self.lock, redirect_stdout(stdout), redirect_stderr(stderr):
+            self.searches += 1
+            try:
+                aws_search(
+                    request["profile_name"],
+                    request["region_name"],
+                    request["output"],
+                    resolve(request["func"]),
+                    route=None if route is None else (route[0], resolve(route[1])),
+                    columns=None if columns is None else tuple(columns),
+                    sort=None if sort is None else tuple(map(tuple, sort)),
+                    limit=request["options"]["limit"],
+                    **options,
+                    **request["kwargs"],
+                )
+            finally:
+                stdout.flush()
+                stderr.flush()
+
+    def handle(self, request, wfile):
+        """Answer a request.
+
+        Args:
+            request (dict): request with a command. e.g. 'search', 'status', 'stop'
+            wfile (file): binary file of the socket.
+        """
+        try:
+            if request["command"] == "search":
+                self.search(request, wfile)
+            elif request["command"] == "status":
+                send(wfile, {"status": self.status()})
+                return
+            elif request["command"] == "stop":
+                Thread(target=self.server.shutdown).start()
+            send(wfile, {"exit": None})
+        except SystemExit as e:
+            send(wfile, {"exit": None if e.code in (None, 0) else str(e.code)})
+        except Exception as e:
+            send(wfile, {"exit": f"Daemon error: {e!r}"})
+
+    def serve(self):
+        """Build the persistent search options and listen on the Unix socket until a stop request."""
+        from . import configure_catalog, search_options
+
+        daemon = self
+        self.state = search_options(self.c)
+        configure_catalog(self.c)
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                line = self.rfile.readline()
+                if line:
+                    daemon.handle(json.loads(line), self.wfile)
+
+        os.makedirs(os.path.dirname(self.socket_file), exist_ok=True)
+        if os.path.exists(self.socket_file):
+            os.remove(self.socket_file)
+        # Only the user can connect, the daemon searches with their credentials
+        umask = os.umask(0o077)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(
+                self.socket_file, Handler
+            )
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        Thread(target=self.warm, daemon=True).start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            os.remove(self.socket_file)
+
+
+def start(c, socket_file=SOCKET_FILE, log_file=LOG_FILE, foreground=False):
+    """Start the daemon in the background.
+
+    Args:
+        c (context): fabric context.
+        socket_file (string): path of the Unix socket to listen on.
+        log_file (string): file receiving the output of the daemon.
+        foreground (bool): serve in the current process until stopped.
+
+    Returns:
+        bool: True if the daemon accepts connections.
+    """
+    daemon = Daemon(c, socket_file)
+    if foreground:
+        daemon.serve()
+        return True
+    pid = os.fork()
+    if pid > 0:
+        os.waitpid(pid, 0)
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            client = connect(socket_file)
+            if client is not None:
+                client.close()
+                return True
+            time.sleep(0.05)
+        return False
+    # Detach from the terminal with a double fork, the daemon must never return to invoke
+    try:
+        os.setsid()
+        if os.fork() > 0:
+            os._exit(0)
+        log_file = os.path.expanduser(log_file)
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        log = os.open(log_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        null = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null, 0)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        daemon.serve()
+    finally:
+        os._exit(0)
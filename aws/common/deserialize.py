@@ -1,5 +1,84 @@
-from collections import OrderedDict
-import pandas as pd
+import heapq
+import re
+from collections import namedtuple
+from functools import cmp_to_key, lru_cache
+
+Instance = namedtuple(
+    "Instance",
+    [
+        "InstanceState",
+        "InstanceName",
+        "InstanceId",
+        "InstanceType",
+        "AvailabilityZone",
+        "PrivateIpAddress",
+        "PublicIpAddress",
+    ],
+)
+NetworkInterface = namedtuple(
+    "NetworkInterface",
+    [
+        "PrivateIp",
+        "PublicIp",
+        "NetworkInterfaceId",
+        "InterfaceType",
+        "InstanceId",
+        "AvailabilityZone",
+        "Status",
+    ],
+)
+LoadBalancer = namedtuple(
+    "LoadBalancer",
+    ["LoadBalancerName", "DNSName", "Type", "Scheme", "LoadBalancerArn"],
+)
+Image = namedtuple("Image", ["ImageId", "Name", "CreationDate"])
+IpAddress = namedtuple(
+    "IpAddress",
+    [
+        "IpAddress",
+        "ResourceType",
+        "ResourceName",
+        "ResourceId",
+        "State",
+        "NetworkInterfaceId",
+        "AvailabilityZone",
+    ],
+)
+# Columns and directions used to sort each record type
+SORT_ORDERS = {
+    Instance: (["InstanceState", "InstanceName"], [True, True]),
+    NetworkInterface: (["Status", "InterfaceType", "InstanceId"], [True, True, True]),
+    LoadBalancer: (["LoadBalancerName"], [True]),
+    Image: (["CreationDate"], [False]),
+    IpAddress: (["ResourceType", "IpAddress"], [True, True]),
+}
+ID_FIELDS = {
+    Instance: "InstanceId",
+    NetworkInterface: "NetworkInterfaceId",
+    LoadBalancer: "LoadBalancerArn",
+    Image: "ImageId",
+    IpAddress: "NetworkInterfaceId",
+}
+# Prefix of the columns holding the value of a single tag. e.g. 'tag:Environment'
+TAG_PREFIX = "tag:"
+# Prefix of the sort columns in descending order. e.g. '-LaunchTime'
+DESCENDING_PREFIX = "-"
+
+
+def find_tag(item, key):
+    """Get the value of a tag of an AWS resource.
+
+    Args:
+        item (dict): dict of an AWS resource.
+        key (string): tag key.
+
+    Returns:
+        string: value of the tag or None if missing.
+    """
+    for tag in item.get("Tags", item.get("TagSet", [])):
+        if tag["Key"] == key:
+            return tag["Value"]
+    return None
 
 
 def find_tag_name(instance):
@@ -11,158 +90,468 @@ def find_tag_name(instance):
     Returns:
         string: name of the instance.
     """
-    if "Tags" in instance:
-        for tag in instance["Tags"]:
-            if tag["Key"] == "Name":
-                return tag["Value"]
-    return None
+    return find_tag(instance, "Name")
 
 
-def sort_data(data, order, ascending):
-    """Sort the data by the provided column.
+def format_tags(item):
+    """Format all the tags of an AWS resource.
 
     Args:
-        data (dict): dict of AWS resources.
-        order (list): list of columns to sort by.
-        ascending (list): list of booleans to sort by.
+        item (dict): dict of an AWS resource.
 
     Returns:
-        dict: sorted dict of AWS resources.
+        string: tags as 'key=value' split by comma (,) or None if there are none.
     """
-    if len(data) < 1:
-        return data
-    df = pd.DataFrame(data)
-    df.sort_values(by=order, ascending=ascending, inplace=True)
-    return df.to_dict(orient="records")
+    tags = item.get("Tags", item.get("TagSet", []))
+    return ",".join(f"{t['Key']}={t['Value']}" for t in tags) or None
 
 
-def deserialize_ec2_instances(response):
-    """Deserialize the EC2 instances response.
+def format_time(value):
+    """Format a timestamp of a response.
 
     Args:
-        response (dict): dict of EC2 instances.
+        value (datetime): timestamp parsed by botocore.
+
+    Returns:
+        string: ISO 8601 timestamp or None if missing.
+    """
+    return None if value is None else value.isoformat()
+
+
+# Functions extracting each available column from the dict of an AWS resource.
+# The fields of the record types are the default columns.
+FIELDS = {
+    Instance: {
+        "InstanceState": lambda i: i.get("State", {}).get("Name"),
+        "InstanceName": find_tag_name,
+        "InstanceId": lambda i: i.get("InstanceId"),
+        "InstanceType": lambda i: i.get("InstanceType"),
+        "AvailabilityZone": lambda i: i.get("Placement", {}).get("AvailabilityZone"),
+        "PrivateIpAddress": lambda i: i.get("PrivateIpAddress"),
+        "PublicIpAddress": lambda i: i.get("PublicIpAddress"),
+        "VpcId": lambda i: i.get("VpcId"),
+        "SubnetId": lambda i: i.get("SubnetId"),
+        "LaunchTime": lambda i: format_time(i.get("LaunchTime")),
+        "ImageId": lambda i: i.get("ImageId"),
+        "KeyName": lambda i: i.get("KeyName"),
+        "Architecture": lambda i: i.get("Architecture"),
+        "Tags": format_tags,
+    },
+    NetworkInterface: {
+        "PrivateIp": lambda e: e.get("PrivateIpAddress"),
+        "PublicIp": lambda e: e.get("Association", {}).get("PublicIp"),
+        "NetworkInterfaceId": lambda e: e.get("NetworkInterfaceId"),
+        "InterfaceType": lambda e: e.get("InterfaceType"),
+        "InstanceId": lambda e: e.get("Attachment", {}).get("InstanceId"),
+        "AvailabilityZone": lambda e: e.get("AvailabilityZone"),
+        "Status": lambda e: e.get("Status"),
+        "VpcId": lambda e: e.get("VpcId"),
+        "SubnetId": lambda e: e.get("SubnetId"),
+        "Description": lambda e: e.get("Description"),
+        "MacAddress": lambda e: e.get("MacAddress"),
+        "SecurityGroups": lambda e: ",".join(g["GroupId"] for g in e.get("Groups", []))
+        or None,
+        "Tags": format_tags,
+    },
+    LoadBalancer: {
+        "LoadBalancerName": lambda lb: lb.get("LoadBalancerName"),
+        "DNSName": lambda lb: lb.get("DNSName"),
+        "Type": lambda lb: lb.get("Type"),
+        "Scheme": lambda lb: lb.get("Scheme"),
+        "LoadBalancerArn": lambda lb: lb.get("LoadBalancerArn"),
+        "VpcId": lambda lb: lb.get("VpcId"),
+        "State": lambda lb: lb.get("State", {}).get("Code"),
+        "CreatedTime": lambda lb: format_time(lb.get("CreatedTime")),
+        "IpAddressType": lambda lb: lb.get("IpAddressType"),
+        "AvailabilityZones": lambda lb: ",".join(
+            z["ZoneName"] for z in lb.get("AvailabilityZones", [])
+        )
+        or None,
+    },
+    Image: {
+        "ImageId": lambda i: i.get("ImageId"),
+        "Name": lambda i: i.get("Name"),
+        "CreationDate": lambda i: i.get("CreationDate"),
+        "Architecture": lambda i: i.get("Architecture"),
+        "State": lambda i: i.get("State"),
+        "OwnerId": lambda i: i.get("OwnerId"),
+        "Description": lambda i: i.get("Description"),
+        "Tags": format_tags,
+    },
+    IpAddress: {
+        "IpAddress": lambda a: a.get("IpAddress"),
+        "ResourceType": lambda a: a.get("ResourceType"),
+        "ResourceName": lambda a: a.get("ResourceName"),
+        "ResourceId": lambda a: a.get("ResourceId"),
+        "State": lambda a: a.get("State"),
+        "NetworkInterfaceId": lambda a: a.get("NetworkInterfaceId"),
+        "AvailabilityZone": lambda a: a.get("AvailabilityZone"),
+        "InterfaceType": lambda a: a.get("InterfaceType"),
+        "VpcId": lambda a: a.get("VpcId"),
+        "SubnetId": lambda a: a.get("SubnetId"),
+        "Description": lambda a: a.get("Description"),
+        "PrivateIp": lambda a: a.get("PrivateIp"),
+        "PublicIp": lambda a: a.get("PublicIp"),
+        "InstanceType": lambda a: a.get("InstanceType"),
+        "DNSName": lambda a: a.get("DNSName"),
+        "Tags": format_tags,
+    },
+}
+
+
+def get_columns(record_type, columns):
+    """Parse and validate the columns of a search.
+
+    Args:
+        record_type (type): record type of the search. e.g. Instance
+        columns (string): columns split by comma (,). Use 'tag:<key>' for the value of a tag.
+            Use None for the default columns.
 
     Returns:
-        dict: dict of EC2 instances.
-    """
-    instances = []
-    for reservation in response["Reservations"]:
-        for instance in reservation["Instances"]:
-            instances.append(
-                OrderedDict(
-                    [
-                        ("InstanceState", instance.get("State", None).get("Name")),
-                        ("InstanceName", find_tag_name(instance)),
-                        ("InstanceId", instance.get("InstanceId", None)),
-                        ("InstanceType", instance.get("InstanceType", None)),
-                        (
-                            "AvailabilityZone",
-                            instance.get("Placement", None).get(
-                                "AvailabilityZone", None
-                            ),
-                        ),
-                        ("PrivateIpAddress", instance.get("PrivateIpAddress", None)),
-                        ("PublicIpAddress", instance.get("PublicIpAddress", None)),
-                    ]
+        tuple: column names or None for the default columns.
+    """
+    if columns is None:
+        return None
+    names = tuple(dict.fromkeys(c.strip() for c in columns.split(",") if c.strip()))
+    for name in names:
+        if name not in FIELDS[record_type] and not name.startswith(TAG_PREFIX):
+            raise SystemExit(
+                "Invalid column '{}'. Options available: {} or '{}<key>'".format(
+                    name, [k for k in FIELDS[record_type]], TAG_PREFIX
                 )
             )
-    return sort_data(instances, ["InstanceState", "InstanceName"], [True, True])
+    return names or None
 
 
-def deserialize_enis(response):
-    """Deserialize the ENIs response.
+def get_field(record_type, column):
+    """Get the function extracting a column from the dict of an AWS resource.
 
     Args:
-        response (dict): dict of ENIs.
+        record_type (type): record type. e.g. Instance
+        column (string): column name.
 
     Returns:
-        dict: dict of ENIs.
-    """
-    enis = []
-    for eni in response["NetworkInterfaces"]:
-        enis.append(
-            OrderedDict(
-                [
-                    ("PrivateIp", eni.get("PrivateIpAddress", None)),
-                    ("PublicIp", eni.get("Association", None).get("PublicIp", None)),
-                    ("NetworkInterfaceId", eni.get("NetworkInterfaceId", None)),
-                    ("InterfaceType", eni.get("InterfaceType", None)),
-                    ("InstanceId", eni.get("Attachment", None).get("InstanceId", None)),
-                    ("AvailabilityZone", eni.get("AvailabilityZone", None)),
-                    ("Status", eni.get("Status", None)),
-                ]
-            )
-        )
-    return sort_data(
-        enis, ["Status", "InterfaceType", "InstanceId"], [True, True, True]
+        function: function taking the dict of an AWS resource.
+    """
+    if column.startswith(TAG_PREFIX):
+        key = column[len(TAG_PREFIX) :]
+        return lambda item: find_tag(item, key)
+    return FIELDS[record_type][column]
+
+
+def field_name(column):
+    """Get the name of the record field holding a column. Outputs keep the column name.
+
+    Args:
+        column (string): column name. e.g. 'tag:aws:env'
+
+    Returns:
+        string: field name. e.g. 'Tag_aws_env'
+    """
+    if column.startswith(TAG_PREFIX):
+        return "Tag_" + re.sub(r"\W", "_", column[len(TAG_PREFIX) :])
+    return column
+
+
+def get_sort(record_type, sort, columns=None):
+    """Parse and validate the sort columns of a search.
+    Sort columns missing from the columns of the search are added to them,
+    so the records of every session can be compared.
+
+    Args:
+        record_type (type): record type of the search. e.g. Instance
+        sort (string): columns split by comma (,), prefixed with '-' for a descending order.
+            e.g. '-LaunchTime,InstanceName'. Use None to keep the order of the results.
+        columns (tuple): columns of the search, see get_columns.
+
+    Returns:
+        tuple: columns of the search, and the sort columns with their order as
+            (column, ascending) pairs or None.
+    """
+    if sort is None:
+        return columns, None
+    names = [c.strip() for c in sort.split(",") if c.strip()]
+    pairs = [
+        (name.lstrip(DESCENDING_PREFIX), not name.startswith(DESCENDING_PREFIX))
+        for name in names
+    ]
+    sort_columns = tuple(column for column, _ in pairs)
+    get_columns(record_type, ",".join(sort_columns))
+    displayed = record_type._fields if columns is None else columns
+    missing = tuple(c for c in dict.fromkeys(sort_columns) if c not in displayed)
+    if len(missing) > 0:
+        columns = displayed + missing
+    return columns, tuple(pairs) or None
+
+
+def get_value(record, column):
+    """Get a column of a record or of a cached dict.
+
+    Args:
+        record (namedtuple): record of an AWS resource or its dict.
+        column (string): column name. e.g. 'tag:env'
+
+    Returns:
+        object: value of the column.
+    """
+    if isinstance(record, dict):
+        return record.get(column)
+    index = getattr(record, "_index", None)
+    return getattr(record, column) if index is None else record[index[column]]
+
+
+def sort_key(sort, get=get_value):
+    """Get the key comparing records in the sort order. Missing values are sorted last.
+
+    Args:
+        sort (tuple): columns with their order as (column, ascending) pairs, see get_sort.
+        get (function): function getting a column of the item to compare.
+
+    Returns:
+        function: key function for sorted, min, max or heapq.
+    """
+
+    def compare(a, b):
+        for column, ascending in sort:
+            x, y = get(a, column), get(b, column)
+            if x == y:
+                continue
+            if x is None or y is None:
+                return 1 if x is None else -1
+            result = -1 if x < y else 1
+            return result if ascending else -result
+        return 0
+
+    return cmp_to_key(compare)
+
+
+def select(items, sort, limit=None, get=get_value):
+    """Select the first items in the sort order.
+    A bounded heap is used when there is a limit, instead of sorting every item.
+
+    Args:
+        items (iterable): items to sort.
+        sort (tuple): columns with their order as (column, ascending) pairs, see get_sort.
+        limit (int): maximum number of items. Use None to keep all of them.
+        get (function): function getting a column of an item.
+
+    Returns:
+        list: sorted items.
+    """
+    key = sort_key(sort, get)
+    if limit is None:
+        return sorted(items, key=key)
+    return heapq.nsmallest(limit, items, key=key)
+
+
+@lru_cache(maxsize=None)
+def projection(record_type, columns=None):
+    """Get the record type and the extracting functions of a set of columns.
+    Fields of tag keys that can't be told apart once sanitized are renamed by position,
+    the record type keeps the column names for the outputs.
+
+    Args:
+        record_type (type): record type. e.g. Instance
+        columns (tuple): column names. Use None for the fields of the record type.
+
+    Returns:
+        tuple: record type of the columns and the function extracting each of them.
+    """
+    if columns is None or columns == record_type._fields:
+        return record_type, [get_field(record_type, c) for c in record_type._fields]
+    record = namedtuple(
+        record_type.__name__, [field_name(c) for c in columns], rename=True
     )
+    record._columns = columns
+    record._index = {column: i for i, column in enumerate(columns)}
+    return record, [get_field(record_type, c) for c in columns]
 
 
-def deserialize_elbs(response):
-    """Deserialize the ELBs response.
+def as_dict(record):
+    """Convert a record into a dict.
 
     Args:
-        response (dict): dict of ELBs.
+        record (namedtuple): record of an AWS resource. A dict is returned as it is.
 
     Returns:
-        dict: dict of ELBs.
+        dict: dict of the AWS resource.
     """
-    elbs = []
-    for elb in response["LoadBalancers"]:
-        elbs.append(
-            OrderedDict(
-                [
-                    ("LoadBalancerName", elb.get("LoadBalancerName", None)),
-                    ("DNSName", elb.get("DNSName", None)),
-                    ("Type", elb.get("Type", None)),
-                    ("Scheme", elb.get("Scheme", None)),
-                    ("LoadBalancerArn", elb.get("LoadBalancerArn", None)),
-                ]
-            )
-        )
-    return sort_data(elbs, ["LoadBalancerName"], [True])
+    if not hasattr(record, "_asdict"):
+        return record
+    columns = getattr(record, "_columns", None)
+    return record._asdict() if columns is None else dict(zip(columns, record))
 
 
-def deserialize_images(response):
-    """Deserialize the images response.
+def sort_data(data, order, ascending, key=getattr):
+    """Sort the data by the provided columns. Missing values are sorted last.
 
     Args:
-        response (dict): dict of images.
+        data (iterable): records of AWS resources.
+        order (list): list of columns to sort by.
+        ascending (list): list of booleans to sort by.
+        key (function): function getting the value of a column of a record.
 
     Returns:
-        dict: dict of images.
+        list: sorted records of AWS resources.
     """
-    images = []
-    for image in response["Images"]:
-        images.append(
-            OrderedDict(
-                [
-                    ("ImageId", image.get("ImageId", None)),
-                    ("Name", image.get("Name", None)),
-                    ("CreationDate", image.get("CreationDate", None)),
-                ]
+    data = list(data)
+    # Stable sorts from the last column to the first one give a multi-column sort
+    for column, asc in reversed(list(zip(order, ascending))):
+        if asc:
+            data.sort(key=lambda r: (key(r, column) is None, key(r, column)))
+        else:
+            data.sort(
+                key=lambda r: (key(r, column) is not None, key(r, column)),
+                reverse=True,
             )
-        )
-    return sort_data(images, ["CreationDate"], [False])
+    return data
 
 
-def deserialize(response):
-    """Deserialize the response.
+def iter_items(response):
+    """Iterate over the dicts of the AWS resources of a response.
 
     Args:
         response (dict): dict of AWS resources.
 
     Returns:
-        dict: dict of AWS resources.
+        tuple: record type and an iterator of the dicts of the AWS resources,
+            or None and an empty iterator for an unknown response.
     """
     if "Reservations" in response:
-        return deserialize_ec2_instances(response)
+        return Instance, (i for r in response["Reservations"] for i in r["Instances"])
     elif "NetworkInterfaces" in response:
-        return deserialize_enis(response)
+        return NetworkInterface, iter(response["NetworkInterfaces"])
     elif "LoadBalancers" in response:
-        return deserialize_elbs(response)
+        return LoadBalancer, iter(response["LoadBalancers"])
     elif "Images" in response:
-        return deserialize_images(response)
-    else:
+        return Image, iter(response["Images"])
+    elif "IpAddresses" in response:
+        return IpAddress, iter(response["IpAddresses"])
+    return None, iter(())
+
+
+def project(record_type, items, columns=None, seen=None):
+    """Extract the columns of the dicts of AWS resources into records.
+
+    Args:
+        record_type (type): record type of the AWS resources. e.g. Instance
+        items (iterable): dicts of the AWS resources.
+        columns (tuple): column names. Use None for the default columns.
+        seen (set): IDs of the resources already found. The resources in it are skipped
+            and the new ones are added to it. Use None to keep every resource.
+
+    Yields:
+        namedtuple: record of an AWS resource.
+    """
+    record, fields = projection(record_type, columns)
+    if seen is not None:
+        get_id = FIELDS[record_type][ID_FIELDS[record_type]]
+        items = (i for i in items if not (get_id(i) in seen or seen.add(get_id(i))))
+    for item in items:
+        yield record._make([field(item) for field in fields])
+
+
+def iter_records(response, columns=None, seen=None):
+    """Iterate over the AWS resources of a response as records of the columns.
+
+    Args:
+        response (dict): dict of AWS resources.
+        columns (tuple): column names. Use None for the default columns.
+        seen (set): IDs of the resources already found, skipped and updated.
+            Use None to keep every resource.
+
+    Yields:
+        namedtuple: record of an AWS resource.
+    """
+    record_type, items = iter_items(response)
+    if record_type is not None:
+        yield from project(record_type, items, columns, seen)
+
+
+def iter_ec2_instances(response):
+    """Iterate over the EC2 instances of a response.
+
+    Args:
+        response (dict): dict of EC2 instances.
+
+    Yields:
+        Instance: EC2 instance.
+    """
+    return iter_records(response)
+
+
+def iter_enis(response):
+    """Iterate over the ENIs of a response.
+
+    Args:
+        response (dict): dict of ENIs.
+
+    Yields:
+        NetworkInterface: ENI.
+    """
+    return iter_records(response)
+
+
+def iter_elbs(response):
+    """Iterate over the ELBs of a response.
+
+    Args:
+        response (dict): dict of ELBs.
+
+    Yields:
+        LoadBalancer: ELB.
+    """
+    return iter_records(response)
+
+
+def iter_images(response):
+    """Iterate over the images of a response.
+
+    Args:
+        response (dict): dict of images.
+
+    Yields:
+        Image: image.
+    """
+    return iter_records(response)
+
+
+def deserialize_ec2_instances(response):
+    """Deserialize the EC2 instances response.
+
+    Args:
+        response (dict): dict of EC2 instances.
+
+    Returns:
+        list: sorted list of EC2 instances.
+    """
+    return sort_data(iter_ec2_instances(response), *SORT_ORDERS[Instance])
+
+
+def deserialize(response, columns=None, seen=None):
+    """Deserialize the response into sorted records of the columns.
+    Only the requested columns are extracted, so the response can be released right after.
+
+    Args:
+        response (dict): dict of AWS resources.
+        columns (tuple): column names. Use None for the default columns.
+        seen (set): IDs of the resources already found, skipped and updated.
+            Use None to keep every resource.
+
+    Returns:
+        list: sorted list of AWS resources.
+    """
+    record_type, items = iter_items(response)
+    if record_type is None:
         print(response)
         return None
+    order, ascending = SORT_ORDERS[record_type]
+    record, _ = projection(record_type, columns)
+    if set(order) <= set(record._fields):
+        return sort_data(project(record_type, items, columns, seen), order, ascending)
+    # The sort columns aren't displayed, sort the dicts before extracting the columns
+    fields = FIELDS[record_type]
+    items = sort_data(
+        items, order, ascending, key=lambda item, column: fields[column](item)
+    )
+    return list(project(record_type, items, columns, seen))
@@ -1,3 +1,9 @@
+import heapq
+
+from .batch import chunked
+from .catalog import CATALOG
+from .paginator import PAGE_SIZE, paginate
+
 AMI_NAMES = {
     "amzn2-x86_64": {
         "owner": "amazon",
@@ -22,6 +28,7 @@ AMI_NAMES = {
 }
 
 
+@chunked("instance_ids")
 def get_ec2_instances_by_ids(session, instance_ids):
     """Get all EC2 instances with a specific instance ID.
 
@@ -29,22 +36,20 @@ def get_ec2_instances_by_ids(session, instance_ids):
         session (botocore_session): AWS session.
         instance_ids (list): List of instance IDs.
 
-    Returns:
-        list: List of EC2 instances.
+    Yields:
+        dict: page of EC2 instances.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_instances(InstanceIds=instance_ids)
-        return response
-    except client.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "InvalidInstanceID.NotFound":
-            return {"Reservations": []}
-        else:
-            return None
-    except Exception as e:
-        return None
+    # A filter doesn't fail the whole call when one of the IDs doesn't exist
+    yield from paginate(
+        client,
+        "describe_instances",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "instance-id", "Values": instance_ids}],
+    )
 
 
+@chunked("tag_values")
 def get_ec2_instances_by_tags(session, tag_key, tag_values):
     """Get all EC2 instances with a specific tag.
 
@@ -53,19 +58,19 @@ def get_ec2_instances_by_tags(session, tag_key, tag_values):
         tag_key (string): Tag key.
         tag_values (list): List of tag values.
 
-    Returns:
-        list: List of EC2 instances.
+    Yields:
+        dict: page of EC2 instances.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_instances(
-            Filters=[{"Name": "tag:{}".format(tag_key), "Values": tag_values}]
-        )
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_instances",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "tag:{}".format(tag_key), "Values": tag_values}],
+    )
 
 
+@chunked("private_ips")
 def get_ec2_instances_by_private_ips(session, private_ips):
     """Get all EC2 instances with a specific private IP.
 
@@ -73,19 +78,19 @@ def get_ec2_instances_by_private_ips(session, private_ips):
         session (botocore_session): AWS session.
         private_ips (list): List of private IPs.
 
-    Returns:
-        list: List of EC2 instances.
+    Yields:
+        dict: page of EC2 instances.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_instances(
-            Filters=[{"Name": "private-ip-address", "Values": private_ips}]
-        )
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_instances",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "private-ip-address", "Values": private_ips}],
+    )
 
 
+@chunked("public_ips")
 def get_ec2_instances_by_public_ips(session, public_ips):
     """Get all EC2 instances with a specific public IP.
 
@@ -93,17 +98,39 @@ def get_ec2_instances_by_public_ips(session, public_ips):
         session (botocore_session): AWS session.
         public_ips (list): List of public IPs.
 
-    Returns:
-        list: List of EC2 instances.
+    Yields:
+        dict: page of EC2 instances.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_instances(
-            Filters=[{"Name": "ip-address", "Values": public_ips}]
-        )
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_instances",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "ip-address", "Values": public_ips}],
+    )
+
+
+def get_ec2_instances(session, states=None):
+    """Get all EC2 instances, optionally only the ones in specific states.
+
+    Args:
+        session (botocore_session): AWS session.
+        states (list): List of instance states. e.g. ['running', 'stopped']
+            Use None for every state.
+
+    Yields:
+        dict: page of EC2 instances.
+    """
+    client = session.client("ec2")
+    filters = []
+    if states is not None:
+        filters.append({"Name": "instance-state-name", "Values": states})
+    yield from paginate(
+        client,
+        "describe_instances",
+        page_size=PAGE_SIZE,
+        Filters=filters,
+    )
 
 
 def get_amis(session, owner_ids, filters):
@@ -112,13 +139,34 @@ def get_amis(session, owner_ids, filters):
     Args:
         session (botocore_session): AWS session.
         owner_ids (list): List of owner IDs.
+        filters (list): List of filters.
 
-    Returns:
-        list: List of AMIs.
+    Yields:
+        dict: page of AMIs.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_images(Owners=owner_ids, Filters=filters)
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_images",
+        page_size=PAGE_SIZE,
+        Owners=owner_ids,
+        Filters=filters,
+    )
+
+
+def get_amis_by_name(session, name, newest=None):
+    """Get the AMIs of a predefined name from the AMI catalog of the session region.
+
+    Args:
+        session (botocore_session): AWS session.
+        name (string): predefined AMI name, see AMI_NAMES.
+        newest (int): number of newest AMIs to keep. Use None to keep all of them.
+
+    Yields:
+        dict: page of AMIs.
+    """
+    images = CATALOG.images(session, AMI_NAMES[name])
+    if newest is not None:
+        # Select the newest ones without sorting the whole catalog
+        images = heapq.nlargest(newest, images, key=lambda i: i.get("CreationDate", ""))
+    yield {"Images": images}
@@ -1,3 +1,57 @@
+import sys
+
+from .batch import chunked
+from .paginator import is_not_found, paginate
+
+PAGE_SIZE = 400
+# Maximum number of ARNs or names of a single call
+CHUNK_SIZE = 20
+
+
+def describe_existing(client, argument, values, missing):
+    """Describe the ELBs of a list of identifiers, skipping the ones that don't exist.
+    ELBv2 fails the whole call when one of them is missing, so the list is split
+    in halves until the missing ones are found.
+
+    Args:
+        client (botocore_client): ELBv2 client.
+        argument (string): argument of the identifiers. e.g. 'Names'
+        values (list): list of ARNs or names.
+        missing (list): list the identifiers that don't exist are added to.
+
+    Yields:
+        dict: page of ELBs.
+    """
+    try:
+        yield from paginate(client, "describe_load_balancers", **{argument: values})
+    except Exception as e:
+        if not is_not_found(e):
+            raise
+        if len(values) == 1:
+            missing.extend(values)
+            return
+        half = len(values) // 2
+        yield from describe_existing(client, argument, values[:half], missing)
+        yield from describe_existing(client, argument, values[half:], missing)
+
+
+def report_missing(session, missing):
+    """Print the ELB identifiers that don't exist in a session.
+
+    Args:
+        session (botocore_session): AWS session.
+        missing (list): list of ARNs or names.
+    """
+    if len(missing) > 0:
+        print(
+            "[-] ELBs not found for profile '{}' and region '{}': {}".format(
+                session.profile_name, session.region_name, ", ".join(missing)
+            ),
+            file=sys.stderr,
+        )
+
+
+@chunked("arns", CHUNK_SIZE)
 def get_elbs_by_arns(session, arns):
     """Get all ELBs with a specific ARN.
 
@@ -5,18 +59,16 @@ def get_elbs_by_arns(session, arns):
         session (botocore_session): AWS session.
         arns (list): List of ARNs.
 
-    Returns:
-        list: List of ELBs.
+    Yields:
+        dict: page of ELBs.
     """
+    missing = []
     client = session.client("elbv2")
-    try:
-        response = client.describe_load_balancers(LoadBalancerArns=arns)
-        print(response)
-        return response
-    except Exception:
-        return None
+    yield from describe_existing(client, "LoadBalancerArns", arns, missing)
+    report_missing(session, missing)
 
 
+@chunked("names", CHUNK_SIZE)
 def get_elbs_by_names(session, names):
     """Get all ELBs with a specific name.
 
@@ -24,15 +76,13 @@ def get_elbs_by_names(session, names):
         session (botocore_session): AWS session.
         names (list): List of names.
 
-    Returns:
-        list: List of ELBs.
+    Yields:
+        dict: page of ELBs.
     """
+    missing = []
     client = session.client("elbv2")
-    try:
-        response = client.describe_load_balancers(Names=names)
-        return response
-    except Exception:
-        return None
+    yield from describe_existing(client, "Names", names, missing)
+    report_missing(session, missing)
 
 
 def get_elbs_by_dns_names(session, dns_names):
@@ -42,16 +92,13 @@ def get_elbs_by_dns_names(session, dns_names):
         session (botocore_session): AWS session.
         dns_names (list): List of DNS names.
 
-    Returns:
-        list: List of ELBs.
+    Yields:
+        dict: page of ELBs.
     """
     client = session.client("elbv2")
-    try:
-        elbs = client.describe_load_balancers()
-        response = {"LoadBalancers": []}
-        for elb in elbs["LoadBalancers"]:
-            if elb["DNSName"] in dns_names:
-                response["LoadBalancers"].append(elb)
-        return response
-    except Exception:
-        return None
+    for page in paginate(client, "describe_load_balancers", page_size=PAGE_SIZE):
+        yield {
+            "LoadBalancers": [
+                elb for elb in page["LoadBalancers"] if elb["DNSName"] in dns_names
+            ]
+        }
@@ -1,3 +1,8 @@
+from .batch import chunked
+from .paginator import PAGE_SIZE, paginate
+
+
+@chunked("private_ips")
 def get_enis_by_private_ips(session, private_ips):
     """Get all ENIs with a specific private IP.
 
@@ -5,19 +10,19 @@ def get_enis_by_private_ips(session, private_ips):
         session (botocore_session): AWS session.
         private_ips (list): List of private IPs.
 
-    Returns:
-        list: List of ENIs.
+    Yields:
+        dict: page of ENIs.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_network_interfaces(
-            Filters=[{"Name": "addresses.private-ip-address", "Values": private_ips}]
-        )
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_network_interfaces",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "addresses.private-ip-address", "Values": private_ips}],
+    )
 
 
+@chunked("public_ips")
 def get_enis_by_public_ips(session, public_ips):
     """Get all ENIs with a specific public IP.
 
@@ -25,14 +30,13 @@ def get_enis_by_public_ips(session, public_ips):
         session (botocore_session): AWS session.
         public_ips (list): List of public IPs.
 
-    Returns:
-        list: List of ENIs.
+    Yields:
+        dict: page of ENIs.
     """
     client = session.client("ec2")
-    try:
-        response = client.describe_network_interfaces(
-            Filters=[{"Name": "addresses.association.public-ip", "Values": public_ips}]
-        )
-        return response
-    except Exception:
-        return None
+    yield from paginate(
+        client,
+        "describe_network_interfaces",
+        page_size=PAGE_SIZE,
+        Filters=[{"Name": "addresses.association.public-ip", "Values": public_ips}],
+    )
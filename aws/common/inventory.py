@@ -0,0 +1,170 @@
+import json
+import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, path, replace, utime
+
+from . import deserialize, ec2
+from .pool import FailedSession
+
+INVENTORY_DIR = "~/.cache/tasks"
+INVENTORY_TTL = 300
+# Terminated instances can't be reached, they are left out of the inventory
+INVENTORY_STATES = ["pending", "running", "stopping", "stopped"]
+# Host variables and the columns of the EC2 instances holding them
+HOST_VARS = {
+    "ec2_instance_id": "InstanceId",
+    "ec2_name": "InstanceName",
+    "ec2_state": "InstanceState",
+    "ec2_instance_type": "InstanceType",
+    "ec2_availability_zone": "AvailabilityZone",
+    "ec2_private_ip_address": "PrivateIpAddress",
+    "ec2_public_ip_address": "PublicIpAddress",
+    "ec2_vpc_id": "VpcId",
+    "ec2_image_id": "ImageId",
+}
+# Columns of the address Ansible connects to
+ADDRESSES = {"private": "PrivateIpAddress", "public": "PublicIpAddress"}
+
+
+def group_name(prefix, value):
+    """Build an Ansible group name. Characters Ansible doesn't allow are replaced by '_'.
+
+    Args:
+        prefix (string): kind of group. e.g. 'az'
+        value (string): value shared by the hosts of the group. e.g. 'eu-central-1a'
+
+    Returns:
+        string: group name. e.g. 'az_eu_central_1a'
+    """
+    return re.sub(r"[^A-Za-z0-9_]", "_", f"{prefix}_{value}")
+
+
+def host_entry(item, profile, region, address="private"):
+    """Build the host variables and the groups of an EC2 instance.
+
+    Args:
+        item (dict): dict of an EC2 instance.
+        profile (string): AWS profile name.
+        region (string): AWS region name.
+        address (string): address Ansible connects to, 'private' or 'public'.
+            The private one is used when the instance has no public one.
+
+    Returns:
+        tuple: host name, host variables and group names.
+    """
+    fields = deserialize.FIELDS[deserialize.Instance]
+    hostvars = {var: fields[column](item) for var, column in HOST_VARS.items()}
+    tags = {tag["Key"]: tag["Value"] for tag in item.get("Tags", [])}
+    hostvars.update(ec2_tags=tags, ec2_profile=profile, ec2_region=region)
+    host = fields[ADDRESSES[address]](item) or hostvars["ec2_private_ip_address"]
+    if host is not None:
+        hostvars["ansible_host"] = host
+    groups = [
+        "aws_ec2",
+        group_name("profile", profile),
+        group_name("region", region),
+        group_name("az", hostvars["ec2_availability_zone"]),
+        group_name("state", hostvars["ec2_state"]),
+    ]
+    groups.extend(group_name(f"tag_{k}", v) for k, v in tags.items())
+    return hostvars["ec2_instance_id"], hostvars, groups
+
+
+def fetch_hosts(session, states=INVENTORY_STATES, address="private"):
+    """Get the inventory entries of the EC2 instances of a session.
+
+    Args:
+        session (botocore_session): AWS session.
+        states (list): states of the instances to keep.
+        address (string): address Ansible connects to, 'private' or 'public'.
+
+    Returns:
+        list: host name, host variables and group names of each instance.
+    """
+    if isinstance(session, FailedSession):
+        raise session.error
+    hosts = []
+    for response in ec2.get_ec2_instances(session, states=states):
+        _, items = deserialize.iter_items(response)
+        hosts.extend(
+            host_entry(item, session.profile_name, session.region_name, address)
+            for item in items
+        )
+    return hosts
+
+
+def build_inventory(sessions, workers=1, states=INVENTORY_STATES, address="private"):
+    """Build an Ansible YAML inventory of the EC2 instances of the sessions.
+    Hosts are named after their instance ID and grouped by profile, region,
+    availability zone, state and each of their tags.
+
+    Args:
+        sessions (iterable): AWS sessions.
+        workers (int): number of sessions to search concurrently.
+        states (list): states of the instances to keep.
+        address (string): address Ansible connects to, 'private' or 'public'.
+
+    Returns:
+        tuple: inventory and whether every session was searched.
+    """
+    hosts = {}
+    children = {}
+    complete = True
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            (session, executor.submit(fetch_hosts, session, states, address))
+            for session in sessions
+        ]
+        for session, future in futures:
+            try:
+                entries = future.result()
+            except Exception as e:
+                complete = False
+                print(
+                    "[-] Inventory failed for profile '{}' and region '{}': {}".format(
+                        session.profile_name, session.region_name, e
+                    ),
+                    file=sys.stderr,
+                )
+                continue
+            for name, hostvars, groups in entries:
+                hosts[name] = hostvars
+                for group in groups:
+                    children.setdefault(group, {"hosts": {}})["hosts"][name] = None
+    inventory = {"all": {"hosts": hosts, "children": dict(sorted(children.items()))}}
+    return inventory, complete
+
+
+def load_inventory(filename, build, ttl=INVENTORY_TTL, refresh=False):
+    """Get an inventory file, building it only when it is missing or expired.
+
+    Args:
+        filename (string): path of the JSON inventory file.
+        build (function): function returning the inventory and whether it is complete.
+        ttl (int): number of seconds the inventory file is fresh.
+        refresh (bool): build the inventory even if the file is fresh.
+
+    Returns:
+        string: path of the inventory file.
+    """
+    filename = path.expanduser(filename)
+    if (
+        not refresh
+        and path.exists(filename)
+        and time.time() - path.getmtime(filename) < ttl
+    ):
+        return filename
+    inventory, complete = build()
+    directory = path.dirname(filename)
+    makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".json")
+    with open(fd, "w") as f:
+        json.dump(inventory, f)
+    replace(temp, filename)
+    if not complete:
+        # Build a partial inventory again on the next run
+        utime(filename, (0, 0))
+    return filename
@@ -0,0 +1,245 @@
+import ipaddress
+
+from . import ec2, elb
+from .batch import chunked
+from .deserialize import find_tag_name
+from .paginator import PAGE_SIZE, paginate
+
+# ELB types whose network interfaces are described as 'ELB <type>/<name>/<id>'
+ELBV2_PREFIXES = ("app/", "net/", "gwy/")
+
+
+def parse_ips(values):
+    """Validate IP addresses.
+    IPv6 addresses are compressed and lowercased as AWS returns them.
+
+    Args:
+        values (list): list of IP addresses.
+
+    Returns:
+        list: list of IP addresses.
+    """
+    ips = []
+    for value in values:
+        try:
+            ips.append(str(ipaddress.ip_address(value)))
+        except ValueError:
+            raise SystemExit(f"Invalid IP address '{value}'")
+    return ips
+
+
+def ip_filters(ips):
+    """Build the network interface filters matching the IP addresses.
+    Every IPv4 address is searched as a private one, since a VPC may use non-RFC 1918 ranges.
+    Global IPv4 addresses are searched as public ones as well.
+    IPv6 addresses are searched among the IPv6 addresses of the interfaces.
+
+    Args:
+        ips (list): list of IP addresses.
+
+    Returns:
+        list: filters, one per kind of address.
+    """
+    addresses = [ipaddress.ip_address(ip) for ip in ips]
+    private = [str(ip) for ip in addresses if ip.version == 4]
+    public = [str(ip) for ip in addresses if ip.version == 4 and ip.is_global]
+    ipv6 = [str(ip) for ip in addresses if ip.version == 6]
+    filters = []
+    if len(private) > 0:
+        filters.append({"Name": "addresses.private-ip-address", "Values": private})
+    if len(ipv6) > 0:
+        filters.append({"Name": "ipv6-addresses.ipv6-address", "Values": ipv6})
+    if len(public) > 0:
+        filters.append({"Name": "addresses.association.public-ip", "Values": public})
+    return filters
+
+
+def interface_ips(eni):
+    """Get every private, public and IPv6 address of a network interface.
+
+    Args:
+        eni (dict): dict of a network interface.
+
+    Returns:
+        list: list of IP addresses.
+    """
+    ips = []
+    for address in eni.get("PrivateIpAddresses", []):
+        ips.append(address.get("PrivateIpAddress"))
+        ips.append(address.get("Association", {}).get("PublicIp"))
+    ips.append(eni.get("Association", {}).get("PublicIp"))
+    for address in eni.get("Ipv6Addresses", []):
+        ips.append(address.get("Ipv6Address"))
+    return list(dict.fromkeys(ip for ip in ips if ip is not None))
+
+
+def elb_name(eni):
+    """Get the name of the ELB owning a network interface.
+
+    Args:
+        eni (dict): dict of a network interface.
+
+    Returns:
+        tuple: ELB name or None, and whether it is an ELBv2.
+    """
+    description = eni.get("Description", "")
+    if not description.startswith("ELB "):
+        return None, False
+    name = description[len("ELB ") :]
+    if name.startswith(ELBV2_PREFIXES):
+        return name.split("/")[1], True
+    return name, False
+
+
+def resource(eni, instances, load_balancers):
+    """Get the resource owning a network interface.
+
+    Args:
+        eni (dict): dict of a network interface.
+        instances (dict): dicts of the EC2 instances of the interfaces by ID.
+        load_balancers (dict): dicts of the ELBs of the interfaces by name.
+
+    Returns:
+        dict: ResourceType, ResourceId, ResourceName, State and the extra details of the resource.
+    """
+    description = eni.get("Description", "")
+    instance = instances.get(eni.get("Attachment", {}).get("InstanceId"))
+    if instance is not None:
+        return {
+            "ResourceType": "ec2",
+            "ResourceId": instance.get("InstanceId"),
+            "ResourceName": find_tag_name(instance),
+            "State": instance.get("State", {}).get("Name"),
+            "InstanceType": instance.get("InstanceType"),
+        }
+    name, _ = elb_name(eni)
+    if name is not None:
+        load_balancer = load_balancers.get(name, {})
+        return {
+            "ResourceType": "elb",
+            "ResourceId": load_balancer.get("LoadBalancerArn"),
+            "ResourceName": name,
+            "State": load_balancer.get("State", {}).get("Code", eni.get("Status")),
+            "DNSName": load_balancer.get("DNSName"),
+        }
+    if eni.get("InterfaceType") == "nat_gateway":
+        return {
+            "ResourceType": "nat_gateway",
+            "ResourceId": description.rsplit(" ", 1)[-1] or None,
+            "State": eni.get("Status"),
+        }
+    if eni.get("InterfaceType") == "lambda" or description.startswith("AWS Lambda"):
+        return {
+            "ResourceType": "lambda",
+            "ResourceName": description[len("AWS Lambda VPC ENI") :].strip("-: ")
+            or None,
+            "State": eni.get("Status"),
+        }
+    return {
+        "ResourceType": eni.get("InterfaceType") or "interface",
+        "ResourceId": eni.get("Attachment", {}).get("InstanceId"),
+        "ResourceName": description or None,
+        "State": eni.get("Status"),
+    }
+
+
+def get_instances(session, enis):
+    """Get the EC2 instances attached to network interfaces.
+
+    Args:
+        session (botocore_session): AWS session.
+        enis (list): dicts of network interfaces.
+
+    Returns:
+        dict: dicts of the EC2 instances by ID.
+    """
+    ids = list(
+        dict.fromkeys(
+            eni["Attachment"]["InstanceId"]
+            for eni in enis
+            if eni.get("Attachment", {}).get("InstanceId")
+        )
+    )
+    if len(ids) == 0:
+        return {}
+    return {
+        instance["InstanceId"]: instance
+        for page in ec2.get_ec2_instances_by_ids(session, instance_ids=ids)
+        for reservation in page["Reservations"]
+        for instance in reservation["Instances"]
+    }
+
+
+def get_load_balancers(session, enis):
+    """Get the ELBv2 owning network interfaces.
+
+    Args:
+        session (botocore_session): AWS session.
+        enis (list): dicts of network interfaces.
+
+    Returns:
+        dict: dicts of the ELBs by name.
+    """
+    names = list(dict.fromkeys(name for name, v2 in map(elb_name, enis) if name and v2))
+    if len(names) == 0:
+        return {}
+    return {
+        load_balancer["LoadBalancerName"]: load_balancer
+        for page in elb.get_elbs_by_names(session, names=names)
+        for load_balancer in page["LoadBalancers"]
+    }
+
+
+@chunked("ips")
+def get_ips(session, ips):
+    """Get the resources using IP addresses with a single search of the network interfaces.
+    Only the EC2 instances and ELBs of the matching interfaces are described afterwards.
+
+    Args:
+        session (botocore_session): AWS session.
+        ips (list): List of private or public IP addresses.
+
+    Yields:
+        dict: page of IP addresses with the network interface and resource using them.
+    """
+    client = session.client("ec2")
+    enis = {}
+    for ip_filter in ip_filters(ips):
+        for page in paginate(
+            client,
+            "describe_network_interfaces",
+            page_size=PAGE_SIZE,
+            Filters=[ip_filter],
+        ):
+            for eni in page["NetworkInterfaces"]:
+                enis[eni["NetworkInterfaceId"]] = eni
+    # Join the instances and ELBs of the matching interfaces only
+    wanted = set(ips)
+    matches = {}
+    for eni in enis.values():
+        matched = [ip for ip in interface_ips(eni) if ip in wanted]
+        if len(matched) > 0:
+            matches[eni["NetworkInterfaceId"]] = ",".join(matched)
+    enis = [eni for eni in enis.values() if eni["NetworkInterfaceId"] in matches]
+    instances = get_instances(session, enis)
+    load_balancers = get_load_balancers(session, enis)
+    yield {
+        "IpAddresses": [
+            dict(
+                {
+                    "IpAddress": matches[eni["NetworkInterfaceId"]],
+                    "NetworkInterfaceId": eni.get("NetworkInterfaceId"),
+                    "InterfaceType": eni.get("InterfaceType"),
+                    "AvailabilityZone": eni.get("AvailabilityZone"),
+                    "VpcId": eni.get("VpcId"),
+                    "SubnetId": eni.get("SubnetId"),
+                    "Description": eni.get("Description"),
+                    "PrivateIp": eni.get("PrivateIpAddress"),
+                    "PublicIp": eni.get("Association", {}).get("PublicIp"),
+                    "TagSet": eni.get("TagSet", []),
+                },
+                **resource(eni, instances, load_balancers),
+            )
+            for eni in enis
+        ]
+    }
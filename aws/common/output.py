@@ -0,0 +1,188 @@
+import csv
+import json
+import sys
+
+from .deserialize import as_dict
+
+
+def text(value):
+    """Format a value for a plain table.
+
+    Args:
+        value (object): value of a column.
+
+    Returns:
+        string: formatted value, empty for None.
+    """
+    return "" if value is None else str(value)
+
+
+class TableWriter:
+    """Print each page of AWS resources as a pretty table."""
+
+    def write(self, profile, region, data, header=True):
+        """Print a page of AWS resources.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            data (list): list of AWS resources.
+            header (bool): print the session header before the table.
+        """
+        from tabulate import tabulate
+
+        if header:
+            print(
+                "[+] Session created for profile '{}' and region '{}'".format(
+                    profile, region
+                )
+            )
+        print(
+            tabulate(
+                [as_dict(record) for record in data],
+                headers="keys",
+                tablefmt="pretty",
+            )
+        )
+
+
+class PlainWriter:
+    """Print the AWS resources as a plain table with fixed column widths.
+    The widths are taken from the first page of each session, so rows are printed
+    without waiting for the rest of the data. Longer values are not truncated."""
+
+    def __init__(self):
+        self.widths = None
+
+    def write(self, profile, region, data, header=True):
+        """Print a page of AWS resources.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            data (list): list of AWS resources.
+            header (bool): print the session and column headers before the rows.
+        """
+        rows = [as_dict(record) for record in data]
+        if header:
+            print(
+                "[+] Session created for profile '{}' and region '{}'".format(
+                    profile, region
+                )
+            )
+            if len(rows) == 0:
+                return
+            self.widths = {
+                column: max(len(column), *(len(text(row[column])) for row in rows))
+                for column in rows[0]
+            }
+            print(self.format(dict((column, column) for column in self.widths)))
+        for row in rows:
+            print(self.format(row))
+
+    def format(self, row):
+        """Format a row with the column widths.
+
+        Args:
+            row (dict): dict of an AWS resource.
+
+        Returns:
+            string: formatted row.
+        """
+        return "  ".join(
+            text(row[column]).ljust(width) for column, width in self.widths.items()
+        ).rstrip()
+
+
+class JsonWriter:
+    """Print each page of AWS resources as an indented JSON document."""
+
+    def write(self, profile, region, data, header=True):
+        """Print a page of AWS resources.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            data (list): list of AWS resources.
+            header (bool): unused, every page is a complete document.
+        """
+        print(
+            json.dumps(
+                {
+                    "profile": profile,
+                    "region": region,
+                    "data": [as_dict(record) for record in data],
+                },
+                indent=2,
+            )
+        )
+
+
+class NdjsonWriter:
+    """Print each AWS resource as a JSON object on its own line."""
+
+    def write(self, profile, region, data, header=True):
+        """Print a page of AWS resources.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            data (list): list of AWS resources.
+            header (bool): unused.
+        """
+        for record in data:
+            print(json.dumps(dict(profile=profile, region=region, **as_dict(record))))
+
+
+class CsvWriter:
+    """Print the AWS resources as CSV rows.
+    The header row is printed again only when the columns change."""
+
+    def __init__(self):
+        self.writer = csv.writer(sys.stdout)
+        self.columns = None
+
+    def write(self, profile, region, data, header=True):
+        """Print a page of AWS resources.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            data (list): list of AWS resources.
+            header (bool): unused.
+        """
+        for record in data:
+            row = as_dict(record)
+            columns = list(row)
+            if columns != self.columns:
+                self.columns = columns
+                self.writer.writerow(["profile", "region", *columns])
+            self.writer.writerow([profile, region, *row.values()])
+
+
+WRITERS = {
+    "table": TableWriter,
+    "plain": PlainWriter,
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+}
+
+
+def get_writer(output):
+    """Get a writer for the output format.
+
+    Args:
+        output (string): output format. You can choose between table, plain, json, ndjson, csv.
+
+    Returns:
+        object: writer with a write(profile, region, data, header) method.
+    """
+    try:
+        return WRITERS[output]()
+    except KeyError:
+        raise SystemExit(
+            "Invalid output '{}'. Options available: {}".format(
+                output, [k for k in WRITERS]
+            )
+        )
@@ -0,0 +1,37 @@
+PAGE_SIZE = 1000
+# Errors of a search matching no resource, the fetchers yield no page for them
+NOT_FOUND_CODES = {"LoadBalancerNotFound"}
+
+
+def paginate(client, operation_name, page_size=None, **kwargs):
+    """Call an AWS operation and yield one response page at a time.
+    Operations that can't be paginated are called once.
+
+    Args:
+        client (botocore_client): AWS client.
+        operation_name (string): name of the client operation. e.g. 'describe_instances'
+        page_size (int): number of items to request per page. Use None for the API default.
+
+    Yields:
+        dict: response page.
+    """
+    if not client.can_paginate(operation_name):
+        yield getattr(client, operation_name)(**kwargs)
+        return
+    paginator = client.get_paginator(operation_name)
+    config = {} if page_size is None else {"PageSize": page_size}
+    yield from paginator.paginate(PaginationConfig=config, **kwargs)
+
+
+def is_not_found(error):
+    """Check whether an error means that none of the searched resources exist.
+    e.g. an ELB name that doesn't exist fails the whole call.
+
+    Args:
+        error (Exception): error raised by a call.
+
+    Returns:
+        bool: True if the searched resources don't exist.
+    """
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") in NOT_FOUND_CODES
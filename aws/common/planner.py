@@ -0,0 +1,50 @@
+import re
+
+ARN_PATTERN = re.compile(r"^arn:[^:]+:[^:]+:(?P<region>[^:]*):(?P<account>\d*):")
+DNS_NAME_PATTERN = re.compile(
+    r"\.(?:elb\.)?(?P<region>[a-z]{2}(?:-[a-z]+)+-\d)\.(?:elb\.)?amazonaws\.com(?:\.cn)?\.?$"
+)
+
+
+def locate_arn(arn):
+    """Get the account ID and region of an ARN.
+
+    Args:
+        arn (string): ARN. e.g. 'arn:aws:elasticloadbalancing:eu-central-1:123456789012:loadbalancer/app/name/id'
+
+    Returns:
+        tuple: account ID and region name, None when they can't be derived.
+    """
+    match = ARN_PATTERN.match(arn)
+    if match is None:
+        return None, None
+    return match.group("account") or None, match.group("region") or None
+
+
+def locate_dns_name(dns_name):
+    """Get the region of an ELB DNS name. The account ID is not part of it.
+
+    Args:
+        dns_name (string): ELB DNS name. e.g. 'name-123.eu-central-1.elb.amazonaws.com'
+
+    Returns:
+        tuple: None and the region name, None when it can't be derived.
+    """
+    match = DNS_NAME_PATTERN.search(dns_name.lower())
+    return None, None if match is None else match.group("region")
+
+
+def route(values, locate):
+    """Group the identifiers by the account ID and region that own them.
+
+    Args:
+        values (list): list of identifiers.
+        locate (function): function returning the account ID and region of an identifier.
+
+    Returns:
+        dict: lists of identifiers keyed by (account ID, region name).
+    """
+    groups = {}
+    for value in values:
+        groups.setdefault(locate(value), []).append(value)
+    return groups
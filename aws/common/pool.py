@@ -0,0 +1,286 @@
+import time
+from threading import Lock
+
+from .ratelimit import MAX_ATTEMPTS, RETRY_MODE, RateLimiter, limit
+from .stats import instrument
+
+MAX_POOL_CONNECTIONS = 50
+# Seconds to wait for a connection and for each response, instead of the botocore 60
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 30
+
+
+class PooledSession:
+    """AWS session bound to a profile and region that takes its clients from a pool."""
+
+    def __init__(self, pool, profile_name, region_name):
+        """Bind the session to the pool.
+
+        Args:
+            pool (ClientPool): pool of sessions and clients.
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+        """
+        self.pool = pool
+        self.profile_name = profile_name
+        self.region_name = region_name
+
+    def client(self, service_name):
+        """Get a pooled client for the session profile and region.
+
+        Args:
+            service_name (string): AWS service name. e.g. 'ec2'
+
+        Returns:
+            botocore_client: AWS client.
+        """
+        return self.pool.client(self.profile_name, self.region_name, service_name)
+
+
+class FailedSession:
+    """AWS session that could not be created, e.g. with an unknown profile.
+    It is searched like any other session so the error is reported with the results."""
+
+    def __init__(self, profile_name, region_name, error):
+        """Keep the error of the session.
+
+        Args:
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+            error (Exception): error raised while creating the session.
+        """
+        self.profile_name = profile_name
+        self.region_name = region_name
+        self.error = error
+
+
+def credential_resolver(credentials):
+    """Build a credential resolver that only returns credentials of a profile added to the pool.
+
+    Args:
+        credentials (botocore.credentials.Credentials): credentials of the profile.
+
+    Returns:
+        botocore.credentials.CredentialResolver: resolver to register in a botocore session.
+    """
+    from botocore.credentials import CredentialProvider, CredentialResolver
+
+    class AddedCredentialProvider(CredentialProvider):
+        METHOD = "tasks-added-profile"
+        CANONICAL_NAME = "tasks-added-profile"
+
+        def load(self):
+            return credentials
+
+    return CredentialResolver([AddedCredentialProvider()])
+
+
+class ClientPool:
+    """Process-wide pool of AWS sessions and clients keyed by profile, region and service.
+    boto3 is imported on first use to keep the task collection fast to load."""
+
+    def __init__(self, max_pool_connections=MAX_POOL_CONNECTIONS):
+        """Create an empty pool.
+
+        Args:
+            max_pool_connections (int): maximum number of HTTP connections kept by each client.
+        """
+        self.max_pool_connections = max_pool_connections
+        self.retries = {"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS}
+        self.timeouts = {
+            "connect_timeout": CONNECT_TIMEOUT,
+            "read_timeout": READ_TIMEOUT,
+        }
+        self.limiter = RateLimiter()
+        # Account IDs of the profiles, so the profiles of an account share its rate limit
+        self.account_ids = {}
+        # Credentials of the profiles missing from the local configuration, e.g. assumed roles
+        self.credentials = {}
+        self.config = None
+        self.loader = None
+        self.stats = None
+        self.lock = Lock()
+        self.sessions = {}
+        self.clients = {}
+        self.client_locks = {}
+
+    def boto3_session(self, profile_name):
+        """Get the boto3 session of a profile, creating it on first use.
+
+        Args:
+            profile_name (string): AWS profile name.
+
+        Returns:
+            boto3.Session: AWS session.
+        """
+        import boto3
+        import botocore.session
+        from botocore.loaders import create_loader
+
+        with self.lock:
+            if profile_name not in self.sessions:
+                start = time.perf_counter()
+                session = botocore.session.get_session()
+                # Share the data loader so the service models are parsed once
+                if self.loader is None:
+                    self.loader = create_loader(
+                        session.get_config_variable("data_path")
+                    )
+                session.register_component("data_loader", self.loader)
+                if profile_name in self.credentials:
+                    credentials = self.credentials[profile_name]
+                    if isinstance(credentials, Exception):
+                        raise credentials
+                    session.register_component(
+                        "credential_provider", credential_resolver(credentials)
+                    )
+                else:
+                    session.set_config_variable("profile", profile_name)
+                    # Raise ProfileNotFound now rather than on the first client
+                    session.get_scoped_config()
+                self.sessions[profile_name] = boto3.Session(botocore_session=session)
+                self.record(profile_name, None, "session", "create", start)
+            return self.sessions[profile_name]
+
+    def configure(self, retries=None, limiter=None, timeouts=None):
+        """Set the retry, rate limit and timeout options of the pool.
+        The retry and timeout options only apply to the clients created afterwards.
+
+        Args:
+            retries (dict): botocore retry options. e.g. {'mode': 'standard', 'max_attempts': 10}
+            limiter (RateLimiter): rate limiter of the calls. Use None to disable it.
+            timeouts (dict): botocore connect_timeout and read_timeout in seconds.
+        """
+        with self.lock:
+            if retries is not None:
+                self.retries = retries
+                self.config = None
+            if timeouts is not None:
+                self.timeouts = timeouts
+                self.config = None
+            self.limiter = limiter
+
+    def add_profile(self, profile_name, credentials, account_id=None):
+        """Add a profile that isn't in the local AWS configuration, replacing its sessions.
+
+        Args:
+            profile_name (string): AWS profile name.
+            credentials (botocore.credentials.Credentials): credentials of the profile,
+                or the error raised by the sessions of the profile when they can't be retrieved.
+            account_id (string): AWS account ID of the profile.
+        """
+        with self.lock:
+            self.credentials[profile_name] = credentials
+            self.sessions.pop(profile_name, None)
+            for key in [k for k in self.clients if k[0] == profile_name]:
+                del self.clients[key]
+            if account_id is not None:
+                self.account_ids[profile_name] = account_id
+
+    def available_profiles(self):
+        """Get the profiles available in the local AWS configuration and the added ones.
+
+        Returns:
+            list: list of AWS profile names.
+        """
+        import botocore.session
+
+        profiles = botocore.session.get_session().available_profiles
+        return profiles + [p for p in self.credentials if p not in profiles]
+
+    def session(self, profile_name, region_name):
+        """Get a session bound to a profile and region.
+
+        Args:
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+
+        Returns:
+            PooledSession: AWS session.
+        """
+        self.boto3_session(profile_name)
+        return PooledSession(self, profile_name, region_name)
+
+    def client(self, profile_name, region_name, service_name):
+        """Get the client of a profile, region and service, creating it on first use.
+
+        Args:
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+            service_name (string): AWS service name. e.g. 'ec2'
+
+        Returns:
+            botocore_client: AWS client.
+        """
+        from botocore.config import Config
+
+        key = (profile_name, region_name, service_name)
+        client = self.clients.get(key)
+        if client is not None:
+            return client
+        session = self.boto3_session(profile_name)
+        with self.lock:
+            if self.config is None:
+                # botocore rewrites the retry options of the config in place
+                self.config = Config(
+                    max_pool_connections=self.max_pool_connections,
+                    retries=dict(self.retries),
+                    **self.timeouts,
+                )
+            config = self.config
+            lock = self.client_locks.setdefault(key, Lock())
+        # Clients of different keys are built concurrently, each one only once
+        with lock:
+            client = self.clients.get(key)
+            if client is None:
+                start = time.perf_counter()
+                client = session.client(
+                    service_name, region_name=region_name, config=config
+                )
+                self.attach(client, profile_name, region_name, service_name)
+                with self.lock:
+                    # Unless add_profile replaced the session in the meantime
+                    if self.sessions.get(profile_name) is session:
+                        self.clients[key] = client
+                self.record(profile_name, region_name, "client", service_name, start)
+        return client
+
+    def attach(self, client, profile_name, region_name, service_name):
+        """Attach the stats and the rate limiter of the pool to a new client.
+
+        Args:
+            client (botocore_client): AWS client.
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+            service_name (string): AWS service name. e.g. 'ec2'
+        """
+
+        def get_key():
+            return self.account_ids.get(profile_name, profile_name), region_name
+
+        def on_wait(wait):
+            if self.stats is not None:
+                self.stats.record(
+                    profile_name, region_name, "ratelimit", service_name, wait
+                )
+
+        instrument(client, profile_name, region_name, lambda: self.stats)
+        limit(client, lambda: self.limiter, get_key, on_wait)
+
+    def record(self, profile_name, region_name, stage, name, start):
+        """Record the creation time of a session or client when stats are enabled.
+
+        Args:
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+            stage (string): pipeline stage. e.g. 'session', 'client'
+            name (string): name of the event within the stage.
+            start (float): performance counter value when the creation started.
+        """
+        if self.stats is not None:
+            self.stats.record(
+                profile_name, region_name, stage, name, time.perf_counter() - start
+            )
+
+
+POOL = ClientPool()
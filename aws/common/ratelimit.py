@@ -0,0 +1,132 @@
+import time
+from threading import Lock
+
+from .stats import THROTTLING_CODES
+
+# EC2 refills the Describe API buckets of an account and region at 20 calls per second
+RATE_LIMIT = 20
+RATE_BURST = 100
+MIN_RATE = 0.5
+# Fraction of the rate kept after a throttling error
+BACKOFF = 0.5
+# Fraction of the maximum rate recovered after each successful call
+RECOVERY = 0.05
+MAX_ATTEMPTS = 10
+RETRY_MODE = "standard"
+
+
+class TokenBucket:
+    """Token bucket whose rate adapts to the throttling errors of AWS.
+    The rate is cut on each throttling error and grows back while the calls succeed."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST, min_rate=MIN_RATE):
+        """Create a full bucket.
+
+        Args:
+            rate (float): maximum number of calls per second.
+            burst (int): maximum number of calls made at once.
+            min_rate (float): rate never cut below this number of calls per second.
+        """
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available.
+        Tokens are reserved in order, so waiting callers are served first come, first served.
+
+        Returns:
+            float: number of seconds waited.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self):
+        """Slow down after a throttling error."""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate * BACKOFF)
+            self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        """Speed up again after a successful call."""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY)
+
+
+class RateLimiter:
+    """Token buckets shared by every client of the same account and region."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        """Create a limiter without buckets.
+
+        Args:
+            rate (float): maximum number of calls per second of each account and region.
+            burst (int): maximum number of calls made at once by each account and region.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.lock = Lock()
+        self.buckets = {}
+
+    def bucket(self, account, region):
+        """Get the bucket of an account and region, creating it on first use.
+
+        Args:
+            account (string): AWS account ID, or the profile name when it is unknown.
+            region (string): AWS region name.
+
+        Returns:
+            TokenBucket: token bucket.
+        """
+        with self.lock:
+            if (account, region) not in self.buckets:
+                self.buckets[(account, region)] = TokenBucket(self.rate, self.burst)
+            return self.buckets[(account, region)]
+
+
+def limit(client, get_limiter, get_key, on_wait=None):
+    """Register botocore event handlers rate limiting each attempt of the calls of a client.
+    The retries themselves are made by botocore with the retry mode of the client config.
+
+    Args:
+        client (botocore_client): AWS client.
+        get_limiter (function): function returning the current RateLimiter or None when disabled.
+        get_key (function): function returning the account and region of the client.
+        on_wait (function): function called with the number of seconds waited for a token.
+    """
+
+    def get_bucket():
+        limiter = get_limiter()
+        return None if limiter is None else limiter.bucket(*get_key())
+
+    def before_send(**kwargs):
+        bucket = get_bucket()
+        if bucket is not None:
+            wait = bucket.acquire()
+            if wait > 0 and on_wait is not None:
+                on_wait(wait)
+
+    def needs_retry(response, **kwargs):
+        bucket = get_bucket()
+        if bucket is None or response is None:
+            return
+        if response[1].get("Error", {}).get("Code") in THROTTLING_CODES:
+            bucket.throttled()
+        else:
+            bucket.succeeded()
+
+    client.meta.events.register("before-send", before_send)
+    client.meta.events.register("needs-retry", needs_retry)
@@ -0,0 +1,186 @@
+import json
+import sys
+import time
+from threading import Lock
+
+THROTTLING_CODES = [
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+]
+COUNTERS = [
+    "calls",
+    "seconds",
+    "max_seconds",
+    "retries",
+    "throttles",
+    "errors",
+    "bytes",
+    "records",
+]
+
+
+class Stats:
+    """Thread-safe recorder of the latency, retries, throttling errors and payload sizes
+    of a search, aggregated per profile, region, stage and name."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.data = {}
+
+    def record(self, profile, region, stage, name, seconds, **counters):
+        """Record a timed event.
+
+        Args:
+            profile (string): AWS profile name.
+            region (string): AWS region name.
+            stage (string): pipeline stage. e.g. 'session', 'client', 'api', 'deserialize', 'print'
+            name (string): name of the event within the stage. e.g. 'ec2.DescribeInstances'
+            seconds (float): duration of the event.
+            counters (dict): extra counters to add. e.g. retries, throttles, errors, bytes, records
+        """
+        key = (profile, region, stage, name)
+        with self.lock:
+            entry = self.data.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            for counter, value in counters.items():
+                entry[counter] += value
+
+    def rows(self):
+        """Get the aggregated events, slowest first.
+
+        Returns:
+            list: list of dicts with the profile, region, stage, name and counters.
+        """
+        with self.lock:
+            rows = [
+                dict(profile=profile, region=region, stage=stage, name=name, **entry)
+                for (profile, region, stage, name), entry in self.data.items()
+            ]
+        return sorted(rows, key=lambda r: r["seconds"], reverse=True)
+
+    def to_json(self):
+        """Export the aggregated events as JSON.
+
+        Returns:
+            string: JSON document.
+        """
+        return json.dumps({"created": time.time(), "stats": self.rows()}, indent=2)
+
+    def to_prometheus(self):
+        """Export the aggregated events in the Prometheus text format,
+        to be collected by the node exporter textfile collector.
+
+        Returns:
+            string: Prometheus metrics.
+        """
+        lines = []
+        rows = self.rows()
+        for counter in COUNTERS:
+            metric = f"tasks_aws_search_{counter}"
+            kind = "gauge" if counter == "max_seconds" else "counter"
+            lines.append(f"# TYPE {metric} {kind}")
+            for row in rows:
+                labels = ",".join(
+                    '{}="{}"'.format(label, str(row[label]).replace('"', '\\"'))
+                    for label in ("profile", "region", "stage", "name")
+                )
+                lines.append(f"{metric}{{{labels}}} {row[counter]}")
+        return "\n".join(lines) + "\n"
+
+    def report(self, file=None):
+        """Print the aggregated events as a table, slowest first.
+        It goes to stderr by default so it does not mix with the search output.
+
+        Args:
+            file (file): file to print to. Defaults to the current stderr.
+        """
+        from tabulate import tabulate
+
+        file = sys.stderr if file is None else file
+
+        rows = self.rows()
+        for row in rows:
+            row["seconds"] = round(row["seconds"], 3)
+            row["max_seconds"] = round(row["max_seconds"], 3)
+        print("[+] Search stats", file=file)
+        print(tabulate(rows, headers="keys", tablefmt="pretty"), file=file)
+
+    def write(self, filename):
+        """Write the aggregated events to a file.
+        Files ending with '.prom' use the Prometheus text format, any other one JSON.
+
+        Args:
+            filename (string): path of the file.
+        """
+        with open(filename, "w") as f:
+            f.write(
+                self.to_prometheus() if filename.endswith(".prom") else self.to_json()
+            )
+
+
+def response_size(http_response):
+    """Get the size of the body of an HTTP response.
+
+    Args:
+        http_response (AWSResponse): HTTP response. None when the request failed.
+
+    Returns:
+        int: number of bytes of the body.
+    """
+    if http_response is None or http_response.raw is None:
+        return 0
+    return len(http_response.content)
+
+
+def instrument(client, profile, region, get_stats):
+    """Register botocore event handlers recording each API call of a client.
+
+    Args:
+        client (botocore_client): AWS client.
+        profile (string): AWS profile name.
+        region (string): AWS region name.
+        get_stats (function): function returning the current Stats or None when disabled.
+    """
+    service = client.meta.service_model.service_name
+
+    def before_call(model, context, **kwargs):
+        context["stats_operation"] = f"{service}.{model.name}"
+        context["stats_start"] = time.perf_counter()
+        context["stats_throttles"] = 0
+
+    def needs_retry(response, request_dict, **kwargs):
+        context = request_dict.get("context", {})
+        if response is not None and "stats_throttles" in context:
+            if response[1].get("Error", {}).get("Code") in THROTTLING_CODES:
+                context["stats_throttles"] += 1
+
+    def after_call(context, http_response=None, parsed=None, exception=None, **kwargs):
+        stats = get_stats()
+        if stats is None or "stats_start" not in context:
+            return
+        parsed = parsed or {}
+        stats.record(
+            profile,
+            region,
+            "api",
+            context["stats_operation"],
+            time.perf_counter() - context["stats_start"],
+            retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+            throttles=context["stats_throttles"],
+            errors=int(exception is not None or "Error" in parsed),
+            bytes=response_size(http_response),
+        )
+
+    # Start the clock before any other handler, which may answer the call itself
+    client.meta.events.register_first("before-call", before_call)
+    client.meta.events.register("needs-retry", needs_retry)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("after-call-error", after_call)
@@ -0,0 +1,64 @@
+from os import path
+
+from invoke import Collection, task
+
+from .common import daemon
+
+
+def get_socket(c):
+    """Get the Unix socket of the daemon from the context or the default value.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        string: path of the Unix socket.
+    """
+    return path.expanduser(c.get("AWS_DAEMON_SOCKET", daemon.SOCKET_FILE))
+
+
+@task(help={"foreground": "Serve in the current process until stopped"})
+def start(c, foreground=False):
+    """Start the search daemon.
+    The search tasks send their searches to it while it is running."""
+    socket_file = get_socket(c)
+    client = daemon.connect(socket_file)
+    if client is not None:
+        client.close()
+        print("[-] The daemon is already running")
+        return
+    log_file = c.get("AWS_DAEMON_LOG", daemon.LOG_FILE)
+    if foreground:
+        print(f"[+] Daemon listening on '{socket_file}'")
+        daemon.start(c, socket_file, log_file, foreground=True)
+        return
+    if not daemon.start(c, socket_file, log_file):
+        raise SystemExit("The daemon didn't start, see its log file")
+    print(f"[+] Daemon started on '{socket_file}'")
+
+
+@task
+def stop(c):
+    """Stop the search daemon."""
+    if daemon.query(get_socket(c), {"command": "stop"}) is None:
+        print("[-] The daemon isn't running")
+        return
+    print("[+] Daemon stopped")
+
+
+@task
+def status(c):
+    """Show the status of the search daemon."""
+    message = daemon.query(get_socket(c), {"command": "status"})
+    if message is None:
+        print("[-] The daemon isn't running")
+        return
+    for key, value in message["status"].items():
+        print(f"{key}: {value}")
+
+
+# Create Collection
+ns = Collection("daemon")
+ns.add_task(start)
+ns.add_task(stop)
+ns.add_task(status)
@@ -1,73 +1,80 @@
-from invoke import Collection, task
+from invoke import Collection
 
 from . import common
 
+
 # EC2 tasks
-@task(help={"ids": "List of EC2 instance IDs split by comma (,)"})
-def ec2_ids(c, ids, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.Instance,
+    help={
+        "ids": "List of EC2 instance IDs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def ec2_ids(c, ids, search):
     """Get EC2 instances by IDs."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.ec2.get_ec2_instances_by_ids,
-        instance_ids=ids.split(","),
+        instance_ids=common.read_values(ids),
     )
 
 
-@task(help={"names": "List of EC2 instance names (tag:Name) split by comma (,)"})
-def ec2_names(c, names, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.Instance,
+    help={
+        "names": "List of EC2 instance names (tag:Name) split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def ec2_names(c, names, search):
     """Get EC2 instances by names."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.ec2.get_ec2_instances_by_tags,
         tag_key="Name",
-        tag_values=names.split(","),
+        tag_values=common.read_values(names),
     )
 
 
-@task(
+@common.search_task(
+    common.deserialize.Instance,
     help={
-        "tag": "List of EC2 instance tag=values split by comma (,). e.g. 'key1=value1,value2'"
-    }
+        "tag": "List of EC2 instance tag=values split by comma (,). e.g. 'key1=value1,value2' or 'key1=@file'",
+    },
 )
-def ec2_tag(c, tag, profile="default", region=None, output="table"):
+def ec2_tag(c, tag, search):
     """Get EC2 instances by tag=value1,value2.
     It works for a single tag only."""
     key, values = tag.split("=")
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.ec2.get_ec2_instances_by_tags,
         tag_key=key,
-        tag_values=values.split(","),
+        tag_values=common.read_values(values),
     )
 
 
-@task(help={"private_ips": "List of EC2 instance private IPs split by comma (,)"})
-def ec2_private_ips(c, private_ips, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.Instance,
+    help={
+        "private_ips": "List of EC2 instance private IPs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def ec2_private_ips(c, private_ips, search):
     """Get EC2 instances by private IPs."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.ec2.get_ec2_instances_by_private_ips,
-        private_ips=private_ips.split(","),
+        private_ips=common.read_values(private_ips),
     )
 
 
-@task(help={"public_ips": "List of EC2 instance public IPs split by comma (,)"})
-def ec2_public_ips(c, public_ips, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.Instance,
+    help={
+        "public_ips": "List of EC2 instance public IPs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def ec2_public_ips(c, public_ips, search):
     """Get EC2 instances by public IPs."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.ec2.get_ec2_instances_by_public_ips,
-        public_ips=public_ips.split(","),
+        public_ips=common.read_values(public_ips),
     )
 
 
@@ -84,93 +91,121 @@ def ec2_public_ips(c, public_ips, profile="default", region=None, output="table"
 
 
 # AMIs tasks
-@task(
+@common.search_task(
+    common.deserialize.Image,
     help={
         "name": "Predefined AMI name. Options: {}.".format(
             [k for k in common.ec2.AMI_NAMES]
-        )
-    }
+        ),
+        "latest": "Only the newest AMI of each region",
+    },
 )
-def ami_name(c, name, profile="default", region=None, output="table"):
+def ami_name(c, name, search, sort=None, limit=None, latest=False):
     """Get AMIs by name."""
-    try:
-        ami_name = common.ec2.AMI_NAMES[name]
-    except KeyError:
+    if name not in common.ec2.AMI_NAMES:
         print(
             "Invalid AMI option. Options available: {}".format(
                 [k for k in common.ec2.AMI_NAMES]
             )
         )
         return
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
-        common.ec2.get_amis,
-        owner_ids=[ami_name["owner"]],
-        filters=ami_name["filters"],
+    common.configure_catalog(c)
+    # Without a sort, the first results only need as many AMIs of each region
+    newest = None if sort is not None or limit is None else int(limit)
+    search(
+        common.ec2.get_amis_by_name,
+        name=name,
+        newest=1 if latest else newest,
     )
 
 
 # ENI tasks
-@task
-def eni_private_ips(c, private_ips, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.NetworkInterface,
+    help={
+        "private_ips": "List of ENI private IPs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def eni_private_ips(c, private_ips, search):
     """Get ENIs by private IP."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.eni.get_enis_by_private_ips,
-        private_ips=private_ips.split(","),
+        private_ips=common.read_values(private_ips),
     )
 
 
-@task
-def eni_public_ips(c, public_ips, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.NetworkInterface,
+    help={
+        "public_ips": "List of ENI public IPs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def eni_public_ips(c, public_ips, search):
     """Get ENIs by public IP."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.eni.get_enis_by_public_ips,
-        public_ips=public_ips.split(","),
+        public_ips=common.read_values(public_ips),
     )
 
 
 # ELBs tasks
-@task
-def elb_arns(c, arns, profile="default", region=None, output="table"):
-    """Get ELBs by ARN."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+@common.search_task(
+    common.deserialize.LoadBalancer,
+    help={
+        "arns": "List of ELB ARNs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def elb_arns(c, arns, search):
+    """Get ELBs by ARN.
+    Each ARN is searched only in its own region and account."""
+    search(
         common.elb.get_elbs_by_arns,
-        arns=arns.split(","),
+        route=("arns", common.planner.locate_arn),
+        arns=common.read_values(arns),
     )
 
 
-@task
-def elb_names(c, names, profile="default", region=None, output="table"):
+@common.search_task(
+    common.deserialize.LoadBalancer,
+    help={
+        "names": "List of ELB names split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def elb_names(c, names, search):
     """Get ELBs by name."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+    search(
         common.elb.get_elbs_by_names,
-        names=names.split(","),
+        names=common.read_values(names),
     )
 
 
-@task
-def elb_dns_names(c, dns_names, profile="default", region=None, output="table"):
-    """Get ELBs by DNS name."""
-    common.aws_search(
-        profile,
-        common.get_region(c, region),
-        output,
+@common.search_task(
+    common.deserialize.LoadBalancer,
+    help={
+        "dns_names": "List of ELB DNS names split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def elb_dns_names(c, dns_names, search):
+    """Get ELBs by DNS name.
+    Each DNS name is searched only in its own region."""
+    search(
         common.elb.get_elbs_by_dns_names,
-        dns_names=dns_names.split(","),
+        route=("dns_names", common.planner.locate_dns_name),
+        dns_names=common.read_values(dns_names),
+    )
+
+
+@common.search_task(
+    common.deserialize.IpAddress,
+    help={
+        "ips": "List of private or public IPs split by comma (,), '@file' or '-' for stdin",
+    },
+)
+def ip(c, ips, search):
+    """Get the EC2 instances, ELBs, NAT gateways and Lambdas using IPs."""
+    search(
+        common.ip.get_ips,
+        ips=common.ip.parse_ips(common.read_values(ips)),
     )
 
 
@@ -199,3 +234,5 @@ ns.add_collection(elb)
 elb.add_task(elb_arns, "arns")
 elb.add_task(elb_names, "names")
 elb.add_task(elb_dns_names, "dns-names")
+
+ns.add_task(ip, "ip")
@@ -0,0 +1,306 @@
+import json
+import platform
+import sys
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from os import devnull, path
+
+from invoke import Collection, task
+
+from . import legacy, payloads, stubs
+from ..aws import common
+from ..aws.common import deserialize as records
+from ..aws.common.output import WRITERS
+
+ns = Collection("bench")
+
+STARTUP_BUDGET_MS = 100
+HEAVY_MODULES = ["boto3", "botocore", "pandas", "tabulate"]
+# Fetcher, its arguments, records iterator and record type of each resource
+RESOURCES = {
+    "ec2": (
+        common.ec2.get_ec2_instances_by_tags,
+        {"tag_key": "Name", "tag_values": ["*"]},
+        records.iter_ec2_instances,
+        records.Instance,
+    ),
+    "eni": (
+        common.eni.get_enis_by_private_ips,
+        {"private_ips": ["10.0.0.0"]},
+        records.iter_enis,
+        records.NetworkInterface,
+    ),
+    "elb": (
+        common.elb.get_elbs_by_names,
+        {"names": ["lb"]},
+        records.iter_elbs,
+        records.LoadBalancer,
+    ),
+    "ami": (
+        common.ec2.get_amis,
+        {"owner_ids": ["amazon"], "filters": []},
+        records.iter_images,
+        records.Image,
+    ),
+}
+
+
+def measure(func, *args):
+    """Call a function and measure its duration, then call it again to measure its peak memory.
+
+    Args:
+        func (function): function to measure.
+
+    Returns:
+        tuple: duration in seconds and peak memory in bytes.
+    """
+    import tracemalloc
+
+    start = time.perf_counter()
+    func(*args)
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, peak
+
+
+def best_of(repeat, func, *args):
+    """Call a function several times and keep the fastest duration.
+
+    Args:
+        repeat (int): number of calls.
+        func (function): function to measure.
+
+    Returns:
+        tuple: fastest duration in seconds and the result of the last call.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return best, result
+
+
+def write_pages(output, pages):
+    """Write the deserialized pages with an output writer, discarding the output.
+
+    Args:
+        output (string): output format.
+        pages (list): deserialized pages of AWS resources.
+    """
+    with open(devnull, "w") as f, redirect_stdout(f):
+        writer = WRITERS[output]()
+        for index, data in enumerate(pages):
+            writer.write("bench", "eu-central-1", data, header=index == 0)
+
+
+def fan_out(jobs, func, workers):
+    """Run the search of every stubbed session and write the results, discarding the output.
+
+    Args:
+        jobs (list): stubbed sessions and the arguments of the function.
+        func (function): function to call.
+        workers (int): number of concurrent sessions.
+
+    Returns:
+        int: number of records.
+    """
+    if workers > 1:
+        results = common.search_parallel(jobs, func, workers)
+    else:
+        results = common.search_sequential(jobs, func)
+    count = 0
+    with open(devnull, "w") as f, redirect_stdout(f):
+        writer = WRITERS["ndjson"]()
+        for profile, region, pages in results:
+            for data in pages:
+                writer.write(profile, region, data)
+                count += len(data)
+    return count
+
+
+def bench_resource(resource, size, sessions, workers, latency, repeat):
+    """Benchmark each stage of the search pipeline for a resource.
+
+    Args:
+        resource (string): resource name. You can choose between ec2, eni, elb, ami.
+        size (int): number of records per session.
+        sessions (int): number of sessions of the fan-out.
+        workers (int): number of concurrent sessions of the parallel fan-out.
+        latency (float): seconds to wait before each stubbed call.
+        repeat (int): number of runs, the fastest one is kept.
+
+    Returns:
+        list: results of each stage.
+    """
+    func, kwargs, iterate, record_type = RESOURCES[resource]
+    order, ascending = records.SORT_ORDERS[record_type]
+    pages = payloads.pages(resource, size)
+    session = stubs.StubSession(resource, pages, latency)
+    stages = {}
+    stages["fetch"], raw = best_of(repeat, lambda: list(func(session, **kwargs)))
+    stages["deserialize"], data = best_of(
+        repeat, lambda: [list(iterate(page)) for page in raw]
+    )
+    stages["sort"], data = best_of(
+        repeat, lambda: [records.sort_data(page, order, ascending) for page in data]
+    )
+    if sum(len(page) for page in data) != size:
+        raise SystemExit(
+            f"Stubbed {resource} search returned a wrong number of records"
+        )
+    for output in WRITERS:
+        stages[f"write.{output}"], _ = best_of(repeat, write_pages, output, data)
+    jobs = [
+        (stubs.StubSession(resource, pages, latency, region_name=f"region-{i}"), kwargs)
+        for i in range(sessions)
+    ]
+    for name, pool_size in (("fan-out.sequential", 1), ("fan-out.parallel", workers)):
+        stages[name], count = best_of(repeat, fan_out, jobs, func, pool_size)
+        if count != size * sessions:
+            raise SystemExit(
+                f"Stubbed {resource} fan-out returned a wrong number of records"
+            )
+    return [
+        {"resource": resource, "records": size, "stage": stage, "seconds": seconds}
+        for stage, seconds in stages.items()
+    ]
+
+
+@task(
+    help={
+        "sizes": "Number of records per session split by comma (,)",
+        "resources": "Resources split by comma (,). Options: ec2, eni, elb, ami",
+        "sessions": "Number of stubbed sessions of the fan-out",
+        "workers": "Number of concurrent sessions of the parallel fan-out",
+        "latency": "Milliseconds to wait before each stubbed call",
+        "repeat": "Number of runs of each stage, the fastest one is kept",
+        "results": "File to write the JSON results to",
+        "compare": "JSON results of a previous run to compare with",
+    }
+)
+def search(
+    c,
+    sizes="100,1000,10000,100000",
+    resources="ec2,eni,elb,ami",
+    sessions=8,
+    workers=8,
+    latency=0,
+    repeat=3,
+    results="bench_results.json",
+    compare=None,
+):
+    """Benchmark the search pipeline on stubbed AWS responses.
+    Fetch, deserialize, sort, each output writer and the sequential and parallel
+    fan-out are timed separately for each resource and size."""
+    from tabulate import tabulate
+
+    rows = []
+    for resource in resources.split(","):
+        for size in sizes.split(","):
+            print(f"Benchmarking {resource} with {size} records")
+            rows.extend(
+                bench_resource(
+                    resource,
+                    int(size),
+                    int(sessions),
+                    int(workers),
+                    float(latency) / 1000,
+                    int(repeat),
+                )
+            )
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "sessions": int(sessions),
+        "workers": int(workers),
+        "latency": float(latency),
+        "results": rows,
+    }
+    with open(results, "w") as f:
+        json.dump(report, f, indent=2)
+    if compare is not None:
+        with open(compare, "r") as f:
+            baseline = {
+                (r["resource"], r["records"], r["stage"]): r["seconds"]
+                for r in json.load(f)["results"]
+            }
+        for row in rows:
+            previous = baseline.get((row["resource"], row["records"], row["stage"]))
+            row["baseline"] = None if previous is None else round(previous, 4)
+            row["ratio"] = None if not previous else round(row["seconds"] / previous, 2)
+    for row in rows:
+        row["seconds"] = round(row["seconds"], 4)
+    print(tabulate(rows, headers="keys", tablefmt="pretty"))
+    print(f"Results written to {results}")
+
+
+@task(help={"count": "Number of synthetic EC2 instances to deserialize"})
+def deserialize(c, count=50000):
+    """Compare the records deserializer with the legacy pandas one."""
+    from tabulate import tabulate
+
+    response = payloads.describe_instances(int(count))
+    paths = [("records", records.deserialize_ec2_instances)]
+    try:
+        import pandas  # noqa: F401
+
+        paths.append(("legacy (pandas)", legacy.deserialize_ec2_instances))
+    except ImportError:
+        print("pandas is not installed, skipping the legacy path")
+    rows = []
+    for name, func in paths:
+        duration, peak = measure(func, response)
+        rows.append(
+            {
+                "path": name,
+                "seconds": round(duration, 3),
+                "peak MiB": round(peak / 2**20, 1),
+            }
+        )
+    print(f"Deserializing {count} EC2 instances")
+    print(tabulate(rows, headers="keys", tablefmt="pretty"))
+
+
+@task(
+    help={
+        "budget": "Maximum import time of the tasks package in milliseconds, invoke excluded"
+    }
+)
+def startup(c, budget=None):
+    """Check the import time of the tasks package with 'python -X importtime'.
+    It fails when the budget is exceeded or a heavy module is imported."""
+    budget = int(
+        c.get("STARTUP_BUDGET_MS", STARTUP_BUDGET_MS) if budget is None else budget
+    )
+    package_dir = path.dirname(path.dirname(path.abspath(__file__)))
+    package = __name__.split(".")[0]
+    result = c.run(
+        f'{sys.executable} -X importtime -c "import invoke; import {package}"',
+        env={"PYTHONPATH": path.dirname(package_dir)},
+        hide=True,
+    )
+    imported = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative) / 1000
+    heavy = [m for m in HEAVY_MODULES if m in imported]
+    print(f"Importing '{package}' took {imported[package]:.1f}ms (budget {budget}ms)")
+    if heavy:
+        raise SystemExit(f"Heavy modules imported at startup: {', '.join(heavy)}")
+    if imported[package] > budget:
+        raise SystemExit(
+            f"Startup budget exceeded by {imported[package] - budget:.1f}ms"
+        )
+
+
+ns.add_task(deserialize)
+ns.add_task(search)
+ns.add_task(startup)
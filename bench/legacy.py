@@ -0,0 +1,56 @@
+from collections import OrderedDict
+
+from ..aws.common.deserialize import find_tag_name
+
+
+def sort_data(data, order, ascending):
+    """Sort the data with pandas, as the deserializers did before the records rewrite.
+
+    Args:
+        data (list): list of AWS resources.
+        order (list): list of columns to sort by.
+        ascending (list): list of booleans to sort by.
+
+    Returns:
+        list: sorted list of AWS resources.
+    """
+    import pandas as pd
+
+    if len(data) < 1:
+        return data
+    df = pd.DataFrame(data)
+    df.sort_values(by=order, ascending=ascending, inplace=True)
+    return df.to_dict(orient="records")
+
+
+def deserialize_ec2_instances(response):
+    """Deserialize the EC2 instances response with OrderedDicts and pandas.
+
+    Args:
+        response (dict): dict of EC2 instances.
+
+    Returns:
+        list: sorted list of EC2 instances.
+    """
+    instances = []
+    for reservation in response["Reservations"]:
+        for instance in reservation["Instances"]:
+            instances.append(
+                OrderedDict(
+                    [
+                        ("InstanceState", instance.get("State", None).get("Name")),
+                        ("InstanceName", find_tag_name(instance)),
+                        ("InstanceId", instance.get("InstanceId", None)),
+                        ("InstanceType", instance.get("InstanceType", None)),
+                        (
+                            "AvailabilityZone",
+                            instance.get("Placement", None).get(
+                                "AvailabilityZone", None
+                            ),
+                        ),
+                        ("PrivateIpAddress", instance.get("PrivateIpAddress", None)),
+                        ("PublicIpAddress", instance.get("PublicIpAddress", None)),
+                    ]
+                )
+            )
+    return sort_data(instances, ["InstanceState", "InstanceName"], [True, True])
@@ -0,0 +1,191 @@
+def instance(index):
+    """Build a synthetic EC2 instance.
+
+    Args:
+        index (int): index of the instance.
+
+    Returns:
+        dict: dict of an EC2 instance as returned by describe_instances.
+    """
+    return {
+        "InstanceId": "i-{:017x}".format(index),
+        "InstanceType": "t3.micro",
+        "State": {"Code": 16, "Name": ("running", "stopped")[index % 2]},
+        "Placement": {"AvailabilityZone": "eu-central-1" + "abc"[index % 3]},
+        "PrivateIpAddress": "10.{}.{}.{}".format(
+            index >> 16 & 255, index >> 8 & 255, index & 255
+        ),
+        "PublicIpAddress": "3.{}.{}.{}".format(
+            index >> 16 & 255, index >> 8 & 255, index & 255
+        ),
+        "Tags": [
+            {"Key": "Name", "Value": "host-{:06d}".format(index)},
+            {"Key": "env", "Value": ("stag", "prod")[index % 2]},
+        ],
+    }
+
+
+def describe_instances(count, per_reservation=10):
+    """Build a synthetic describe_instances response.
+
+    Args:
+        count (int): number of instances.
+        per_reservation (int): number of instances per reservation.
+
+    Returns:
+        dict: describe_instances response.
+    """
+    return {
+        "Reservations": [
+            {
+                "ReservationId": "r-{:017x}".format(start),
+                "Instances": [
+                    instance(index)
+                    for index in range(start, min(start + per_reservation, count))
+                ],
+            }
+            for start in range(0, count, per_reservation)
+        ]
+    }
+
+
+def network_interface(index):
+    """Build a synthetic ENI.
+
+    Args:
+        index (int): index of the ENI.
+
+    Returns:
+        dict: dict of an ENI as returned by describe_network_interfaces.
+    """
+    return {
+        "NetworkInterfaceId": "eni-{:017x}".format(index),
+        "InterfaceType": ("interface", "network_load_balancer", "nat_gateway")[
+            index % 3
+        ],
+        "Status": "in-use",
+        "AvailabilityZone": "eu-central-1" + "abc"[index % 3],
+        "PrivateIpAddress": instance(index)["PrivateIpAddress"],
+        "Association": {"PublicIp": instance(index)["PublicIpAddress"]},
+        "Attachment": {"InstanceId": instance(index)["InstanceId"]},
+    }
+
+
+def load_balancer(index):
+    """Build a synthetic ELB.
+
+    Args:
+        index (int): index of the ELB.
+
+    Returns:
+        dict: dict of an ELB as returned by describe_load_balancers.
+    """
+    name = "lb-{:06d}".format(index)
+    return {
+        "LoadBalancerName": name,
+        "DNSName": "{}-{}.eu-central-1.elb.amazonaws.com".format(name, index),
+        "Type": ("application", "network")[index % 2],
+        "Scheme": ("internet-facing", "internal")[index % 2],
+        "LoadBalancerArn": "arn:aws:elasticloadbalancing:eu-central-1:123456789012:loadbalancer/app/{}/{:016x}".format(
+            name, index
+        ),
+    }
+
+
+def image(index):
+    """Build a synthetic AMI.
+
+    Args:
+        index (int): index of the AMI.
+
+    Returns:
+        dict: dict of an AMI as returned by describe_images.
+    """
+    return {
+        "ImageId": "ami-{:017x}".format(index),
+        "Name": "amzn2-ami-hvm-2.0.{:08d}-x86_64-gp2".format(index),
+        "CreationDate": "20{:02d}-{:02d}-{:02d}T00:00:00.000Z".format(
+            index % 23, index % 12 + 1, index % 28 + 1
+        ),
+    }
+
+
+def describe_network_interfaces(count):
+    """Build a synthetic describe_network_interfaces response.
+
+    Args:
+        count (int): number of ENIs.
+
+    Returns:
+        dict: describe_network_interfaces response.
+    """
+    return {"NetworkInterfaces": [network_interface(i) for i in range(count)]}
+
+
+def describe_load_balancers(count):
+    """Build a synthetic describe_load_balancers response.
+
+    Args:
+        count (int): number of ELBs.
+
+    Returns:
+        dict: describe_load_balancers response.
+    """
+    return {"LoadBalancers": [load_balancer(i) for i in range(count)]}
+
+
+def describe_images(count):
+    """Build a synthetic describe_images response.
+
+    Args:
+        count (int): number of AMIs.
+
+    Returns:
+        dict: describe_images response.
+    """
+    return {"Images": [image(i) for i in range(count)]}
+
+
+# Operation, result key, pagination token and page builder of each resource
+RESOURCES = {
+    "ec2": ("describe_instances", "Reservations", "NextToken", describe_instances),
+    "eni": (
+        "describe_network_interfaces",
+        "NetworkInterfaces",
+        "NextToken",
+        describe_network_interfaces,
+    ),
+    "elb": (
+        "describe_load_balancers",
+        "LoadBalancers",
+        "NextMarker",
+        describe_load_balancers,
+    ),
+    "ami": ("describe_images", "Images", "NextToken", describe_images),
+}
+
+
+def pages(resource, count, page_size=1000):
+    """Build the synthetic response pages of a resource.
+
+    Args:
+        resource (string): resource name. You can choose between ec2, eni, elb, ami.
+        count (int): number of records.
+        page_size (int): number of records per page.
+
+    Returns:
+        list: list of response pages, chained with pagination tokens.
+    """
+    _, key, token, build = RESOURCES[resource]
+    response = build(count)
+    if resource == "ec2":
+        # Reservations hold 10 instances each
+        page_size = max(1, page_size // 10)
+    items = response[key]
+    result = []
+    for start in range(0, max(len(items), 1), page_size):
+        page = {key: items[start : start + page_size]}
+        if start + page_size < len(items):
+            page[token] = str(start + page_size)
+        result.append(page)
+    return result
@@ -0,0 +1,72 @@
+import time
+from functools import lru_cache
+
+from . import payloads
+
+SERVICES = {"ec2": "ec2", "eni": "ec2", "elb": "elbv2", "ami": "ec2"}
+
+
+@lru_cache(maxsize=None)
+def get_botocore_session():
+    """Get the botocore session shared by the stubbed clients, so the service models are loaded once.
+
+    Returns:
+        botocore_session: botocore session.
+    """
+    import botocore.session
+
+    return botocore.session.get_session()
+
+
+class StubSession:
+    """AWS session whose client answers with synthetic pages through botocore's Stubber."""
+
+    def __init__(
+        self,
+        resource,
+        pages,
+        latency=0,
+        profile_name="bench",
+        region_name="eu-central-1",
+    ):
+        """Create the stubbed client of the resource.
+
+        Args:
+            resource (string): resource name. You can choose between ec2, eni, elb, ami.
+            pages (list): response pages returned by each search.
+            latency (float): seconds to wait before each call, to simulate the network.
+            profile_name (string): AWS profile name.
+            region_name (string): AWS region name.
+        """
+        from botocore.stub import Stubber
+
+        self.profile_name = profile_name
+        self.region_name = region_name
+        self.operation = payloads.RESOURCES[resource][0]
+        self.pages = pages
+        self._client = get_botocore_session().create_client(
+            SERVICES[resource],
+            region_name=region_name,
+            aws_access_key_id="bench",
+            aws_secret_access_key="bench",
+        )
+        self.stubber = Stubber(self._client)
+        self.stubber.activate()
+        if latency > 0:
+            # The Stubber answers in 'before-call.*.*', so the wait must run before it
+            self._client.meta.events.register_first(
+                "before-call.*.*", lambda **kwargs: time.sleep(latency)
+            )
+
+    def client(self, service_name):
+        """Get the stubbed client, queuing the pages of one more search.
+
+        Args:
+            service_name (string): AWS service name. Ignored, the client is always the stubbed one.
+
+        Returns:
+            botocore_client: stubbed AWS client.
+        """
+        for page in self.pages:
+            self.stubber.add_response(self.operation, page)
+        return self._client
@@ -0,0 +1,47 @@
+from os import environ, path
+
+
+def get_aws_credentials(c):
+    """Get the AWS credentials from the invoke configuration, the environment or the default profile.
+    They are read only by the tasks that need them.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        tuple: AWS access key ID and secret access key.
+    """
+    if c.get("AWS_ACCESS_KEY_ID") and c.get("AWS_SECRET_ACCESS_KEY"):
+        return c["AWS_ACCESS_KEY_ID"], c["AWS_SECRET_ACCESS_KEY"]
+    from configparser import ConfigParser
+
+    aws_credentials = ConfigParser()
+    aws_credentials.read(f"{c['HOME']}/.aws/credentials")
+    aws_access_key_id = environ.get(
+        "AWS_ACCESS_KEY_ID",
+        aws_credentials.get("default", "aws_access_key_id", fallback="not-found"),
+    )
+    aws_secret_access_key = environ.get(
+        "AWS_SECRET_ACCESS_KEY",
+        aws_credentials.get("default", "aws_secret_access_key", fallback="not-found"),
+    )
+    return aws_access_key_id, aws_secret_access_key
+
+
+def get_registry_password(c):
+    """Get the registry password from the invoke configuration
+    or the '.registry_password.secrets' file if it exists.
+
+    Args:
+        c (context): fabric context.
+
+    Returns:
+        string: registry password.
+    """
+    if c.get("REGISTRY_PASSWORD") is not None:
+        return c["REGISTRY_PASSWORD"]
+    registry_password_file = f"{c['CURRENT_DIR']}/.registry_password.secrets"
+    if path.isfile(registry_password_file):
+        with open(registry_password_file, "r") as f:
+            return f.read().strip()
+    return ""
@@ -1,50 +1,161 @@
+import hashlib
+import json
+import tempfile
+from os import path
+
 from invoke import Collection, task
 
+from . import context
+from ..config import get_aws_credentials
+
+# Label of the persistent container holding the hash of its image ID and run options
+RUN_HASH_LABEL = "tasks.run-hash"
+
 ns = Collection("docker")
 
 
-@task
-def build(c):
-    """Build the Docker image.
+def get_image_id(c, image):
+    """Get the ID of a local Docker image.
+
+    Args:
+        c (context): fabric context.
+        image (string): image name and tag.
+
+    Returns:
+        string: image ID or None if the image doesn't exist.
+    """
+    result = c.run(
+        f"docker image inspect --format '{{{{.Id}}}}' {image}", hide=True, warn=True
+    )
+    return result.stdout.strip() if result.ok else None
+
+
+@task(help={"force": "Build the image even if the build context didn't change"})
+def build(c, force=False):
+    """Build the Docker image with BuildKit, skipped when the build context didn't change.
+    The hash of the files sent to Docker ('.dockerignore' applied) and the image ID are
+    saved to 'DOCKER_BUILD_STATE_FILE' after each build.
     This function expects the following 'invoke.yaml' variables to be set:
     - DOCKER_IMAGE_NAME
     - DOCKER_IMAGE_TAG"""
-    print(f"Building docker image {c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']}")
-    c.run(f"docker build -t {c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']} .")
+    image = f"{c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']}"
+    state_file = c.get("DOCKER_BUILD_STATE_FILE", context.BUILD_STATE_FILE)
+    key = context.state_key(".", image)
+    previous = context.load_state(state_file).get(key, {})
+    digest, files = context.context_hash(".", previous.get("files"))
+    if (
+        not force
+        and previous.get("hash") == digest
+        and get_image_id(c, image) == previous.get("image_id")
+    ):
+        print(f"[+] Docker image {image} is up to date, build skipped")
+        return
+    print(f"Building docker image {image}")
+    with tempfile.TemporaryDirectory() as directory:
+        iidfile = path.join(directory, "image_id")
+        c.run(
+            f"docker build --iidfile {iidfile} -t {image} .",
+            env={"DOCKER_BUILDKIT": "1"},
+        )
+        with open(iidfile) as f:
+            image_id = f.read().strip()
+    state = context.load_state(state_file)
+    state[key] = {"hash": digest, "image_id": image_id, "files": files}
+    context.save_state(state, state_file)
 
 
-@task
-def run(c, local=False, aws=True, ssh=True, workdir=True):
+def get_container(c, name):
+    """Get the state and the run hash of a container.
+
+    Args:
+        c (context): fabric context.
+        name (string): container name.
+
+    Returns:
+        tuple: whether the container is running and its run hash, or None if it doesn't exist.
+    """
+    result = c.run(
+        f"docker inspect --type container --format "
+        f"'{{{{.State.Running}}}} {{{{index .Config.Labels \"{RUN_HASH_LABEL}\"}}}}' {name}",
+        hide=True,
+        warn=True,
+    )
+    if not result.ok:
+        return None
+    running, _, run_hash = result.stdout.strip().partition(" ")
+    return running == "true", run_hash
+
+
+def run_persistent(c, name, image, options):
+    """Open a shell in a long-running container, started only when it is missing,
+    stopped, or its image ID or run options changed since it was created.
+
+    Args:
+        c (context): fabric context.
+        name (string): container name.
+        image (string): image name and tag.
+        options (list): 'docker run' options of the container.
+    """
+    run_hash = hashlib.sha256(
+        json.dumps([get_image_id(c, image), options]).encode()
+    ).hexdigest()
+    container = get_container(c, name)
+    if container is not None and container[1] != run_hash:
+        print(f"Recreating docker container {name}, its image or options changed")
+        c.run(f"docker rm -f {name}", hide=True)
+        container = None
+    if container is None:
+        print(f"Starting docker container {name}")
+        c.run(
+            " ".join(
+                ["docker run -d --init", f"--label {RUN_HASH_LABEL}={run_hash}"]
+                + options
+                + [f"--name {name}", f"{image} tail -f /dev/null"]
+            ),
+            hide=True,
+        )
+    elif not container[0]:
+        c.run(f"docker start {name}", hide=True)
+    c.run(f"docker exec -it {name} sh", pty=True)
+
+
+@task(
+    help={
+        "persistent": "Keep the container running and exec into it. Defaults to 'DOCKER_RUN_PERSISTENT'",
+    }
+)
+def run(c, local=False, aws=True, ssh=True, workdir=True, persistent=None):
     """Run the Docker image.
+    With '--persistent', the container is created once and the next runs open a shell in it,
+    use 'docker.rm' to remove it.
     This function expects the following 'invoke' variables to be set:
     - DOCKER_IMAGE_NAME
     - DOCKER_IMAGE_TAG
     - DOCKER_CONTAINER_NAME
     - DOCKER_CONTAINER_WORKDIR"""
-    mount_local = "" if not local else f"-v {c['CURRENT_DIR']}:/ansible"
-    workdir = "" if not workdir else f"-w {c['DOCKER_CONTAINER_WORKDIR']}"
-    aws_access_key_id = (
-        "" if not aws else f"-e AWS_ACCESS_KEY_ID={c['AWS_ACCESS_KEY_ID']}"
-    )
-    aws_secret_access_key = (
-        "" if not aws else f"-e AWS_SECRET_ACCESS_KEY={c['AWS_SECRET_ACCESS_KEY']}"
-    )
-    ssh_private_key = (
-        "" if not ssh else f"-v {c['SSH_PRIVATE_KEY_EXPAND']}:/root/.ssh/id_rsa"
-    )
-    print(f"Running {c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']}")
+    options = []
+    if aws:
+        access_key_id, secret_access_key = get_aws_credentials(c)
+        options.append(f"-e AWS_ACCESS_KEY_ID={access_key_id}")
+        options.append(f"-e AWS_SECRET_ACCESS_KEY={secret_access_key}")
+    if local:
+        options.append(f"-v {c['CURRENT_DIR']}:/ansible")
+    if ssh:
+        options.append(f"-v {c['SSH_PRIVATE_KEY_EXPAND']}:/root/.ssh/id_rsa")
+    if workdir:
+        options.append(f"-w {c['DOCKER_CONTAINER_WORKDIR']}")
+    image = f"{c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']}"
+    print(f"Running {image}")
+    if persistent is None:
+        persistent = c.get("DOCKER_RUN_PERSISTENT", False)
+    if persistent:
+        run_persistent(c, c["DOCKER_CONTAINER_NAME"], image, options)
+        return
     c.run(
         " ".join(
-            [
-                f"docker run --rm",
-                f"{aws_access_key_id}",
-                f"{aws_secret_access_key}",
-                f"{mount_local}",
-                f"{ssh_private_key}",
-                f"{workdir}",
-                f"--name {c['DOCKER_CONTAINER_NAME']}",
-                f"-it {c['DOCKER_IMAGE_NAME']}:{c['DOCKER_IMAGE_TAG']} sh",
-            ]
+            ["docker run --rm"]
+            + options
+            + [f"--name {c['DOCKER_CONTAINER_NAME']}", f"-it {image} sh"]
         ),
         pty=True,
     )
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import re
+import stat
+import tempfile
+from os import makedirs, path, readlink, replace, scandir
+
+BUILD_STATE_FILE = "~/.cache/tasks/docker_build.json"
+# Files Docker always sends, even when '.dockerignore' lists them
+ALWAYS_SENT = ["Dockerfile", ".dockerignore"]
+
+
+def read_dockerignore(directory):
+    """Read the patterns of the '.dockerignore' file of a build context.
+
+    Args:
+        directory (string): build context directory.
+
+    Returns:
+        list: tuples of compiled pattern and whether it is an exception ('!').
+    """
+    filename = path.join(directory, ".dockerignore")
+    if not path.isfile(filename):
+        return []
+    patterns = []
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            line = path.normpath(line[1:].strip() if negate else line).lstrip("/")
+            patterns.append((re.compile(translate(line)), negate))
+    return patterns
+
+
+def translate(pattern):
+    """Translate a '.dockerignore' pattern into a regular expression.
+    A pattern matching a directory matches everything inside it.
+
+    Args:
+        pattern (string): pattern. e.g. '**/__pycache__'
+
+    Returns:
+        string: regular expression.
+    """
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end < 0:
+                regex += re.escape(char)
+            else:
+                regex += "[" + pattern[i + 1 : end].replace("\\", "\\\\") + "]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return f"^{regex}(?:/.*)?$"
+
+
+def ignored(name, patterns):
+    """Check whether '.dockerignore' excludes a path, the last matching pattern wins.
+
+    Args:
+        name (string): path relative to the build context.
+        patterns (list): patterns, see read_dockerignore.
+
+    Returns:
+        bool: True if the path is not sent to Docker.
+    """
+    if name in ALWAYS_SENT:
+        return False
+    excluded = False
+    for regex, negate in patterns:
+        if regex.match(name):
+            excluded = not negate
+    return excluded
+
+
+def iter_files(directory, patterns, prefix=""):
+    """Walk the files of a build context in a stable order.
+    Excluded directories are skipped unless an exception could match inside them.
+
+    Args:
+        directory (string): build context directory.
+        patterns (list): patterns, see read_dockerignore.
+        prefix (string): path of the current directory relative to the build context.
+
+    Yields:
+        tuple: path relative to the build context and the entry.
+    """
+    exceptions = any(negate for _, negate in patterns)
+    with scandir(path.join(directory, prefix)) as entries:
+        entries = sorted(entries, key=lambda e: e.name)
+    for entry in entries:
+        name = f"{prefix}{entry.name}"
+        excluded = ignored(name, patterns)
+        if entry.is_dir(follow_symlinks=False):
+            if not excluded or exceptions:
+                yield from iter_files(directory, patterns, f"{name}/")
+        elif not excluded:
+            yield name, entry
+
+
+def file_digest(filename):
+    """Get the SHA-256 digest of a file.
+
+    Args:
+        filename (string): path of the file.
+
+    Returns:
+        string: hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def context_hash(directory, files=None):
+    """Hash the paths, modes and contents of the files sent to a Docker build.
+    Files whose size and modification time didn't change reuse their previous digest.
+
+    Args:
+        directory (string): build context directory.
+        files (dict): previous size, modification time and digest by path.
+
+    Returns:
+        tuple: hex digest of the context and the digests by path to reuse next time.
+    """
+    files = files or {}
+    digests = {}
+    context = hashlib.sha256()
+    for name, entry in iter_files(directory, read_dockerignore(directory)):
+        info = entry.stat(follow_symlinks=False)
+        key = [info.st_size, info.st_mtime_ns]
+        if stat.S_ISLNK(info.st_mode):
+            digest = hashlib.sha256(readlink(entry.path).encode()).hexdigest()
+        elif name in files and files[name][:2] == key:
+            digest = files[name][2]
+        else:
+            digest = file_digest(entry.path)
+        digests[name] = key + [digest]
+        context.update(f"{name}\0{info.st_mode:o}\0{digest}\n".encode())
+    return context.hexdigest(), digests
+
+
+def load_state(filename=BUILD_STATE_FILE):
+    """Load the state of the previous builds.
+
+    Args:
+        filename (string): path of the JSON state file.
+
+    Returns:
+        dict: state of each build context by directory and image.
+    """
+    filename = path.expanduser(filename)
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, filename=BUILD_STATE_FILE):
+    """Save the state of the builds, replacing the file at once.
+
+    Args:
+        state (dict): state of each build context by directory and image.
+        filename (string): path of the JSON state file.
+    """
+    filename = path.expanduser(filename)
+    directory = path.dirname(filename)
+    makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".json")
+    with open(fd, "w") as f:
+        json.dump(state, f)
+    replace(temp, filename)
+
+
+def state_key(directory, image):
+    """Get the state key of a build.
+
+    Args:
+        directory (string): build context directory.
+        image (string): image name and tag.
+
+    Returns:
+        string: state key.
+    """
+    return f"{path.abspath(directory)}:{image}"
@@ -0,0 +1,41 @@
+import io
+import time
+
+from ..aws.common import batch
+
+
+def test_read_values(tmp_path, monkeypatch):
+    assert batch.read_values("web server,db,,web server") == ["web server", "db"]
+    assert batch.read_values("Name=My Server") == ["Name=My Server"]
+    values = tmp_path / "values.txt"
+    values.write_text("web server\ndb , cache\r\n\n")
+    assert batch.read_values(f"@{values}") == ["web server", "db", "cache"]
+    monkeypatch.setattr("sys.stdin", io.StringIO("a\nb,a\n"))
+    assert batch.read_values("-") == ["a", "b"]
+
+
+def test_chunked_keeps_the_order():
+    @batch.chunked("values", 2)
+    def fetch(session, values):
+        # The last chunks answer first
+        time.sleep(0.01 * (10 - values[0]))
+        for value in values:
+            yield {"value": value}
+
+    pages = list(fetch(None, values=list(range(10))))
+    assert [page["value"] for page in pages] == list(range(10))
+
+
+def test_chunked_stops_early():
+    calls = []
+
+    @batch.chunked("values", 1)
+    def fetch(session, values):
+        calls.append(values[0])
+        time.sleep(0.05)
+        yield {"value": values[0]}
+
+    pages = fetch(None, values=list(range(20)))
+    assert next(pages) == {"value": 0}
+    pages.close()
+    assert len(calls) < 20
@@ -0,0 +1,18 @@
+import time
+
+from ..bench import payloads, stubs
+
+
+def test_stub_latency():
+    session = stubs.StubSession("ec2", payloads.pages("ec2", 10), latency=0.2)
+    start = time.perf_counter()
+    session.client("ec2").describe_instances()
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_stub_without_latency():
+    session = stubs.StubSession("ec2", payloads.pages("ec2", 10))
+    start = time.perf_counter()
+    response = session.client("ec2").describe_instances()
+    assert time.perf_counter() - start < 0.2
+    assert len(response["Reservations"]) > 0
@@ -0,0 +1,54 @@
+import pytest
+
+from ..aws.common import elb
+
+
+class NotFound(Exception):
+    response = {"Error": {"Code": "LoadBalancerNotFound"}}
+
+
+class Client:
+    """ELBv2 client failing the whole call when one of the names doesn't exist."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.calls = 0
+
+    def can_paginate(self, operation_name):
+        return False
+
+    def describe_load_balancers(self, Names):
+        self.calls += 1
+        if any(name not in self.existing for name in Names):
+            raise NotFound()
+        return {"LoadBalancers": [{"LoadBalancerName": name} for name in Names]}
+
+
+class Session:
+    profile_name = "default"
+    region_name = "eu-central-1"
+
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, service_name):
+        return self._client
+
+
+def test_missing_names_are_skipped(capsys):
+    names = [f"web-{i}" for i in range(20)]
+    client = Client(set(names) - {"web-3", "web-17"})
+    pages = list(elb.get_elbs_by_names(Session(client), names=names))
+    found = [lb["LoadBalancerName"] for page in pages for lb in page["LoadBalancers"]]
+    assert found == [n for n in names if n not in ("web-3", "web-17")]
+    assert client.calls < 20
+    assert "[-] ELBs not found" in capsys.readouterr().err
+
+
+def test_other_errors_are_raised():
+    class Failing(Client):
+        def describe_load_balancers(self, Names):
+            raise PermissionError("denied")
+
+    with pytest.raises(PermissionError):
+        list(elb.get_elbs_by_names(Session(Failing(set())), names=["web"]))
@@ -0,0 +1,164 @@
+import pytest
+
+from ..ansible import sharding
+from ..aws.common import planner
+from ..docker import context
+
+
+@pytest.mark.parametrize(
+    "arn, expected",
+    [
+        (
+            "arn:aws:elasticloadbalancing:eu-central-1:123456789012:loadbalancer/app/web/1",
+            ("123456789012", "eu-central-1"),
+        ),
+        (
+            "arn:aws-cn:ec2:cn-north-1:123456789012:instance/i-1",
+            ("123456789012", "cn-north-1"),
+        ),
+        ("arn:aws:s3:::bucket", (None, None)),
+        ("arn:aws:iam::123456789012:role/name", ("123456789012", None)),
+        ("i-0123456789abcdef0", (None, None)),
+    ],
+)
+def test_locate_arn(arn, expected):
+    assert planner.locate_arn(arn) == expected
+
+
+@pytest.mark.parametrize(
+    "dns_name, region",
+    [
+        ("web-123.eu-central-1.elb.amazonaws.com", "eu-central-1"),
+        ("internal-web-123.us-east-1.elb.amazonaws.com", "us-east-1"),
+        ("net-123.elb.eu-west-1.amazonaws.com", "eu-west-1"),
+        ("web-123.cn-north-1.elb.amazonaws.com.cn", "cn-north-1"),
+        ("WEB-123.US-GOV-WEST-1.ELB.AMAZONAWS.COM.", "us-gov-west-1"),
+        ("web.example.com", None),
+    ],
+)
+def test_locate_dns_name(dns_name, region):
+    assert planner.locate_dns_name(dns_name) == (None, region)
+
+
+def test_route():
+    arns = [
+        "arn:aws:ec2:eu-west-1:111111111111:instance/i-1",
+        "arn:aws:ec2:eu-west-1:111111111111:instance/i-2",
+        "arn:aws:ec2:us-east-1:222222222222:instance/i-3",
+        "not-an-arn",
+    ]
+    assert planner.route(arns, planner.locate_arn) == {
+        ("111111111111", "eu-west-1"): arns[:2],
+        ("222222222222", "us-east-1"): [arns[2]],
+        (None, None): [arns[3]],
+    }
+
+
+@pytest.fixture
+def patterns(tmp_path):
+    (tmp_path / ".dockerignore").write_text(
+        "# comment\n.git\n**/__pycache__\n*.log\n!keep.log\n/docs/*.md\nbuild?\n[ab].txt\n"
+    )
+    return context.read_dockerignore(str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "name, excluded",
+    [
+        (".git", True),
+        (".git/config", True),
+        ("__pycache__/x.pyc", True),
+        ("a/b/__pycache__/x.pyc", True),
+        ("error.log", True),
+        ("logs/error.log", False),
+        ("keep.log", False),
+        ("docs/index.md", True),
+        ("docs/sub/index.md", False),
+        ("build1", True),
+        ("build12", False),
+        ("a.txt", True),
+        ("c.txt", False),
+        (".dockerignore", False),
+        ("Dockerfile", False),
+        ("main.py", False),
+    ],
+)
+def test_dockerignore(patterns, name, excluded):
+    assert context.ignored(name, patterns) is excluded
+
+
+def test_context_hash(tmp_path):
+    (tmp_path / ".dockerignore").write_text("*.log\n")
+    (tmp_path / "app.py").write_text("print(1)\n")
+    (tmp_path / "debug.log").write_text("1\n")
+    digest, files = context.context_hash(str(tmp_path))
+    assert sorted(files) == [".dockerignore", "app.py"]
+    (tmp_path / "debug.log").write_text("2\n")
+    assert context.context_hash(str(tmp_path), files)[0] == digest
+    (tmp_path / "app.py").write_text("print(2)\n")
+    assert context.context_hash(str(tmp_path), files)[0] != digest
+
+
+def test_split_hosts_in_order():
+    hosts = ["h1", "h2", "h3", "h4", "h5"]
+    assert sharding.split_hosts(hosts, 2) == [["h1", "h2", "h3"], ["h4", "h5"]]
+    assert sharding.split_hosts(hosts, 10) == [[h] for h in hosts]
+    assert sharding.split_hosts([], 3) == []
+
+
+def test_split_hosts_by_key():
+    hostvars = {
+        "h1": {"ec2_availability_zone": "a"},
+        "h2": {"ec2_availability_zone": "b"},
+        "h3": {"ec2_availability_zone": "a"},
+        "h4": {"placement": {"availability_zone": "c"}},
+        "h5": {"ec2_tags": {"role": "web"}},
+    }
+    hosts = ["h1", "h2", "h3", "h4"]
+    assert sharding.split_hosts(hosts, None, "az", hostvars) == [
+        ["h1", "h3"],
+        ["h2"],
+        ["h4"],
+    ]
+    assert sharding.split_hosts(hosts, 2, "az", hostvars) == [
+        ["h1", "h3"],
+        ["h2", "h4"],
+    ]
+    assert sharding.split_hosts(["h5", "h1"], None, "tag:role", hostvars) == [
+        ["h5"],
+        ["h1"],
+    ]
+    with pytest.raises(SystemExit):
+        sharding.split_hosts(hosts, None, "region", hostvars)
+
+
+def test_parse_recap():
+    output = (
+        "TASK [ping] ***\n"
+        "ok: [web-1]\n"
+        "\x1b[0;32mPLAY RECAP\x1b[0m *********\n"
+        "\x1b[0;33mweb-1\x1b[0m                      : ok=3    changed=1    unreachable=0    failed=0\n"
+        "web-2                      : ok=1    changed=0    unreachable=1    failed=0    skipped=2    rescued=0    ignored=0\n"
+        "\n"
+    )
+    recap = sharding.parse_recap(output)
+    assert recap["web-1"] == dict(
+        ok=3, changed=1, unreachable=0, failed=0, skipped=0, rescued=0, ignored=0
+    )
+    assert recap["web-2"]["unreachable"] == 1
+    assert sharding.failed(recap["web-2"]) and not sharding.failed(recap["web-1"])
+    assert sharding.failed(None)
+    assert sharding.parse_recap("ok: [web-1]\nweb-1 : ok=1\n") == {}
+
+
+@pytest.mark.parametrize(
+    "value, total, expected",
+    [(None, 10, None), ("3", 10, 3), ("25%", 10, 2), ("0", 10, 0)],
+)
+def test_get_threshold(value, total, expected):
+    assert sharding.get_threshold(value, total) == expected
+
+
+def test_get_threshold_invalid():
+    with pytest.raises(SystemExit):
+        sharding.get_threshold("many", 10)
@@ -0,0 +1,65 @@
+from ..aws.common import ip
+
+ENIS = [
+    {
+        "NetworkInterfaceId": "eni-1",
+        "PrivateIpAddress": "10.0.0.1",
+        "PrivateIpAddresses": [{"PrivateIpAddress": "10.0.0.1"}],
+        "Ipv6Addresses": [{"Ipv6Address": "2a05:d014::1"}],
+        "Description": "",
+    },
+    {
+        "NetworkInterfaceId": "eni-2",
+        "PrivateIpAddress": "10.0.0.2",
+        "PrivateIpAddresses": [{"PrivateIpAddress": "10.0.0.2"}],
+        "Description": "",
+    },
+]
+
+
+class Client:
+    """EC2 client applying the network interface filters to a fixed list."""
+
+    def can_paginate(self, operation_name):
+        return False
+
+    def describe_network_interfaces(self, Filters, **kwargs):
+        (f,) = Filters
+        return {
+            "NetworkInterfaces": [
+                eni
+                for eni in ENIS
+                if set(ip.interface_ips(eni)) & set(f["Values"])
+                and f["Name"]
+                in ("addresses.private-ip-address", "ipv6-addresses.ipv6-address")
+            ]
+        }
+
+
+class Session:
+    profile_name = "default"
+    region_name = "eu-central-1"
+
+    def client(self, service_name):
+        return Client()
+
+
+def test_parse_ips_compresses_ipv6():
+    assert ip.parse_ips(["10.0.0.1", "2A05:D014:0:0::0001"]) == [
+        "10.0.0.1",
+        "2a05:d014::1",
+    ]
+
+
+def test_ip_filters():
+    assert ip.ip_filters(["10.0.0.1", "8.8.8.8", "2a05:d014::1"]) == [
+        {"Name": "addresses.private-ip-address", "Values": ["10.0.0.1", "8.8.8.8"]},
+        {"Name": "ipv6-addresses.ipv6-address", "Values": ["2a05:d014::1"]},
+        {"Name": "addresses.association.public-ip", "Values": ["8.8.8.8"]},
+    ]
+
+
+def test_ipv6_addresses_are_matched():
+    pages = list(ip.get_ips(Session(), ips=["2a05:d014::1", "10.0.0.2"]))
+    found = {r["NetworkInterfaceId"]: r["IpAddress"] for r in pages[0]["IpAddresses"]}
+    assert found == {"eni-1": "2a05:d014::1", "eni-2": "10.0.0.2"}
@@ -0,0 +1,118 @@
+import time
+
+import pytest
+from invoke import Config, Context
+
+from ..aws import common, search
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    calls = []
+
+    def aws_search(profile_name, region_name, output, func, **kwargs):
+        calls.append(dict(kwargs, profile=profile_name, region=region_name, func=func))
+
+    monkeypatch.setattr(common, "aws_search", aws_search)
+    monkeypatch.setattr(common, "configure_catalog", lambda c: None)
+    return calls
+
+
+def context():
+    return Context(
+        Config(
+            overrides={
+                "AWS_CACHE_TTL": 0,
+                "AWS_REGIONS_TTL": 0,
+                "AWS_ACCOUNTS_TTL": 0,
+                "AWS_DAEMON_SOCKET": "/nonexistent/daemon.sock",
+            }
+        )
+    )
+
+
+def test_search_task_arguments(searches):
+    search.elb_arns(context(), "a,b", region="all", workers=4, sort="-DNSName")
+    (call,) = searches
+    assert call["func"] is common.elb.get_elbs_by_arns
+    assert call["arns"] == ["a", "b"]
+    assert call["route"] == ("arns", common.planner.locate_arn)
+    assert (call["profile"], call["region"], call["workers"]) == ("default", "all", 4)
+    assert call["sort"] == (("DNSName", False),)
+
+
+def test_search_task_passes_declared_arguments(searches):
+    search.ami_name(context(), "amzn2-x86_64", limit="3")
+    search.ami_name(context(), "amzn2-x86_64", limit="3", latest=True)
+    assert [call["newest"] for call in searches] == [3, 1]
+    assert searches[0]["limit"] == 3
+
+
+def test_search_task_flags():
+    names = [a.name for a in search.ami_name.get_arguments()]
+    assert names[:3] == ["name", "profile", "region"]
+    assert names[-1] == "latest"
+    assert "search" not in names
+
+
+class Session:
+    def __init__(self, name, seconds=0):
+        self.profile_name = name
+        self.region_name = "eu-central-1"
+        self.seconds = seconds
+
+
+def search_session(session, func, **kwargs):
+    time.sleep(session.seconds)
+    yield [session.profile_name]
+
+
+def drain(results):
+    statuses = {}
+    for profile, _, pages in results:
+        try:
+            statuses[profile] = [data for page in pages for data in page]
+        except Exception as e:
+            statuses[profile] = type(e).__name__
+    return statuses
+
+
+def test_timed_out_worker_is_replaced(monkeypatch):
+    monkeypatch.setattr(common, "search_session", search_session)
+    jobs = [(Session("hung", 5), {})] + [(Session(f"fast-{i}"), {}) for i in range(3)]
+    start = time.monotonic()
+    statuses = drain(common.search_parallel(jobs, None, workers=1, timeout=1))
+    assert time.monotonic() - start < 2
+    assert statuses == {
+        "hung": "TimeoutError",
+        "fast-0": ["fast-0"],
+        "fast-1": ["fast-1"],
+        "fast-2": ["fast-2"],
+    }
+
+
+def test_sessions_not_started_are_skipped(monkeypatch):
+    monkeypatch.setattr(common, "search_session", search_session)
+    jobs = [
+        (Session("slow-0", 5), {}),
+        (Session("slow-1", 5), {}),
+        (Session("fast"), {}),
+    ]
+    deadline = time.monotonic() + 1
+    statuses = drain(common.search_parallel(jobs, None, workers=2, deadline=deadline))
+    assert time.monotonic() < deadline + 1
+    assert statuses == {
+        "slow-0": "TimeoutError",
+        "slow-1": "TimeoutError",
+        "fast": "SkippedError",
+    }
+
+
+def test_calls_are_limited_by_the_budget():
+    retries = {"mode": "standard", "max_attempts": 10}
+    timeouts = {"connect_timeout": 10, "read_timeout": 30}
+    assert common.limit_calls(retries, timeouts, 1) == (
+        {"mode": "standard", "max_attempts": 1},
+        {"connect_timeout": 1, "read_timeout": 1},
+    )
+    assert common.limit_calls(retries, timeouts, 100)[0]["max_attempts"] == 3
@@ -0,0 +1,36 @@
+from os import pathsep
+
+from ..ansible import tuning
+
+
+def test_callbacks_of_the_environment_are_kept(tmp_path):
+    env = {
+        "ANSIBLE_CONFIG": str(tmp_path / "missing.cfg"),
+        "ANSIBLE_CALLBACK_PLUGINS": "/opt/callbacks",
+        "ANSIBLE_CALLBACKS_ENABLED": "profile_tasks, junit",
+    }
+    assert tuning.callback_env(env) == {
+        "ANSIBLE_CALLBACK_PLUGINS": f"/opt/callbacks{pathsep}{tuning.CALLBACK_DIR}",
+        "ANSIBLE_CALLBACKS_ENABLED": "profile_tasks,junit,tasks_timings",
+        "ANSIBLE_CALLBACK_WHITELIST": "profile_tasks,junit,tasks_timings",
+    }
+
+
+def test_callbacks_of_ansible_cfg_are_kept(tmp_path):
+    config = tmp_path / "ansible.cfg"
+    config.write_text(
+        "[defaults]\ncallback_plugins = ~/callbacks\ncallback_whitelist = junit\n"
+    )
+    env = tuning.callback_env({"ANSIBLE_CONFIG": str(config)})
+    assert (
+        env["ANSIBLE_CALLBACK_PLUGINS"] == f"~/callbacks{pathsep}{tuning.CALLBACK_DIR}"
+    )
+    assert env["ANSIBLE_CALLBACKS_ENABLED"] == "junit,tasks_timings"
+
+
+def test_timings_callback_is_not_repeated(tmp_path):
+    env = {
+        "ANSIBLE_CONFIG": str(tmp_path / "missing.cfg"),
+        "ANSIBLE_CALLBACKS_ENABLED": "tasks_timings",
+    }
+    assert tuning.callback_env(env)["ANSIBLE_CALLBACKS_ENABLED"] == "tasks_timings"